@@ -0,0 +1,337 @@
+"""
+Step / reset / render benchmarks of the Sssnake env.
+
+Run ``python -m sssnake.bench -o results.json`` to record a run, and
+``python -m sssnake.bench --compare base.json results.json`` to compare two of them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import replace
+from importlib.metadata import PackageNotFoundError, version
+from importlib.resources import files
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.core.map_cache import MAP_CACHE
+from sssnake.env.utils.config_def import EnvSpec, ResetOptions
+from sssnake.env.utils.env_helpers import load_config
+from sssnake.env.utils.snake_action import SnakeAction
+
+# Metrics where a lower value is better, every other metric is a rate.
+LOWER_IS_BETTER = ("reset_ms", "cold_reset_ms", "memory_growth_kb")
+
+MAP_SIZE = 100.0
+
+Result = Dict[str, Any]
+
+
+def bench_config(
+    resolution: int, bitmap_path: str = "", tail_max_segment: int = 200
+) -> Tuple[EnvSpec, ResetOptions]:
+    """
+    Default params on the largest map, with the snake starting on the left of the circle which
+    circle_action drives it along.
+    """
+
+    spec, opts = load_config(str(files("sssnake.env.utils").joinpath("default_params.json")))
+
+    spec = replace(
+        spec,
+        collision_map_resolution=resolution,
+        tail_max_segment=max(1, tail_max_segment),
+        max_num_steps=math.inf,
+        max_map_size=MAP_SIZE,
+    )
+
+    radius = circle_radius(spec, opts)
+    opts = replace(
+        opts,
+        map_size=MAP_SIZE,
+        start_pos_coords=(0.5 - radius / MAP_SIZE, 0.5),
+        start_dir=0.0,
+        map_bitmap_path=bitmap_path,
+    )
+    return spec, opts
+
+
+def circle_turn_period(spec: EnvSpec, opts: ResetOptions, length: int = 200) -> int:
+    """
+    Steps between left turns, so that the driven circle is long enough for the whole tail.
+    """
+
+    circumference = length * spec.tail_segment_length + 10.0
+    radius = circumference / (2 * math.pi)
+    return math.ceil(radius * math.radians(opts.snake_turnspeed) / opts.snake_speed)
+
+
+def circle_radius(spec: EnvSpec, opts: ResetOptions) -> float:
+    period = circle_turn_period(spec, opts)
+    return opts.snake_speed * period / math.radians(opts.snake_turnspeed)
+
+
+def circle_action(step: int, period: int) -> int:
+    return SnakeAction.LEFT.value if step % period == 0 else SnakeAction.NONE.value
+
+
+def write_corner_bitmap(path: Path, size: int = 256) -> str:
+    """
+    Writes a bitmap with obstacles in the corners only, away from the benchmark circle.
+    """
+
+    img = np.zeros((size, size), dtype=np.uint8)
+    corner = size // 12
+    img[:corner, :corner] = img[:corner, -corner:] = 255
+    img[-corner:, :corner] = img[-corner:, -corner:] = 255
+    Image.fromarray(img, mode="L").save(path)
+    return str(path)
+
+
+def grown_env(spec: EnvSpec, opts: ResetOptions, length: int, **env_kwargs) -> EnvEngine:
+    """
+    Resets an env and drives it along the circle until it has a tail of the given length.
+    """
+
+    env = EnvEngine(spec, **env_kwargs)
+    env.reset(seed=0, options=opts)
+
+    # Whole turn periods, so that the benchmark loops continue along the same circle.
+    period = circle_turn_period(spec, opts)
+    warmup = math.ceil(length * spec.tail_segment_length / opts.snake_speed / period + 1) * period
+    for t in range(warmup):
+        env.step(circle_action(t, period))
+
+    env.state.segments_num = length
+    env.update_body_segments()
+    env.env_collision.update_tail_index(env.state)
+    return env
+
+
+def bench_steps(
+    length: int,
+    resolution: int,
+    bitmap_path: str,
+    steps: int,
+    obs_format: str = "dict",
+    **env_kwargs,
+) -> Result:
+    spec, opts = bench_config(resolution, bitmap_path, length)
+    env = grown_env(spec, opts, length, obs_format=obs_format, **env_kwargs)
+    period = circle_turn_period(spec, opts)
+
+    start = time.perf_counter()
+    for t in range(steps):
+        _, _, terminated, _, _ = env.step(circle_action(t, period))
+        if terminated:
+            raise RuntimeError(f"Benchmark snake of length {length} crashed at step {t}")
+    elapsed = time.perf_counter() - start
+
+    return {"steps_per_sec": steps / elapsed}
+
+
+def bench_reset(resolution: int, bitmap_path: str, repeats: int) -> Result:
+    spec, opts = bench_config(resolution, bitmap_path)
+    env = EnvEngine(spec)
+
+    MAP_CACHE.clear()
+    start = time.perf_counter()
+    env.reset(seed=0, options=opts)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(repeats):
+        env.reset(seed=i, options=opts)
+    warm = (time.perf_counter() - start) / repeats
+
+    return {"cold_reset_ms": cold * 1e3, "reset_ms": warm * 1e3}
+
+
+def bench_render(engine: str, bitmap_path: str, length: int, frames: int) -> Result:
+    spec, opts = bench_config(64, bitmap_path, length)
+    spec = replace(spec, render_engine=engine)
+    env = grown_env(spec, opts, length, render_mode="rgb_array")
+    period = circle_turn_period(spec, opts)
+
+    env.render()
+    start = time.perf_counter()
+    for t in range(frames):
+        env.step(circle_action(t, period))
+        env.render()
+    elapsed = time.perf_counter() - start
+
+    return {"fps": frames / elapsed}
+
+
+def bench_memory(length: int, steps: int) -> Result:
+    """
+    Memory allocated and kept during a long episode, after the snake has grown.
+    """
+
+    spec, opts = bench_config(64, "", length)
+    env = grown_env(spec, opts, length)
+    period = circle_turn_period(spec, opts)
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        for t in range(steps):
+            env.step(circle_action(t, period))
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"memory_growth_kb": (after - before) / 1024, "peak_kb": (peak - before) / 1024}
+
+
+def run_suite(quick: bool = False, workdir: str | Path | None = None) -> Dict[str, Any]:
+    """
+    Runs all the benchmarks, returning the results keyed by benchmark name.
+    """
+
+    steps = 300 if quick else 5000
+    lengths = (0, 50) if quick else (0, 50, 200)
+    resolutions = (40, 128) if quick else (40, 256, 1024)
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        bitmap = write_corner_bitmap(Path(tmp) / "corners.png")
+        maps = {"nomap": "", "bitmap": bitmap}
+
+        results: Dict[str, Result] = {}
+        for map_name, path in maps.items():
+            for res in resolutions:
+                for length in lengths:
+                    name = f"step/len={length}/res={res}/{map_name}"
+                    results[name] = bench_steps(length, res, path, steps)
+
+                results[f"reset/res={res}/{map_name}"] = bench_reset(res, path, 3 if quick else 20)
+
+        for obs_format in ("array", "flat"):
+            name = f"step/len={lengths[-1]}/res=40/nomap/{obs_format}"
+            results[name] = bench_steps(lengths[-1], 40, "", steps, obs_format=obs_format)
+
+        results[f"step/len={lengths[-1]}/res=40/nomap/preallocated"] = bench_steps(
+            lengths[-1], 40, "", steps, obs_format="array", preallocate=True
+        )
+
+        for engine in ("exact", "atlas"):
+            results[f"render/{engine}/len={lengths[-1]}"] = bench_render(
+                engine, bitmap, lengths[-1], 20 if quick else 300
+            )
+
+        results[f"memory/len={lengths[-1]}"] = bench_memory(lengths[-1], steps * 4)
+
+    return {"meta": run_metadata(quick), "results": results}
+
+
+def run_metadata(quick: bool) -> Dict[str, Any]:
+    try:
+        sssnake_version = version("sssnake")
+    except PackageNotFoundError:
+        sssnake_version = "unknown"
+
+    return {
+        "sssnake": sssnake_version,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "quick": quick,
+    }
+
+
+def compare(
+    base: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.1
+) -> Tuple[List[Tuple[str, str, float, float, float]], List[str]]:
+    """
+    Lists (benchmark, metric, base, new, relative change) for the metrics present in both runs,
+    and the names of the rows which got worse by more than threshold.
+    """
+
+    rows = []
+    regressions = []
+    for name, base_metrics in base["results"].items():
+        new_metrics = new["results"].get(name)
+        if new_metrics is None:
+            continue
+        for metric, old in base_metrics.items():
+            if metric not in new_metrics or not old:
+                continue
+            value = new_metrics[metric]
+            change = (value - old) / abs(old)
+            rows.append((name, metric, old, value, change))
+
+            worse = change > threshold if metric in LOWER_IS_BETTER else change < -threshold
+            if worse and metric != "peak_kb":
+                regressions.append(f"{name} {metric}")
+
+    return rows, regressions
+
+
+def format_results(results: Dict[str, Result]) -> str:
+    width = max(len(name) for name in results)
+    lines = []
+    for name, metrics in results.items():
+        values = "  ".join(f"{k}={v:.2f}" for k, v in metrics.items())
+        lines.append(f"{name:<{width}}  {values}")
+    return "\n".join(lines)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m sssnake.bench", description=__doc__)
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--quick", action="store_true", help="fewer and shorter benchmarks")
+    parser.add_argument(
+        "--compare",
+        nargs="+",
+        metavar="JSON",
+        help="compare a base run with a new run, or with a fresh run when only one is given",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative change counted as a regression (default: 0.1)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes one or two JSON files")
+
+    if args.compare and len(args.compare) == 2:
+        new = json.loads(Path(args.compare[1]).read_text())
+    else:
+        new = run_suite(quick=args.quick)
+        print(format_results(new["results"]))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(new, indent=2))
+
+    if not args.compare:
+        return 0
+
+    base = json.loads(Path(args.compare[0]).read_text())
+    rows, regressions = compare(base, new, args.threshold)
+    for name, metric, old, value, change in rows:
+        print(f"{name:<40} {metric:<18} {old:>12.2f} -> {value:>12.2f}  {change:+7.1%}")
+
+    if regressions:
+        print("Regressions:\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
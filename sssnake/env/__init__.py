@@ -5,4 +5,5 @@ print("Registering Sssnake-v0 env")
 register(
     id="Sssnake-v0",
     entry_point="sssnake.env.core.env_engine:EnvEngine",
+    vector_entry_point="sssnake.env.core.vector_env:SssnakeVectorEnv",
 )
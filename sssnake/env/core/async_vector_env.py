@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import traceback
+from importlib.resources import files
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from gymnasium import spaces
+from gymnasium.vector import AutoresetMode, VectorEnv
+from gymnasium.vector.utils import batch_space
+
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.core.map_cache import load_collision_maps
+from sssnake.env.utils.config_def import EnvSpec, ResetOptions
+from sssnake.env.utils.env_helpers import load_config
+from sssnake.env.utils.schema import build_observation_space, split_obs_keys
+from sssnake.env.utils.snake_action import SnakeAction
+from sssnake.env.utils.state_def import InfoDict, ObsBuffers, ObservationDict
+
+ArrayLayout = Dict[str, Tuple[Tuple[int, ...], str]]
+
+
+class SharedArrays:
+    """
+    NumPy arrays backed by named shared memory blocks, one block per array.
+
+    Created by the main process when names is None, attached to by name in the workers.
+    """
+
+    def __init__(self, layout: ArrayLayout, names: Dict[str, str] | None = None) -> None:
+        self.layout = layout
+        self.arrays: Dict[str, np.ndarray] = {}
+        self._blocks: Dict[str, SharedMemory] = {}
+        self._owner = names is None
+
+        for key, (shape, dtype) in layout.items():
+            nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            if names is None:
+                block = SharedMemory(create=True, size=nbytes)
+            else:
+                # Workers share the main process' resource tracker, which unlinks leaked blocks.
+                block = SharedMemory(name=names[key])
+            self._blocks[key] = block
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+        if self._owner:
+            for arr in self.arrays.values():
+                arr[...] = 0
+
+    @property
+    def names(self) -> Dict[str, str]:
+        return {key: block.name for key, block in self._blocks.items()}
+
+    def close(self):
+        self.arrays.clear()
+        for block in self._blocks.values():
+            block.close()
+            if self._owner:
+                block.unlink()
+        self._blocks.clear()
+
+
+class SssnakeAsyncVectorEnv(VectorEnv):
+    """
+    Multi-process vectorized env, each worker stepping a contiguous batch of EnvEngines.
+
+    Workers write observations, rewards and done flags straight into shared memory laid out after
+    the observation space, only short commands travel over the pipes. Sub-envs are autoreset on
+    the step following their termination / truncation, like in SssnakeVectorEnv.
+    """
+
+    def __init__(
+        self,
+        num_envs: int = 1,
+        env_spec_in: EnvSpec | None = None,
+        render_mode: str | None = None,
+        copy: bool = True,
+        obs_keys: Sequence[str] | None = None,
+        static_obs_on_reset: bool = False,
+        num_workers: int | None = None,
+        context: str | None = None,
+    ) -> None:
+        super().__init__()
+        self.metadata = {"render_modes": [], "autoreset_mode": AutoresetMode.NEXT_STEP}
+
+        default_json = files("sssnake.env.utils").joinpath("default_params.json")
+        env_spec_loaded, self.last_reset_options = load_config(jsonpath=str(default_json))
+
+        env_spec = env_spec_loaded if env_spec_in is None else env_spec_in
+
+        if render_mode is not None:
+            raise ValueError(f"Rendermode '{render_mode}' not supported.")
+
+        self.num_envs = num_envs
+        self.render_mode = render_mode
+        self.copy = copy
+        self.env_spec = env_spec
+
+        self.obs_keys, self.static_obs_keys = split_obs_keys(obs_keys, static_obs_on_reset)
+
+        # Static obs are built once in this process, while pooled maps differ between sub-envs.
+        if self.static_obs_keys and env_spec.map_pool:
+            raise ValueError("Static obs on reset can't be used with a map pool.")
+
+        self.single_action_space = spaces.Discrete(len(SnakeAction))
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.single_observation_space = build_observation_space(env_spec, self.obs_keys)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+
+        obs_layout: ArrayLayout = {}
+        for key, space in self.single_observation_space.items():
+            assert isinstance(space, spaces.Box)
+            obs_layout[key] = ((num_envs, *space.shape), space.dtype.str)
+
+        step_layout: ArrayLayout = {
+            "actions": ((num_envs,), np.dtype(np.int64).str),
+            "rewards": ((num_envs,), np.dtype(np.float64).str),
+            "terminated": ((num_envs,), np.dtype(np.bool_).str),
+            "truncated": ((num_envs,), np.dtype(np.bool_).str),
+        }
+
+        self._obs = SharedArrays(obs_layout)
+        self._step = SharedArrays(step_layout)
+
+        num_workers = num_workers or min(num_envs, os.cpu_count() or 1)
+        self.env_slices: List[Tuple[int, int]] = [
+            (int(chunk[0]), int(chunk[-1]) + 1)
+            for chunk in np.array_split(np.arange(num_envs), num_workers)
+            if len(chunk)
+        ]
+
+        ctx: Any = mp.get_context(context)
+        self._pipes: List[Connection] = []
+        self._processes: List[Any] = []
+        for env_slice in self.env_slices:
+            parent, child = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker,
+                args=(
+                    child,
+                    env_spec,
+                    env_slice,
+                    self.obs_keys,
+                    (obs_layout, self._obs.names),
+                    (step_layout, self._step.names),
+                ),
+                daemon=True,
+            )
+            process.start()
+            child.close()
+            self._pipes.append(parent)
+            self._processes.append(process)
+
+        self._closed_workers = False
+
+    def reset(
+        self,
+        *,
+        seed: int | Sequence[int | None] | None = None,
+        options: Dict[str, Any] | ResetOptions | None = None,
+    ):
+        if isinstance(seed, int):
+            seeds: Sequence[int | None] = [seed + i for i in range(self.num_envs)]
+        elif seed is None:
+            seeds = [None] * self.num_envs
+        else:
+            seeds = seed
+
+        if len(seeds) != self.num_envs:
+            raise ValueError(f"Expected {self.num_envs} seeds, got {len(seeds)}.")
+
+        if options is not None:
+            if isinstance(options, dict):
+                self.last_reset_options = ResetOptions.from_dict(options)
+            else:
+                self.last_reset_options = options
+
+        if self.last_reset_options is None:
+            raise RuntimeError("ResetOptions not initialized.")
+
+        if self.static_obs_keys and self.last_reset_options.map_generator:
+            raise ValueError("Static obs on reset can't be used with generated maps.")
+
+        for pipe, (lo, hi) in zip(self._pipes, self.env_slices, strict=True):
+            pipe.send(("reset", (list(seeds[lo:hi]), self.last_reset_options)))
+        self._wait()
+
+        info: InfoDict = {}
+        if self.static_obs_keys:
+            maps = load_collision_maps(self.env_spec, self.last_reset_options)
+            info["static_obs"] = {"safe_map_snake": maps.safe_map_snake}
+        return self.build_obs(), info
+
+    def step(self, actions):
+        step = self._step.arrays
+        step["actions"][...] = actions
+
+        for pipe in self._pipes:
+            pipe.send(("step", None))
+        self._wait()
+
+        info: InfoDict = {}
+        return (
+            self.build_obs(),
+            step["rewards"].copy(),
+            step["terminated"].copy(),
+            step["truncated"].copy(),
+            info,
+        )
+
+    def build_obs(self) -> ObservationDict:
+        if self.copy:
+            return {k: arr.copy() for k, arr in self._obs.arrays.items()}
+        return dict(self._obs.arrays)
+
+    def close_extras(self, **kwargs):
+        if self._closed_workers:
+            return
+        self._closed_workers = True
+
+        for pipe in self._pipes:
+            try:
+                pipe.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for pipe in self._pipes:
+            pipe.close()
+
+        self._obs.close()
+        self._step.close()
+
+    def _wait(self):
+        errors = []
+        for pipe, process in zip(self._pipes, self._processes, strict=True):
+            try:
+                status, payload = pipe.recv()
+            except (EOFError, OSError):
+                status, payload = "error", f"Worker {process.pid} exited ({process.exitcode})"
+            if status == "error":
+                errors.append(payload)
+        if errors:
+            raise RuntimeError("Sssnake worker failed:\n" + "\n".join(errors))
+
+
+class _WorkerBatch:
+    """
+    The sub-envs lo..hi of a worker, writing their observations straight into the shared arrays.
+    """
+
+    def __init__(
+        self,
+        env_spec: EnvSpec,
+        env_slice: Tuple[int, int],
+        obs_keys: List[str],
+        obs: SharedArrays,
+        step: SharedArrays,
+    ) -> None:
+        lo, hi = env_slice
+
+        self.engines = []
+        for i in range(lo, hi):
+            engine = EnvEngine(env_spec, obs_format="array", obs_keys=obs_keys)
+            assert isinstance(engine.observation_space, spaces.Dict)
+            engine.obs_buffers = ObsBuffers(
+                engine.observation_space, arrays={k: arr[i, ...] for k, arr in obs.arrays.items()}
+            )
+            self.engines.append(engine)
+
+        self.actions = step.arrays["actions"][lo:hi]
+        self.rewards = step.arrays["rewards"][lo:hi]
+        self.terminated = step.arrays["terminated"][lo:hi]
+        self.truncated = step.arrays["truncated"][lo:hi]
+        self.autoreset = np.zeros(hi - lo, dtype=np.bool_)
+
+    def reset(self, data):
+        seeds, options = data
+        for engine, seed in zip(self.engines, seeds, strict=True):
+            engine.reset(seed=seed, options=options)
+        self.autoreset[:] = False
+
+    def step(self, _data):
+        for j, engine in enumerate(self.engines):
+            if self.autoreset[j]:
+                engine.reset()
+                reward, term, trunc = 0, False, False
+            else:
+                _, reward, term, trunc, _ = engine.step(int(self.actions[j]))
+
+            self.rewards[j] = reward
+            self.terminated[j] = term
+            self.truncated[j] = trunc
+            self.autoreset[j] = term or trunc
+
+
+def _worker(
+    pipe: Connection,
+    env_spec: EnvSpec,
+    env_slice: Tuple[int, int],
+    obs_keys: List[str],
+    obs_shared: Tuple[ArrayLayout, Dict[str, str]],
+    step_shared: Tuple[ArrayLayout, Dict[str, str]],
+):
+    obs = SharedArrays(*obs_shared)
+    step = SharedArrays(*step_shared)
+    batch = _WorkerBatch(env_spec, env_slice, obs_keys, obs, step)
+    commands = {"reset": batch.reset, "step": batch.step}
+
+    try:
+        while True:
+            command, data = pipe.recv()
+            if command == "close":
+                break
+            try:
+                commands[command](data)
+            except Exception as e:
+                # Relayed to the parent, which raises it.
+                pipe.send(("error", "".join(traceback.format_exception(e))))
+            else:
+                pipe.send(("ok", None))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        # Views into the blocks must be gone before closing them.
+        commands.clear()
+        del batch
+        obs.close()
+        step.close()
+        pipe.close()
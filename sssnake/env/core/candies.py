@@ -1,12 +1,69 @@
 from __future__ import annotations
 
 import math
+from typing import List, Tuple
 
 import numpy as np
 
+from sssnake.env.core import kernels
 from sssnake.env.utils.config_def import EnvSpec
 from sssnake.env.utils.env_helpers import generate_safe_map
 
+CANDY_SAMPLERS = ("rejection", "scan")
+
+# Cheap uniform draws tried before the exact bucketed exclusion around the head.
+_REJECTION_TRIES = 16
+
+# Upper bound of buckets per axis, so that tiny head distances don't blow up the index.
+_MAX_BUCKETS = 256
+
+
+class FreeCellIndex:
+    """
+    Candy placement coordinates bucketed on a uniform grid, sorted bucket by bucket.
+
+    With buckets of roughly the head distance, the cells closer to the head than that distance
+    lie in a few bucket rows, each one a contiguous run of the sorted coordinates. Everything
+    outside these runs is available without computing a single distance.
+    """
+
+    def __init__(self, positions: np.ndarray, cell_size: float) -> None:
+        self.size = len(positions)
+
+        extent = float(positions.max()) if self.size else 0.0
+        self.cell_size = max(cell_size, extent / _MAX_BUCKETS, 1e-9)
+
+        cells = np.floor(positions / self.cell_size).astype(np.int64)
+        self.nx = int(cells[:, 0].max()) + 1 if self.size else 1
+        self.ny = int(cells[:, 1].max()) + 1 if self.size else 1
+
+        keys = cells[:, 1] * self.nx + cells[:, 0]
+        order = np.argsort(keys, kind="stable")
+
+        self.positions = positions[order]
+        self.bounds = np.searchsorted(keys[order], np.arange(self.nx * self.ny + 1))
+
+    def near_runs(self, point: Tuple[float, float], radius: float) -> List[Tuple[int, int]]:
+        """
+        Returns the sorted index runs of all the buckets touching the square around point.
+        """
+
+        x0 = max(math.floor((point[0] - radius) / self.cell_size), 0)
+        x1 = min(math.floor((point[0] + radius) / self.cell_size), self.nx - 1)
+        y0 = max(math.floor((point[1] - radius) / self.cell_size), 0)
+        y1 = min(math.floor((point[1] + radius) / self.cell_size), self.ny - 1)
+
+        if x0 > x1 or y0 > y1:
+            return []
+
+        runs = []
+        for y in range(y0, y1 + 1):
+            start = int(self.bounds[y * self.nx + x0])
+            end = int(self.bounds[y * self.nx + x1 + 1])
+            if end > start:
+                runs.append((start, end))
+        return runs
+
 
 class EnvCandies:
     """
@@ -20,10 +77,38 @@ class EnvCandies:
         self.candy_wall_distance = env_spec.candy_pos_wall_distance
         self.candy_obstacle_distance = env_spec.candy_pos_obstacle_distance
         self.candy_head_distance = env_spec.candy_head_distance
+        self.safe_map_engine = env_spec.safe_map_engine
+        self.sampler = env_spec.candy_sampler
+        self.avoid_tail = env_spec.candy_avoid_tail
+
+        if self.sampler not in CANDY_SAMPLERS:
+            raise ValueError(f"Unknown candy sampler '{self.sampler}', expected {CANDY_SAMPLERS}")
 
         self.map_size = 0
 
-        self.free_pos_candy: np.ndarray | None = None
+        self._free_pos_candy: np.ndarray | None = None
+        self.cell_index: FreeCellIndex | None = None
+
+    @property
+    def free_pos_candy(self) -> np.ndarray | None:
+        return self._free_pos_candy
+
+    @free_pos_candy.setter
+    def free_pos_candy(self, positions: np.ndarray | None):
+        self.set_free_cells(positions)
+
+    def set_free_cells(self, positions: np.ndarray | None, index: FreeCellIndex | None = None):
+        """
+        Sets the candy placement coordinates, indexing them unless an index is shared or they
+        didn't change.
+        """
+
+        if positions is not self._free_pos_candy or self.cell_index is None:
+            if index is None and positions is not None:
+                index = FreeCellIndex(positions, self.candy_head_distance)
+            self.cell_index = index
+
+        self._free_pos_candy = positions
 
     def set_rng(self, rng: np.random.Generator):
         self.rng = rng
@@ -36,18 +121,114 @@ class EnvCandies:
         Randomly chooses a candy position basing on the safe map.
         """
 
+        tail = state.segments_positions[: state.segments_num] if self.avoid_tail else None
+        return self.random_candy_pos_from(state.head_position, tail)
+
+    def random_candy_pos_from(self, head, tail: np.ndarray | None = None):
+        """
+        Randomly chooses a candy position far enough from the given head position, and from the
+        tail segments if given. Every such free cell is equally likely.
+        """
+
         assert self.rng is not None
 
-        head = state.head_position
+        if self.sampler == "scan":
+            pos = self._scan_candy_pos(head, tail)
+        else:
+            pos = self._sample_candy_pos(head, tail)
+
+        if pos is None:
+            return self.random_candy_pos_nomap()  # Run when there are no available candy positions
+        return pos
+
+    def _scan_candy_pos(self, head, tail):
+        """
+        Draws from the explicit list of available cells, computing the distance to every cell.
+        """
+
+        assert self.rng is not None and self.free_pos_candy is not None
+
         dists = np.linalg.norm(self.free_pos_candy - head, axis=1)
+        ok = dists >= self.candy_head_distance
+        if tail is not None and len(tail):
+            ok &= self._clear_of_tail(self.free_pos_candy, tail)
 
-        available = self.free_pos_candy[dists >= self.candy_head_distance]
+        available = self.free_pos_candy[ok]
 
         if available.size:
             idx = self.rng.integers(available.shape[0])
-            return tuple(available[idx])
+            return float(available[idx][0]), float(available[idx][1])
+        return None
+
+    def _sample_candy_pos(self, head, tail):
+        """
+        Rejection sampling from the free cells. Accepted draws are uniform over the available
+        cells, and so is the exact bucketed fallback used after too many rejections.
+        """
 
-        return self.random_candy_pos_nomap()  # Run when there are no available candy positions
+        assert self.rng is not None
+        index = self.cell_index
+        if index is None or index.size == 0:
+            return None
+
+        has_tail = tail is not None and len(tail) > 0
+
+        for _ in range(_REJECTION_TRIES):
+            x, y = index.positions[self.rng.integers(index.size)].tolist()
+            if math.hypot(x - head[0], y - head[1]) < self.candy_head_distance:
+                continue
+            if has_tail and not self._clear_of_tail(np.array([[x, y]]), tail)[0]:
+                continue
+            return x, y
+
+        for _ in range(_REJECTION_TRIES):
+            pos = self._sample_away_from_head(index, head)
+            if pos is None:
+                return None
+            if not has_tail or self._clear_of_tail(np.array([pos]), tail)[0]:
+                return pos
+
+        return self._scan_candy_pos(head, tail)
+
+    def _sample_away_from_head(self, index: FreeCellIndex, head):
+        """
+        Draws uniformly from the cells at least candy_head_distance away from the head, checking
+        distances only within the buckets around it.
+        """
+
+        assert self.rng is not None
+
+        runs = index.near_runs(head, self.candy_head_distance)
+
+        near = np.concatenate([np.arange(a, b) for a, b in runs]) if runs else np.empty(0, int)
+        d = index.positions[near] - np.asarray(head, dtype=np.float64)
+        near_ok = near[np.hypot(d[:, 0], d[:, 1]) >= self.candy_head_distance]
+
+        num_far = index.size - len(near)
+        total = num_far + len(near_ok)
+        if total == 0:
+            return None
+
+        u = int(self.rng.integers(total))
+        if u < num_far:
+            for a, b in runs:  # Skips over the near runs, which are sorted and disjoint
+                if u >= a:
+                    u += b - a
+                else:
+                    break
+        else:
+            u = int(near_ok[u - num_far])
+
+        x, y = index.positions[u]
+        return float(x), float(y)
+
+    def _clear_of_tail(self, positions: np.ndarray, tail: np.ndarray) -> np.ndarray:
+        """
+        Flags positions lying at least candy_collect_distance away from every tail segment.
+        """
+
+        d = positions[:, None, :].astype(np.float64) - tail[None, :, :]
+        return (np.hypot(d[..., 0], d[..., 1]) >= self.candy_distance).all(axis=1)
 
     def random_candy_pos_nomap(self):
         """
@@ -66,13 +247,20 @@ class EnvCandies:
     def met_candy(self, state):
         hpx, hpy = state.head_position
         cpx, cpy = state.candy_position
-        return math.hypot(hpx - cpx, hpy - cpy) < self.candy_distance
+        return kernels.within(hpx, hpy, cpx, cpy, self.candy_distance)
 
     def generate_free_cells_candy(self, obstacles_map):
         """
         Generates free cells for candy placement based on the obstacles map.
         """
 
+        self.free_pos_candy = self.compute_free_cells_candy(obstacles_map)
+
+    def compute_free_cells_candy(self, obstacles_map) -> np.ndarray:
+        """
+        Computes the candy placement coordinates for the obstacles map, without storing them.
+        """
+
         n = obstacles_map.shape[0]
 
         candy_margin_wall = max(int(self.candy_wall_distance * (n / self.map_size)), 1)
@@ -81,6 +269,7 @@ class EnvCandies:
             self.candy_obstacle_distance,
             self.map_size,
             obstacles_map,
+            engine=self.safe_map_engine,
         )
 
         safe_map_candy[:candy_margin_wall, :] = 0
@@ -93,4 +282,4 @@ class EnvCandies:
         coords = np.stack((xs, ys), axis=1).astype(np.float32)
         ratio = self.map_size / n
 
-        self.free_pos_candy = coords * ratio
+        return coords * ratio
@@ -1,6 +1,9 @@
-import math
 from typing import Any, List
 
+import numpy as np
+
+from sssnake.env.core import kernels
+from sssnake.env.core.segment_grid import SegmentGrid
 from sssnake.env.utils.config_def import EnvSpec
 from sssnake.env.utils.state_def import FullState
 
@@ -10,12 +13,26 @@ class EnvCollision:
     Class responsible for detecting collision between the snake's head and a wall / obstacle / its own tail.
     """
 
-    def __init__(self, env_spec: EnvSpec) -> None:
+    def __init__(
+        self, env_spec: EnvSpec, tail_grid: bool = False, preallocate: bool = False
+    ) -> None:
         self.obstacles_map: List[Any] = []
         self.tail_hit_distance = env_spec.hit_tail_distance
         self.wall_hit_distance = env_spec.hit_wall_distance
         self.obstacle_hit_distance = env_spec.hit_obstacle_distance
 
+        # Without a grid the tail is checked by brute force, which needs no synchronization.
+        self.tail_grid: SegmentGrid | None = None
+        if tail_grid:
+            self.tail_grid = SegmentGrid(self.tail_hit_distance, env_spec.tail_max_segment)
+
+        # Buffers of the brute force check, which then allocates no arrays.
+        self._tail_buffers: np.ndarray | None = None
+        self._tail_hits = np.zeros(0, dtype=np.bool_)
+        if preallocate:
+            self._tail_buffers = np.zeros((2, env_spec.tail_max_segment), dtype=np.float64)
+            self._tail_hits = np.zeros(env_spec.tail_max_segment, dtype=np.bool_)
+
     def hit_anything(self, state: FullState) -> bool:
         return self.hit_tail(state) or self.hit_wall(state) or self.hit_obstacle(state)
 
@@ -24,34 +41,45 @@ class EnvCollision:
             return False
 
         hx, hy = state.head_position
-        h, w = state.safe_map_snake.shape
+        return kernels.hit_obstacle(hx, hy, state.map_size, state.safe_map_snake)
 
-        px = int(hx / state.map_size * w)
-        py = int(hy / state.map_size * h)
+    def hit_wall(self, state: FullState) -> bool:
+        hpx, hpy = state.head_position
+        return kernels.hit_wall(hpx, hpy, state.map_size, self.wall_hit_distance)
 
-        px = max(0, min(w - 1, px))
-        py = max(0, min(h - 1, py))
+    def hit_tail(self, state: FullState) -> bool:
+        if self.tail_grid is not None:
+            return self.tail_grid.any_within(
+                state.segments_positions, state.head_position, self.tail_hit_distance
+            )
 
-        return state.safe_map_snake[py][px] == 0
+        n = state.segments_num
+        if self._tail_buffers is not None:
+            if n == 0:
+                return False
+            # One axis at a time, broadcasting over (n, 2) would allocate ufunc buffers.
+            dx, dy = self._tail_buffers[:, :n]
+            np.copyto(dx, state.segments_positions[:n, 0])
+            np.copyto(dy, state.segments_positions[:n, 1])
+            np.subtract(dx, state.head_position[0], out=dx)
+            np.subtract(dy, state.head_position[1], out=dy)
+            np.hypot(dx, dy, out=dx)
+            return bool(np.less(dx, self.tail_hit_distance, out=self._tail_hits[:n]).any())
 
-    def hit_wall(self, state: FullState) -> bool:
-        hpx, hpy = state.head_position
+        if n == 0:
+            return False
 
-        return any(
-            abs(coord - border) < self.wall_hit_distance
-            for coord, border in [
-                (hpx, 0),
-                (hpy, 0),
-                (hpx, state.map_size),
-                (hpy, state.map_size),
-            ]
-        )
+        segments = np.asarray(state.segments_positions[:n], dtype=np.float64)
 
-    def hit_tail(self, state: FullState) -> bool:
-        hpx, hpy = state.head_position
+        d = segments - state.head_position
+        return bool((np.hypot(d[:, 0], d[:, 1]) < self.tail_hit_distance).any())
 
-        for cpx, cpy in state.segments_positions:
-            if math.hypot(hpx - cpx, hpy - cpy) < self.tail_hit_distance:
-                return True
+    def update_tail_index(self, state: FullState):
+        """
+        Synchronizes the tail grid with the state's active segments, after they have moved. An
+        empty grid of a snake without segments has nothing to synchronize.
+        """
 
-        return False
+        grid = self.tail_grid
+        if grid is not None and (state.segments_num or len(grid)):
+            grid.update(state.segments_positions, state.segments_num)
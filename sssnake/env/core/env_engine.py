@@ -1,28 +1,48 @@
 from __future__ import annotations
 
-import math
 from copy import deepcopy
+from dataclasses import replace
 from importlib.resources import files
-from math import cos, radians, sin
-from typing import Any, Dict, List, Tuple
+from math import ceil, cos, inf, isinf, radians, sin
+from typing import Any, Dict, Sequence, Tuple
 
 import gymnasium as gym
 import numpy as np
 from gymnasium import spaces
-from gymnasium.utils import seeding
 
+from sssnake.env.core import kernels
 from sssnake.env.core.candies import EnvCandies
 from sssnake.env.core.collision import EnvCollision
+from sssnake.env.core.head_path import HeadPath
+from sssnake.env.core.map_cache import (
+    CollisionMaps,
+    MapPool,
+    generate_collision_maps,
+    load_collision_maps,
+    load_map_pool,
+)
+from sssnake.env.core.profiling import EnvMetrics, instrument_env
 from sssnake.env.core.renderer import state_to_array
+from sssnake.env.core.vector_env import SssnakeVectorEnv
 from sssnake.env.utils.config_def import EnvSpec, ResetOptions
-from sssnake.env.utils.env_helpers import generate_safe_map, load_config, load_obstacles_map
-from sssnake.env.utils.schema import DEFAULT_OBS_KEYS, build_observation_space
+from sssnake.env.utils.env_helpers import load_config
+from sssnake.env.utils.schema import (
+    OBS_FORMATS,
+    STATIC_OBS_KEYS,
+    build_flat_observation_space,
+    build_observation_space,
+    split_obs_keys,
+)
 from sssnake.env.utils.snake_action import SnakeAction
 from sssnake.env.utils.state_def import (
+    EnvSnapshot,
     FullState,
     InfoDict,
+    ObsBuffers,
     ObservationDict,
+    ObsSensors,
     RenderState,
+    SimulationResult,
 )
 
 
@@ -33,7 +53,17 @@ class EnvEngine(gym.Env):
 
     metadata = {"render_modes": ["rgb_array"]}
 
-    def __init__(self, env_spec_in: EnvSpec | None = None, render_mode: str | None = None) -> None:
+    def __init__(
+        self,
+        env_spec_in: EnvSpec | None = None,
+        render_mode: str | None = None,
+        obs_format: str = "dict",
+        obs_keys: Sequence[str] | None = None,
+        static_obs_on_reset: bool = False,
+        profile: bool = False,
+        preallocate: bool = False,
+        map_pool: MapPool | None = None,
+    ) -> None:
         super().__init__()
         self.last_reset_options: ResetOptions | None = None
 
@@ -48,29 +78,69 @@ class EnvEngine(gym.Env):
         if render_mode not in {None, "rgb_array"}:
             raise ValueError(f"Rendermode '{render_mode}' not supported.")
 
+        if obs_format not in OBS_FORMATS:
+            raise ValueError(f"Observation format '{obs_format}' not supported.")
+
+        if preallocate and obs_format == "dict":
+            raise ValueError("Preallocation needs the 'array' or 'flat' observation format.")
+
         self.num_steps: int = 0
         self.render_mode = render_mode
         self.np_random: np.random.Generator
 
-        self.obs_keys = DEFAULT_OBS_KEYS
+        # With static_obs_on_reset, keys constant for the episode go to the reset info only.
+        self.obs_keys, self.static_obs_keys = split_obs_keys(obs_keys, static_obs_on_reset)
 
         self.action_space = spaces.Discrete(len(SnakeAction))
+        self.obs_format = obs_format
         self.observation_space = build_observation_space(env_spec, self.obs_keys)
 
+        # Non-dict formats reuse the same typed arrays every step instead of building new objects.
+        self.obs_buffers: ObsBuffers | None = None
+        if obs_format != "dict":
+            self.obs_buffers = ObsBuffers(self.observation_space, flat=obs_format == "flat")
+            if obs_format == "flat":
+                self.observation_space = build_flat_observation_space(self.observation_space)
+
         self.env_spec = env_spec
         self.state: FullState = FullState.initial(self.env_spec, self.last_reset_options)
+        self.obs_sensors = ObsSensors(env_spec)
 
-        self.head_path: List[Tuple[float, float]] = []
         self.segment_length = self.env_spec.tail_segment_length
+        self.head_path = HeadPath(self.env_spec.tail_max_segment * self.segment_length)
+        self.segment_distances = (
+            np.arange(1, self.env_spec.tail_max_segment + 1) * self.segment_length
+        )
 
-        self.env_collision = EnvCollision(env_spec)
+        # Preallocated envs size everything at reset, steady-state steps allocate no arrays. An
+        # opted-in tail grid is replaced by the brute force check, whose buffers don't churn.
+        self.preallocate = preallocate
+        self.env_collision = EnvCollision(
+            env_spec,
+            tail_grid=env_spec.tail_collision_grid and not preallocate,
+            preallocate=preallocate,
+        )
         self.env_candies = EnvCandies(env_spec)
 
+        self._simulator: SssnakeVectorEnv | None = None
+
+        # Generated obstacles, drawn as the render background instead of the bitmap.
+        self.obstacles_map: np.ndarray | None = None
+
+        # With a map pool every reset picks one of its preloaded maps instead of the bitmap path.
+        self.map_pool = map_pool
+        if map_pool is None and env_spec.map_pool:
+            self.map_pool = load_map_pool(env_spec, self.last_reset_options.map_size)
+
+        # Profiling wraps the phases on this instance, a plain env runs the methods untouched.
+        self.metrics: EnvMetrics | None = None
+        if profile:
+            self.metrics = EnvMetrics()
+            instrument_env(self, self.metrics)
+
     def reset(
         self, *, seed: int | None = None, options: Dict[str, Any] | ResetOptions | None = None
     ):
-        self.np_random, seed = seeding.np_random(seed)
-
         if options is not None:
             if isinstance(options, dict):
                 self.last_reset_options = ResetOptions.from_dict(options)
@@ -88,15 +158,20 @@ class EnvEngine(gym.Env):
 
         self.num_steps = 0
 
+        if self.preallocate:
+            self.head_path.reserve(self.path_capacity(), max_samples=self.env_spec.tail_max_segment)
+
         self.place_head(reset_opts.start_pos_coords)
+        self.env_collision.update_tail_index(self.state)
 
         self.env_candies.set_map_size(self.state.map_size)
         self.prepare_collision_map(reset_opts)
         self.init_candies()
 
         info: InfoDict = {}
-        obs: ObservationDict = self.state.to_obs(self.obs_keys)
-        return obs, info
+        if self.static_obs_keys:
+            info["static_obs"] = self.get_static_obs(self.static_obs_keys)
+        return self.get_obs(), info
 
     def step(self, action_int: int):
         assert self.state is not None, "Environment not reset!"
@@ -113,24 +188,61 @@ class EnvEngine(gym.Env):
 
         if self.env_collision.hit_anything(self.state):
             terminated = True
-            obs: ObservationDict = self.state.to_obs(self.obs_keys)
             current_reward = -1
-            return obs, current_reward, terminated, truncated, info
+            return self.get_obs(), current_reward, terminated, truncated, info
 
-        if self.env_candies.met_candy(self.state):
+        met_candy = self.env_candies.met_candy(self.state)
+        if met_candy:
             if self.env_spec.tail_max_segment > self.state.segments_num:
                 self.add_segment()
             current_reward = 1
-            self.state.candy_position = self.env_candies.random_candy_pos(self.state)
 
         self.update_body_segments()
+
+        if met_candy:
+            # Placed after the body moved, so that tail avoidance sees the current segments
+            self.state.candy_position = self.env_candies.random_candy_pos(self.state)
+
+        self.env_collision.update_tail_index(self.state)
         self.num_steps += 1
 
         truncated = self.num_steps >= self.env_spec.max_num_steps
 
-        observation: ObservationDict = self.state.to_obs(self.obs_keys)
+        return self.get_obs(), current_reward, terminated, truncated, info
+
+    def get_obs(self) -> ObservationDict | np.ndarray:
+        """
+        Builds the observation in the format chosen at construction.
+        """
+
+        if self.obs_buffers is None:
+            return self.state.to_obs(self.obs_keys, sensors=self.obs_sensors)
 
-        return observation, current_reward, terminated, truncated, info
+        obs = self.state.to_obs(self.obs_keys, out=self.obs_buffers, sensors=self.obs_sensors)
+        if self.obs_buffers.flat is not None:
+            return self.obs_buffers.flat
+        return obs
+
+    def get_static_obs(self, keys: Sequence[str] = STATIC_OBS_KEYS) -> ObservationDict:
+        """
+        Returns the observation keys which stay constant for the whole episode.
+        """
+
+        return self.state.to_obs(keys, sensors=self.obs_sensors)
+
+    def path_capacity(self) -> int:
+        """
+        Upper bound on the points kept by the head path during the episode: the steps the head
+        needs to cover the longest tail, and no more than the steps of the episode.
+        """
+
+        points = inf
+        if self.state.speed > 0:
+            points = self.head_path.max_distance / self.state.speed + 3
+        points = min(points, self.env_spec.max_num_steps + 2)
+
+        # With neither bound the path keeps growing on demand.
+        return 0 if isinf(points) else ceil(points)
 
     def place_head(self, start_coords: Tuple[float, float]):
         """
@@ -142,18 +254,18 @@ class EnvEngine(gym.Env):
             start_coords[1] * self.state.map_size,
         )
 
-        self.head_path = [self.state.head_position]
+        self.head_path.reset(self.state.head_position)
 
     def move_head(self):
         """
         Moves the head in accordance with its direction and speed.
         """
 
-        ang = radians(self.state.head_direction)
-        dx, dy = sin(ang) * self.state.speed, cos(ang) * self.state.speed
         x, y = self.state.head_position
 
-        self.state.head_position = (x + dx, y + dy)
+        self.state.head_position = kernels.advance(
+            x, y, self.state.head_direction, self.state.speed
+        )
         self.head_path.append(self.state.head_position)
 
     def apply_turn(self, action):
@@ -161,49 +273,26 @@ class EnvEngine(gym.Env):
         Apply the current turn's action.
         """
 
-        if action is SnakeAction.LEFT:
-            self.state.head_direction += self.state.turnspeed
-        elif action is SnakeAction.RIGHT:
-            self.state.head_direction -= self.state.turnspeed
-        elif action is SnakeAction.NONE:
-            pass
-
-        self.state.head_direction %= 360.0
+        self.state.head_direction = kernels.turn(
+            self.state.head_direction, action, self.state.turnspeed
+        )
 
     def update_body_segments(self):
         """
         Updates the positions of snake's body segments.
         """
 
-        for i in range(self.state.segments_num):
-            distance_behind_head = (i + 1) * self.segment_length
-            self.state.segments_positions[i] = self.get_position_on_path(distance_behind_head)
+        n = self.state.segments_num
+        if n == 0:
+            return
+        self.head_path.sample(self.segment_distances[:n], self.state.segments_positions[:n])
 
     def get_position_on_path(self, distance_behind_head):
         """
         Calculates the position on snake's path for a certain distance behind head.
         """
 
-        if len(self.head_path) < 2:
-            return self.head_path[0] if self.head_path else (0, 0)
-
-        accumulated = 0.0
-
-        for idx in range(len(self.head_path) - 1, 0, -1):
-            x1, y1 = self.head_path[idx]
-            x0, y0 = self.head_path[idx - 1]
-
-            seg_len = math.sqrt((x1 - x0) ** 2 + (y1 - y0) ** 2)
-            if accumulated + seg_len >= distance_behind_head:
-                ratio = (distance_behind_head - accumulated) / seg_len
-
-                x = x1 + (x0 - x1) * ratio
-                y = y1 + (y0 - y1) * ratio
-                return x, y
-            else:
-                accumulated += seg_len
-
-        return self.head_path[0]
+        return self.head_path.position_at(distance_behind_head)
 
     def add_segment(self):
         """
@@ -247,18 +336,43 @@ class EnvEngine(gym.Env):
     def prepare_collision_map(self, reset_options: ResetOptions):
         """
         Loads and sets up the obstacles map for snake's collision and EnvCandies candies generation.
+        Maps derived from the same bitmap and parameters are reused from MAP_CACHE, with a map pool
+        one of its maps is picked with np_random instead. A map_generator in the reset options
+        generates a new map with np_random on every reset.
         """
-        map_size = reset_options.map_size
-        obstacles_map = load_obstacles_map(
-            reset_options.map_bitmap_path, self.env_spec.collision_map_resolution
-        )
+        if reset_options.map_generator:
+            maps = generate_collision_maps(self.env_spec, reset_options, self.np_random)
+        elif self.map_pool is not None:
+            maps = self.pick_pool_map(reset_options)
+        else:
+            maps = load_collision_maps(self.env_spec, reset_options)
+
+        self.obstacles_map = maps.obstacles_map if reset_options.map_generator else None
 
         assert self.state is not None
-        self.state.safe_map_snake = generate_safe_map(
-            self.env_collision.obstacle_hit_distance, map_size, obstacles_map
-        )
+        self.state.safe_map_snake = maps.safe_map_snake
+
+        self.env_candies.free_pos_candy = maps.free_pos_candy
+
+    def pick_pool_map(self, reset_options: ResetOptions) -> CollisionMaps:
+        """
+        Picks a map of the pool, preloading the pool again if the map size changed. The picked
+        bitmap becomes the map_bitmap_path of last_reset_options, which rendering draws.
+        """
+
+        assert self.map_pool is not None
+        if not self.map_pool.matches(self.env_spec, reset_options.map_size):
+            if not self.env_spec.map_pool:
+                raise ValueError(
+                    f"The map pool was built for map size {self.map_pool.map_size} and "
+                    f"{self.map_pool.params}, not for map size {reset_options.map_size} and "
+                    "the env spec."
+                )
+            self.map_pool = load_map_pool(self.env_spec, reset_options.map_size)
 
-        self.env_candies.generate_free_cells_candy(obstacles_map)
+        i = self.map_pool.pick(self.np_random)
+        self.last_reset_options = replace(reset_options, map_bitmap_path=self.map_pool.paths[i])
+        return self.map_pool[i]
 
     def init_candies(self):
         """
@@ -276,9 +390,115 @@ class EnvEngine(gym.Env):
             return state_to_array(
                 RenderState.from_full_state(self.state),
                 self.last_reset_options.map_bitmap_path,
+                obstacles_map=self.obstacles_map,
+                engine=self.env_spec.render_engine,
+                angle_steps=self.env_spec.render_angle_steps,
             )
         else:
             raise NotImplementedError(f"Render mode '{self.render_mode}' is not supported.")
 
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Returns the cumulative seconds and calls per step phase, and the event counters.
+        """
+
+        if self.metrics is None:
+            raise RuntimeError("Profiling is disabled, create the env with profile=True.")
+        return self.metrics.as_dict()
+
+    def reset_metrics(self):
+        if self.metrics is not None:
+            self.metrics.clear()
+
+    def snapshot(self) -> EnvSnapshot:
+        """
+        Captures everything needed to continue the episode identically after restore().
+        """
+
+        return EnvSnapshot(
+            state=replace(self.state, segments_positions=self.state.segments_positions.copy()),
+            path_positions=self.head_path.positions.copy(),
+            path_arc_lengths=self.head_path.arc_lengths.copy(),
+            num_steps=self.num_steps,
+            rng_state=self.np_random.bit_generator.state,
+            reset_options=self.last_reset_options,
+            free_pos_candy=self.env_candies.free_pos_candy,
+            candy_cell_index=self.env_candies.cell_index,
+            obstacles_map=self.obstacles_map,
+        )
+
+    def restore(self, snapshot: EnvSnapshot):
+        """
+        Brings the env back to a snapshot. The same snapshot can be restored any number of times.
+        """
+
+        self.state = replace(
+            snapshot.state, segments_positions=snapshot.state.segments_positions.copy()
+        )
+        self.head_path.load(snapshot.path_positions, snapshot.path_arc_lengths)
+        self.num_steps = snapshot.num_steps
+        self.last_reset_options = snapshot.reset_options
+        self.obstacles_map = snapshot.obstacles_map
+
+        self.np_random.bit_generator.state = snapshot.rng_state
+        self.env_candies.set_rng(self.np_random)
+        self.env_candies.set_map_size(self.state.map_size)
+        self.env_candies.set_free_cells(snapshot.free_pos_candy, snapshot.candy_cell_index)
+
+        # The grid re-buckets only the segments whose cell differs from the restored state.
+        self.env_collision.update_tail_index(self.state)
+
+    def simulate(self, actions: np.ndarray) -> SimulationResult:
+        """
+        Rolls K action sequences of length H (actions of shape (K, H)) out of the current state,
+        vectorized over K with the same dynamics as step(). The env itself isn't modified.
+        """
+
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.ndim != 2:
+            raise ValueError(f"Expected actions of shape (K, H), got {actions.shape}.")
+
+        k, h = actions.shape
+        if self._simulator is None or self._simulator.num_envs != k:
+            # Maps come from the snapshot, the simulator never picks one from the pool.
+            self._simulator = SssnakeVectorEnv(
+                num_envs=k,
+                env_spec_in=replace(self.env_spec, map_pool=""),
+                copy=False,
+                obs_keys=["head_position"],
+            )
+
+        sim = self._simulator
+        sim.load_snapshot(self.snapshot())
+
+        step_rewards = np.zeros((k, h), dtype=np.float64)
+        terminated_at = np.full(k, -1, dtype=np.int64)
+        truncated_at = np.full(k, -1, dtype=np.int64)
+        final_heads = np.empty((k, 2), dtype=np.float64)
+        running = np.ones(k, dtype=np.bool_)
+
+        for t in range(h):
+            _, rewards, terminated, truncated, _ = sim.step(actions[:, t])
+            step_rewards[running, t] = rewards[running]
+
+            ended = running & (terminated | truncated)
+            final_heads[ended] = sim.head_position[ended]
+            terminated_at[ended & terminated] = t
+            truncated_at[ended & ~terminated] = t
+            running &= ~ended
+
+            if not running.any():
+                break
+
+        final_heads[running] = sim.head_position[running]
+
+        return SimulationResult(
+            rewards=step_rewards.sum(axis=1),
+            step_rewards=step_rewards,
+            terminated_at=terminated_at,
+            truncated_at=truncated_at,
+            final_head_positions=final_heads,
+        )
+
     def get_state(self) -> FullState | None:
         return deepcopy(self.state)
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+
+class HeadPath:
+    """
+    Bounded history of the head's positions, kept in a preallocated NumPy ring buffer.
+
+    Every point stores the cumulative arc length of the path, so a position at a given distance
+    behind the head is found by a binary search instead of walking the path. Points farther than
+    max_distance behind the head can never be sampled again and are dropped.
+    """
+
+    def __init__(self, max_distance: float, capacity: int = 64) -> None:
+        self.max_distance = max_distance
+
+        self._capacity = max(2, capacity)
+        self._xy = np.zeros((2 * self._capacity, 2), dtype=np.float64)
+        self._s = np.zeros(2 * self._capacity, dtype=np.float64)
+        self._start = 0
+        self._len = 0
+
+        self._cursors: SampleCursors | None = None
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, idx: int) -> Tuple[float, float]:
+        if idx < 0:
+            idx += self._len
+        if not 0 <= idx < self._len:
+            raise IndexError("HeadPath index out of range")
+
+        x, y = self._xy[self._start + idx]
+        return float(x), float(y)
+
+    @property
+    def positions(self) -> np.ndarray:
+        """
+        Contiguous view of the stored points, from the oldest to the head.
+        """
+
+        return self._xy[self._start : self._start + self._len]
+
+    @property
+    def arc_lengths(self) -> np.ndarray:
+        """
+        Contiguous view of the cumulative arc lengths of the stored points.
+        """
+
+        return self._s[self._start : self._start + self._len]
+
+    def reset(self, position: Tuple[float, float]):
+        """
+        Clears the path, starting it at the given position.
+        """
+
+        self._start = 0
+        self._len = 0
+        self._write(position, 0.0)
+
+        if self._cursors is not None:
+            self._cursors.count = 0
+
+    def append(self, position: Tuple[float, float]):
+        """
+        Adds a new head position and forgets the points which can't be sampled anymore.
+        """
+
+        if self._len == 0:
+            self._write(position, 0.0)
+            return
+
+        last = self._start + self._len - 1
+        x0, y0 = self._xy[last]
+        dx, dy = position[0] - x0, position[1] - y0
+        s = float(self._s[last]) + math.sqrt(dx * dx + dy * dy)
+
+        self._trim(s - self.max_distance)
+
+        if self._len == self._capacity:
+            self._grow()
+
+        self._write(position, s)
+
+    def position_at(self, distance_behind_head: float) -> Tuple[float, float]:
+        """
+        Returns the interpolated position at a given distance behind the head.
+        """
+
+        if self._len == 0:
+            return 0.0, 0.0
+
+        s_path = self.arc_lengths
+        target = s_path[-1] - distance_behind_head
+
+        k1 = int(np.searchsorted(s_path, target, side="right"))
+        if k1 == 0:
+            return self[0]
+
+        first = self._start
+        s0, s1 = s_path[k1 - 1], s_path[k1]
+        x0, y0 = self._xy[first + k1 - 1]
+        x1, y1 = self._xy[first + k1]
+
+        ratio = (s1 - target) / (s1 - s0)
+        return float(x1 + (x0 - x1) * ratio), float(y1 + (y0 - y1) * ratio)
+
+    def sample(self, distances_behind_head: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """
+        Writes the positions at all the given distances behind the head into out.
+        """
+
+        if len(distances_behind_head) == 0:
+            return out
+
+        if self._len == 0:
+            out[...] = 0.0
+            return out
+
+        if self._cursors is not None:
+            return self._cursors.sample(
+                self.positions, self.arc_lengths, distances_behind_head, out
+            )
+
+        return sample_path(self.positions, self.arc_lengths, distances_behind_head, out)
+
+    def reserve(self, capacity: int, max_samples: int = 0):
+        """
+        Preallocates room for capacity points and the buffers of sample() for up to max_samples
+        distances, after which neither appending nor sampling allocates arrays.
+
+        Reserved sampling keeps the path index found for every distance and advances it as the
+        head moves, instead of searching the path again. It expects the same positive distances
+        on every call, like the fixed distances of the body segments.
+        """
+
+        if capacity > self._capacity:
+            self._resize(capacity)
+
+        if max_samples and (self._cursors is None or len(self._cursors.index) < max_samples):
+            self._cursors = SampleCursors(max_samples)
+
+    def load(self, positions: np.ndarray, arc_lengths: np.ndarray):
+        """
+        Replaces the path with the given points, e.g. copies of positions and arc_lengths taken
+        earlier.
+        """
+
+        n = len(arc_lengths)
+        if n > self._capacity:
+            self._capacity = 1 << (n - 1).bit_length()
+            self._xy = np.zeros((2 * self._capacity, 2), dtype=np.float64)
+            self._s = np.zeros(2 * self._capacity, dtype=np.float64)
+
+        self._xy[:n] = self._xy[self._capacity : self._capacity + n] = positions
+        self._s[:n] = self._s[self._capacity : self._capacity + n] = arc_lengths
+        self._start = 0
+        self._len = n
+
+        if self._cursors is not None:
+            self._cursors.count = 0
+
+    def _write(self, position: Tuple[float, float], s: float):
+        idx = (self._start + self._len) % self._capacity
+
+        # Every point is mirrored, so the window is always contiguous in the doubled buffer.
+        self._xy[idx] = self._xy[idx + self._capacity] = position
+        self._s[idx] = self._s[idx + self._capacity] = s
+        self._len += 1
+
+    def _trim(self, limit: float):
+        """
+        Keeps the newest point lying at least max_distance behind the head and anything newer.
+        """
+
+        k = int(np.searchsorted(self.arc_lengths, limit, side="right")) - 1
+        if k > 0:
+            self._start = (self._start + k) % self._capacity
+            self._len -= k
+
+            if self._cursors is not None:
+                self._cursors.shift(k)
+
+    def _grow(self):
+        self._resize(2 * self._capacity)
+
+    def _resize(self, capacity: int):
+        xy, s = self.positions.copy(), self.arc_lengths.copy()
+
+        self._capacity = capacity
+        self._xy = np.zeros((2 * self._capacity, 2), dtype=np.float64)
+        self._s = np.zeros(2 * self._capacity, dtype=np.float64)
+
+        n = len(s)
+        self._xy[:n] = self._xy[self._capacity : self._capacity + n] = xy
+        self._s[:n] = self._s[self._capacity : self._capacity + n] = s
+        self._start = 0
+
+
+def sample_path(
+    positions: np.ndarray,
+    arc_lengths: np.ndarray,
+    distances_behind_head: np.ndarray,
+    out: np.ndarray,
+) -> np.ndarray:
+    """
+    Interpolates positions at many distances behind the last point of a path in one pass.
+
+    Distances reaching past the beginning of the path resolve to its first point.
+    """
+
+    n = len(arc_lengths)
+    if n < 2:
+        out[...] = positions[0]
+        return out
+
+    target = arc_lengths[-1] - distances_behind_head
+
+    k1 = np.searchsorted(arc_lengths, target, side="right")
+    inside = k1 > 0
+    k1 = np.clip(k1, 1, n - 1)
+
+    s0, s1 = arc_lengths[k1 - 1], arc_lengths[k1]
+    p0, p1 = positions[k1 - 1], positions[k1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = ((s1 - target) / (s1 - s0))[:, None]
+        out[...] = np.where(inside[:, None], p1 + (p0 - p1) * ratio, positions[0])
+    return out
+
+
+class SampleCursors:
+    """
+    Preallocated buffers of a reserved HeadPath.sample(), along with the index of the path point
+    following each sampled distance (searchsorted clipped to 1..len - 1), valid for the first
+    count distances.
+
+    Every distance's target arc length only grows as the head moves, so its index only advances,
+    usually by a point or none per step. Coordinates are handled one axis at a time in 1-D
+    buffers, ufuncs broadcasting over (n, 2) arrays allocate buffers of their own.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.count = 0
+        self.index = np.ones(size, dtype=np.intp)
+
+        self._flat_index = np.zeros(size, dtype=np.intp)
+        self._target = np.zeros(size, dtype=np.float64)
+        self._s0 = np.zeros(size, dtype=np.float64)
+        self._s1 = np.zeros(size, dtype=np.float64)
+        self._c0 = np.zeros(size, dtype=np.float64)
+        self._c1 = np.zeros(size, dtype=np.float64)
+        self._mask = np.zeros(size, dtype=np.bool_)
+
+    def shift(self, dropped: int):
+        """
+        Follows the path dropping its oldest points.
+        """
+
+        index = self.index[: self.count]
+        np.subtract(index, dropped, out=index)
+        np.maximum(index, 1, out=index)
+
+    def sample(
+        self,
+        positions: np.ndarray,
+        arc_lengths: np.ndarray,
+        distances_behind_head: np.ndarray,
+        out: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Same result as sample_path, computed in the preallocated buffers.
+        """
+
+        n = len(arc_lengths)
+        m = len(distances_behind_head)
+        if n < 2:
+            out[...] = positions[0]
+            self.count = 0
+            return out
+
+        target = self._target[:m]
+        np.subtract(arc_lengths[-1], distances_behind_head, out=target)
+
+        k1 = self.index[:m]
+        if self.count < m:
+            new = slice(self.count, m)
+            k1[new] = np.searchsorted(arc_lengths, target[new], side="right")
+            np.clip(k1[new], 1, n - 1, out=k1[new])
+        self.count = m
+
+        # Positive distances keep every target before the last point, so the indices stop there.
+        s0, s1, ahead = self._s0[:m], self._s1[:m], self._mask[:m]
+        while True:
+            np.take(arc_lengths, k1, out=s1, mode="clip")
+            np.less_equal(s1, target, out=ahead)
+            if not ahead.any():
+                break
+            np.add(k1, 1, out=k1, where=ahead)
+
+        k0 = self._flat_index[:m]
+        np.subtract(k1, 1, out=k0)
+        np.take(arc_lengths, k0, out=s0, mode="clip")
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # s1 becomes the interpolation ratio, s0 the length of the path piece.
+            np.subtract(s1, s0, out=s0)
+            np.subtract(s1, target, out=s1)
+            np.divide(s1, s0, out=s1)
+
+        # Point k of the contiguous positions holds its x at 2k and its y at 2k + 1.
+        flat = positions.reshape(-1)
+        c0, c1 = self._c0[:m], self._c1[:m]
+        for axis in (0, 1):
+            np.multiply(k1, 2, out=k0)
+            np.add(k0, axis - 2, out=k0)
+            np.take(flat, k0, out=c0, mode="clip")
+            np.add(k0, 2, out=k0)
+            np.take(flat, k0, out=c1, mode="clip")
+
+            np.subtract(c0, c1, out=c0)
+            np.multiply(c0, s1, out=c0)
+            np.add(c1, c0, out=c0)
+            # Casting in copyto, a casting ufunc would allocate its buffers.
+            np.copyto(out[:, axis], c0)
+
+        # Distances reaching past the beginning of the path resolve to its first point.
+        np.less(target, arc_lengths[0], out=ahead)
+        if ahead.any():
+            out[ahead] = positions[0]
+        return out
@@ -0,0 +1,507 @@
+"""
+Physics of the snake on plain floats and arrays, independent of gym.
+
+Scalar kernels advance a single snake. They are plain Python, the fastest option for a single env
+stepped from Python, and EnvEngine / EnvCollision / EnvCandies call them.
+
+Batched kernels advance the rows idx of struct-of-arrays state (SssnakeVectorEnv) in place. With
+Numba installed they are compiled loops, otherwise NumPy implementations are used. BACKEND names
+the active implementation; set SSSNAKE_KERNELS=numpy to force the NumPy one. The lidar kernel
+cast_rays only exists compiled, LidarSensor has its own NumPy implementation.
+
+Head paths are stored per row in path_xy (n, capacity, 2) / path_s (n, capacity), between the
+row's start column and the write column end shared by all rows.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # pragma: no cover - depends on the environment
+    numba = None
+
+from sssnake.env.utils.snake_action import SnakeAction
+
+KERNEL_BACKENDS = ("numba", "numpy")
+
+_LEFT = int(SnakeAction.LEFT)
+_RIGHT = int(SnakeAction.RIGHT)
+
+
+# Scalar kernels
+
+
+def turn(direction: float, action: int, turnspeed: float) -> float:
+    """
+    Returns the head direction, in degrees, after applying the action.
+    """
+
+    if action == _LEFT:
+        direction += turnspeed
+    elif action == _RIGHT:
+        direction -= turnspeed
+    return direction % 360.0
+
+
+def advance(x: float, y: float, direction: float, speed: float) -> Tuple[float, float]:
+    """
+    Returns the head position after moving one step along its direction.
+    """
+
+    ang = math.radians(direction)
+    return x + math.sin(ang) * speed, y + math.cos(ang) * speed
+
+
+def hit_wall(x: float, y: float, map_size: float, distance: float) -> bool:
+    return (
+        abs(x) < distance
+        or abs(y) < distance
+        or abs(x - map_size) < distance
+        or abs(y - map_size) < distance
+    )
+
+
+def hit_obstacle(x: float, y: float, map_size: float, safe_map: np.ndarray) -> bool:
+    """
+    Checks the head against the safe map, whose unsafe cells are 0.
+    """
+
+    h, w = safe_map.shape
+    px = max(0, min(w - 1, int(x / map_size * w)))
+    py = max(0, min(h - 1, int(y / map_size * h)))
+    return safe_map[py, px] == 0
+
+
+def within(x0: float, y0: float, x1: float, y1: float, distance: float) -> bool:
+    return math.hypot(x0 - x1, y0 - y1) < distance
+
+
+# Batched kernels, NumPy implementations
+
+
+def turn_heads_numpy(
+    direction: np.ndarray, turnspeed: np.ndarray, actions: np.ndarray, idx: np.ndarray
+):
+    """
+    Applies actions (one per row of idx) to the head directions.
+    """
+
+    d = direction[idx]
+    d = np.where(actions == _LEFT, d + turnspeed[idx], d)
+    d = np.where(actions == _RIGHT, d - turnspeed[idx], d)
+    direction[idx] = d % 360.0
+
+
+def move_heads_numpy(
+    head: np.ndarray,
+    direction: np.ndarray,
+    speed: np.ndarray,
+    path_xy: np.ndarray,
+    path_s: np.ndarray,
+    end: int,
+    idx: np.ndarray,
+):
+    """
+    Moves the heads one step and writes them into the path column end.
+    """
+
+    ang = np.radians(direction[idx])
+    spd = speed[idx]
+
+    old = head[idx]
+    new = np.empty_like(old)
+    new[:, 0] = old[:, 0] + np.sin(ang) * spd
+    new[:, 1] = old[:, 1] + np.cos(ang) * spd
+    head[idx] = new
+
+    d = new - path_xy[idx, end - 1]
+    path_xy[idx, end] = new
+    path_s[idx, end] = path_s[idx, end - 1] + np.sqrt(d[:, 0] ** 2 + d[:, 1] ** 2)
+
+
+def hit_anything_numpy(
+    head: np.ndarray,
+    map_size: np.ndarray,
+    segments: np.ndarray,
+    counts: np.ndarray,
+    safe_map: np.ndarray,
+    wall_distance: float,
+    tail_distance: float,
+    idx: np.ndarray,
+) -> np.ndarray:
+    """
+    Checks the heads of the rows idx against their tails, the walls and the obstacles.
+    """
+
+    h = head[idx]
+    size = map_size[idx]
+
+    hit = ((np.abs(h) < wall_distance) | (np.abs(h - size[:, None]) < wall_distance)).any(axis=1)
+
+    rows, cols = safe_map.shape
+    px = np.clip((h[:, 0] / size * cols).astype(np.int64), 0, cols - 1)
+    py = np.clip((h[:, 1] / size * rows).astype(np.int64), 0, rows - 1)
+    hit |= safe_map[py, px] == 0
+
+    n = counts[idx]
+    longest = int(n.max(initial=0))
+    if longest:
+        d = segments[idx, :longest] - h[:, None, :]
+        close = np.hypot(d[..., 0], d[..., 1]) < tail_distance
+        close &= np.arange(longest) < n[:, None]
+        hit |= close.any(axis=1)
+
+    return hit
+
+
+def met_candies_numpy(
+    head: np.ndarray, candy: np.ndarray, distance: float, idx: np.ndarray
+) -> np.ndarray:
+    d = head[idx] - candy[idx]
+    return np.hypot(d[:, 0], d[:, 1]) < distance
+
+
+def trim_paths_numpy(
+    path_s: np.ndarray, start: np.ndarray, end: int, max_distance: float, idx: np.ndarray
+):
+    """
+    Moves the start columns past the points which lie more than max_distance behind the heads,
+    keeping the newest such point.
+    """
+
+    limit = path_s[idx, end] - max_distance
+
+    first = start[idx]
+    nxt = np.minimum(first + 1, end)
+    movable = path_s[idx, nxt] <= limit
+    while movable.any():
+        first = np.where(movable, nxt, first)
+        nxt = np.minimum(first + 1, end)
+        movable &= path_s[idx, nxt] <= limit
+    start[idx] = first
+
+
+def sample_paths_numpy(
+    path_xy: np.ndarray,
+    path_s: np.ndarray,
+    start: np.ndarray,
+    end: int,
+    counts: np.ndarray,
+    segment_length: float,
+    segments: np.ndarray,
+    idx: np.ndarray,
+):
+    """
+    Samples the body segments of the rows idx from their paths, all at once. Segment k lies
+    (k + 1) * segment_length behind the head, or at the path's first point if it is shorter.
+    """
+
+    n = counts[idx]
+    total = int(n.sum())
+    if total == 0:
+        return
+
+    rows = np.repeat(idx, n)
+    offsets = np.cumsum(n) - n
+    seg = np.arange(total) - np.repeat(offsets, n)
+
+    target = path_s[rows, end] - (seg + 1) * segment_length
+
+    # Batched binary search for the first path point farther along than the target.
+    lo = start[rows].copy()
+    hi = np.full(total, end + 1, dtype=np.int64)
+    while True:
+        open_ = lo < hi
+        if not open_.any():
+            break
+        mid = (lo + hi) >> 1
+        beyond = path_s[rows, np.minimum(mid, end)] > target
+        hi = np.where(open_ & beyond, mid, hi)
+        lo = np.where(open_ & ~beyond, mid + 1, lo)
+
+    positions = path_xy[rows, start[rows]]
+
+    inside = lo > start[rows]
+    r, k1 = rows[inside], lo[inside]
+    s0, s1 = path_s[r, k1 - 1], path_s[r, k1]
+    p0, p1 = path_xy[r, k1 - 1], path_xy[r, k1]
+    ratio = ((s1 - target[inside]) / (s1 - s0))[:, None]
+    positions[inside] = p1 + (p0 - p1) * ratio
+
+    segments[rows, seg] = positions
+
+
+# Batched kernels, loop implementations compiled by Numba
+
+
+def turn_heads_loop(direction, turnspeed, actions, idx):
+    for j in range(idx.shape[0]):
+        i = idx[j]
+        d = direction[i]
+        if actions[j] == _LEFT:
+            d += turnspeed[i]
+        elif actions[j] == _RIGHT:
+            d -= turnspeed[i]
+        direction[i] = d % 360.0
+
+
+def move_heads_loop(head, direction, speed, path_xy, path_s, end, idx):
+    for j in range(idx.shape[0]):
+        i = idx[j]
+        ang = math.radians(direction[i])
+        x = head[i, 0] + math.sin(ang) * speed[i]
+        y = head[i, 1] + math.cos(ang) * speed[i]
+        head[i, 0] = x
+        head[i, 1] = y
+
+        dx = x - path_xy[i, end - 1, 0]
+        dy = y - path_xy[i, end - 1, 1]
+        path_xy[i, end, 0] = x
+        path_xy[i, end, 1] = y
+        path_s[i, end] = path_s[i, end - 1] + math.sqrt(dx * dx + dy * dy)
+
+
+def hit_anything_loop(
+    head, map_size, segments, counts, safe_map, wall_distance, tail_distance, idx
+):
+    rows, cols = safe_map.shape
+    hit = np.zeros(idx.shape[0], dtype=np.bool_)
+
+    for j in range(idx.shape[0]):
+        i = idx[j]
+        x, y, size = head[i, 0], head[i, 1], map_size[i]
+
+        if (
+            abs(x) < wall_distance
+            or abs(y) < wall_distance
+            or abs(x - size) < wall_distance
+            or abs(y - size) < wall_distance
+        ):
+            hit[j] = True
+            continue
+
+        px = max(0, min(cols - 1, int(x / size * cols)))
+        py = max(0, min(rows - 1, int(y / size * rows)))
+        if safe_map[py, px] == 0:
+            hit[j] = True
+            continue
+
+        for k in range(counts[i]):
+            if math.hypot(segments[i, k, 0] - x, segments[i, k, 1] - y) < tail_distance:
+                hit[j] = True
+                break
+
+    return hit
+
+
+def met_candies_loop(head, candy, distance, idx):
+    met = np.zeros(idx.shape[0], dtype=np.bool_)
+    for j in range(idx.shape[0]):
+        i = idx[j]
+        met[j] = math.hypot(head[i, 0] - candy[i, 0], head[i, 1] - candy[i, 1]) < distance
+    return met
+
+
+def trim_paths_loop(path_s, start, end, max_distance, idx):
+    for j in range(idx.shape[0]):
+        i = idx[j]
+        limit = path_s[i, end] - max_distance
+        first = start[i]
+        while first < end and path_s[i, first + 1] <= limit:
+            first += 1
+        start[i] = first
+
+
+def sample_paths_loop(path_xy, path_s, start, end, counts, segment_length, segments, idx):
+    for j in range(idx.shape[0]):
+        i = idx[j]
+        first = start[i]
+        # Every target lies behind the previous one, so its point is at most the previous point.
+        hi = end + 1
+        for k in range(counts[i]):
+            target = path_s[i, end] - (k + 1) * segment_length
+
+            lo = first
+            while lo < hi:
+                mid = (lo + hi) >> 1
+                if path_s[i, mid] > target:
+                    hi = mid
+                else:
+                    lo = mid + 1
+
+            if lo > first:
+                s0, s1 = path_s[i, lo - 1], path_s[i, lo]
+                ratio = (s1 - target) / (s1 - s0)
+                for a in range(2):
+                    p0, p1 = path_xy[i, lo - 1, a], path_xy[i, lo, a]
+                    segments[i, k, a] = p1 + (p0 - p1) * ratio
+            else:
+                segments[i, k, 0] = path_xy[i, first, 0]
+                segments[i, k, 1] = path_xy[i, first, 1]
+
+            hi = lo
+
+
+def _inline_kernel(fn: Callable) -> Callable:
+    """
+    Compiles helpers called by the loop kernels, which Numba can only call compiled.
+    """
+
+    return numba.njit(cache=True)(fn) if numba is not None else fn
+
+
+@_inline_kernel
+def _march_ray(safe_map, x, y, dx, dy, cell_x, cell_y, limit):
+    """
+    Distance along the ray to the first unsafe cell it enters before limit, inf when none.
+    Components dx, dy are never 0.
+    """
+
+    rows, cols = safe_map.shape
+    col, row = math.floor(x / cell_x), math.floor(y / cell_y)
+    step_x, step_y = (1 if dx > 0 else -1), (1 if dy > 0 else -1)
+
+    # Distances to the next vertical / horizontal grid line, and between lines.
+    next_x = ((col + (dx > 0)) * cell_x - x) / dx
+    next_y = ((row + (dy > 0)) * cell_y - y) / dy
+    delta_x, delta_y = cell_x / abs(dx), cell_y / abs(dy)
+
+    while True:
+        if next_x < next_y:
+            t = next_x
+            col += step_x
+            next_x += delta_x
+        else:
+            t = next_y
+            row += step_y
+            next_y += delta_y
+        if t >= limit or not (0 <= col < cols and 0 <= row < rows):
+            return math.inf
+        if safe_map[row, col] == 0:
+            return t
+
+
+@_inline_kernel
+def _ray_tail(segments, count, x, y, dx, dy, radius_sq):
+    """
+    Distance along the ray to the first of the count segments, as discs, inf when none.
+    """
+
+    first = math.inf
+    for k in range(count):
+        rel_x, rel_y = segments[k, 0] - x, segments[k, 1] - y
+        along = dx * rel_x + dy * rel_y
+        half_chord_sq = radius_sq - (rel_x * rel_x + rel_y * rel_y - along * along)
+        if half_chord_sq > 0 and along + math.sqrt(half_chord_sq) > 0:
+            first = min(first, max(along - math.sqrt(half_chord_sq), 0.0))
+    return first
+
+
+def cast_rays_loop(
+    head,
+    direction,
+    map_size,
+    safe_map,
+    segments,
+    counts,
+    offset_sin,
+    offset_cos,
+    max_range,
+    tail_radius,
+    march,
+    out,
+):
+    """
+    Lidar of LidarSensor: writes the (wall, obstacle, tail) distances of every ray of every snake
+    into out (B, rays, 3). The safe map is marched cell by cell along each ray (march is False
+    when it has no unsafe cell), stopping at the wall or max_range.
+    """
+
+    rows, cols = safe_map.shape
+
+    for i in range(head.shape[0]):
+        x, y, size = head[i, 0], head[i, 1], map_size[i]
+        ang = math.radians(direction[i])
+        sin_h, cos_h = math.sin(ang), math.cos(ang)
+        cell_x, cell_y = size / cols, size / rows
+        col, row = math.floor(x / cell_x), math.floor(y / cell_y)
+        inside = 0 <= col < cols and 0 <= row < rows
+        start_unsafe = march and inside and safe_map[row, col] == 0
+
+        for r in range(offset_sin.shape[0]):
+            dx = sin_h * offset_cos[r] + cos_h * offset_sin[r]
+            dy = cos_h * offset_cos[r] - sin_h * offset_sin[r]
+            # Axis-aligned rays take huge but finite steps along the other axis.
+            dx = math.copysign(max(abs(dx), 1e-12), dx)
+            dy = math.copysign(max(abs(dy), 1e-12), dy)
+
+            wall = min(((size if dx > 0 else 0.0) - x) / dx, ((size if dy > 0 else 0.0) - y) / dy)
+
+            obstacle = math.inf
+            if start_unsafe:
+                obstacle = 0.0
+            elif march:
+                limit = min(max_range, wall)
+                obstacle = _march_ray(safe_map, x, y, dx, dy, cell_x, cell_y, limit)
+
+            tail = _ray_tail(segments[i], counts[i], x, y, dx, dy, tail_radius * tail_radius)
+
+            out[i, r, 0] = max(0.0, min(wall, max_range))
+            out[i, r, 1] = min(obstacle, max_range)
+            out[i, r, 2] = min(tail, max_range)
+
+
+_NUMPY_KERNELS: Dict[str, Callable] = {
+    "turn_heads": turn_heads_numpy,
+    "move_heads": move_heads_numpy,
+    "hit_anything": hit_anything_numpy,
+    "met_candies": met_candies_numpy,
+    "trim_paths": trim_paths_numpy,
+    "sample_paths": sample_paths_numpy,
+}
+
+_LOOP_KERNELS: Dict[str, Callable] = {
+    "turn_heads": turn_heads_loop,
+    "move_heads": move_heads_loop,
+    "hit_anything": hit_anything_loop,
+    "met_candies": met_candies_loop,
+    "trim_paths": trim_paths_loop,
+    "sample_paths": sample_paths_loop,
+    "cast_rays": cast_rays_loop,
+}
+
+
+def batched_kernels(backend: str) -> Dict[str, Callable]:
+    """
+    Returns the batched kernels of a backend, keyed by name.
+    """
+
+    if backend not in KERNEL_BACKENDS:
+        raise ValueError(f"Kernel backend '{backend}' not supported.")
+    if backend == "numpy":
+        return dict(_NUMPY_KERNELS)
+    if numba is None:
+        raise RuntimeError("The numba kernel backend needs Numba installed.")
+    return {name: numba.njit(cache=True)(fn) for name, fn in _LOOP_KERNELS.items()}
+
+
+BACKEND = "numba" if numba is not None else "numpy"
+if os.environ.get("SSSNAKE_KERNELS") in KERNEL_BACKENDS:
+    BACKEND = os.environ["SSSNAKE_KERNELS"]
+
+_kernels = batched_kernels(BACKEND)
+
+turn_heads = _kernels["turn_heads"]
+move_heads = _kernels["move_heads"]
+hit_anything = _kernels["hit_anything"]
+met_candies = _kernels["met_candies"]
+trim_paths = _kernels["trim_paths"]
+sample_paths = _kernels["sample_paths"]
+# LidarSensor vectorizes its rays itself with the NumPy backend.
+cast_rays: Callable | None = _kernels.get("cast_rays")
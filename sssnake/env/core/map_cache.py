@@ -0,0 +1,386 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from sssnake.env.core.candies import EnvCandies
+from sssnake.env.utils.config_def import EnvSpec, ResetOptions
+from sssnake.env.utils.env_helpers import generate_safe_map, load_obstacles_map
+from sssnake.env.utils.map_generators import generate_obstacles_map, reachable_cells
+from sssnake.env.utils.raster import point_cells
+
+
+@dataclass(frozen=True, slots=True)
+class CollisionMaps:
+    """
+    Maps derived from an obstacles bitmap, shared read-only between resets and envs.
+    """
+
+    obstacles_map: np.ndarray
+    safe_map_snake: np.ndarray
+    free_pos_candy: np.ndarray
+
+    def __post_init__(self) -> None:
+        for arr in (self.obstacles_map, self.safe_map_snake, self.free_pos_candy):
+            arr.setflags(write=False)
+
+
+class MapCache:
+    """
+    LRU cache of CollisionMaps.
+    """
+
+    def __init__(self, maxsize: int = 16) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, CollisionMaps] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> CollisionMaps | None:
+        maps = self._entries.get(key)
+        if maps is not None:
+            self._entries.move_to_end(key)
+        return maps
+
+    def put(self, key: Hashable, maps: CollisionMaps) -> CollisionMaps:
+        self._entries[key] = maps
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return maps
+
+    def clear(self):
+        self._entries.clear()
+
+
+MAP_CACHE = MapCache()
+
+
+def collision_maps_key(env_spec: EnvSpec, reset_options: ResetOptions) -> Tuple[Hashable, ...]:
+    """
+    Builds the cache key: bitmap path and modification time, resolution, margins, safe map engine
+    and map size.
+    """
+
+    path = str(reset_options.map_bitmap_path or "")
+    mtime = os.stat(path).st_mtime_ns if path else None
+
+    return (
+        path,
+        mtime,
+        env_spec.collision_map_resolution,
+        env_spec.hit_obstacle_distance,
+        env_spec.candy_pos_obstacle_distance,
+        env_spec.candy_pos_wall_distance,
+        env_spec.safe_map_engine,
+        reset_options.map_size,
+    )
+
+
+def collision_map_params(env_spec: EnvSpec) -> Dict[str, Any]:
+    """
+    The EnvSpec fields collision maps are derived with.
+    """
+
+    return {
+        "collision_map_resolution": env_spec.collision_map_resolution,
+        "hit_obstacle_distance": env_spec.hit_obstacle_distance,
+        "candy_pos_obstacle_distance": env_spec.candy_pos_obstacle_distance,
+        "candy_pos_wall_distance": env_spec.candy_pos_wall_distance,
+        "safe_map_engine": env_spec.safe_map_engine,
+    }
+
+
+def load_collision_maps(
+    env_spec: EnvSpec, reset_options: ResetOptions, cache: MapCache | None = MAP_CACHE
+) -> CollisionMaps:
+    """
+    Returns the collision maps for the reset options, decoding and dilating the bitmap only on a
+    cache miss.
+    """
+
+    key = collision_maps_key(env_spec, reset_options)
+    if cache is not None:
+        maps = cache.get(key)
+        if maps is not None:
+            return maps
+
+    maps = build_collision_maps(env_spec, reset_options.map_bitmap_path, reset_options.map_size)
+    if cache is not None:
+        cache.put(key, maps)
+    return maps
+
+
+def build_collision_maps(env_spec: EnvSpec, bitmap_path: str, map_size: float) -> CollisionMaps:
+    """
+    Decodes the bitmap and dilates it into the snake safe map and the candy free cells. With an
+    EnvSpec.map_cache_dir the maps are read from, or first written to, the disk cache.
+    """
+
+    if env_spec.map_cache_dir:
+        key = disk_cache_key(env_spec, bitmap_path, map_size)
+        maps = load_cached_maps(env_spec.map_cache_dir, key)
+        if maps is None:
+            obstacles_map = load_obstacles_map(bitmap_path, env_spec.collision_map_resolution)
+            save_cached_maps(
+                env_spec.map_cache_dir, key, collision_maps_from(env_spec, obstacles_map, map_size)
+            )
+            # Read back, so that this process shares the pages like the ones loading it later.
+            maps = load_cached_maps(env_spec.map_cache_dir, key)
+            assert maps is not None
+        return maps
+
+    obstacles_map = load_obstacles_map(bitmap_path, env_spec.collision_map_resolution)
+    return collision_maps_from(env_spec, obstacles_map, map_size)
+
+
+def collision_maps_from(
+    env_spec: EnvSpec, obstacles_map: np.ndarray, map_size: float
+) -> CollisionMaps:
+    """
+    Dilates an obstacles map into the snake safe map and the candy free cells.
+    """
+
+    safe_map_snake = generate_safe_map(
+        env_spec.hit_obstacle_distance,
+        map_size,
+        obstacles_map,
+        engine=env_spec.safe_map_engine,
+    )
+
+    candies = EnvCandies(env_spec)
+    candies.set_map_size(map_size)
+    free_pos_candy = candies.compute_free_cells_candy(obstacles_map)
+
+    return CollisionMaps(obstacles_map, safe_map_snake, free_pos_candy)
+
+
+DISK_CACHE_ARRAYS = ("obstacles_map", "safe_map_snake", "free_pos_candy")
+DISK_CACHE_VERSION = 1
+
+
+def disk_cache_key(env_spec: EnvSpec, bitmap_path: str, map_size: float) -> str:
+    """
+    Hashes the bitmap bytes with the parameters the maps are derived with. Unlike the in-memory
+    key it doesn't depend on paths or modification times, so copies of a bitmap share entries.
+    """
+
+    digest = hashlib.sha256()
+    if bitmap_path:
+        digest.update(Path(bitmap_path).read_bytes())
+
+    params = {
+        **collision_map_params(env_spec),
+        "map_size": float(map_size),
+        "version": DISK_CACHE_VERSION,
+    }
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _cache_paths(directory: str | Path, key: str) -> List[Path]:
+    return [Path(directory) / f"{key}.{name}.npy" for name in DISK_CACHE_ARRAYS]
+
+
+def load_cached_maps(directory: str | Path, key: str) -> CollisionMaps | None:
+    """
+    Opens the cached maps memory-mapped read-only, or returns None when they aren't cached.
+    """
+
+    paths = _cache_paths(directory, key)
+    if not all(path.exists() for path in paths):
+        return None
+    return CollisionMaps(*(np.load(path, mmap_mode="r") for path in paths))
+
+
+def save_cached_maps(directory: str | Path, key: str, maps: CollisionMaps) -> None:
+    """
+    Writes the maps as .npy files. Every file is written under a temporary name and renamed, so
+    that concurrent workers never read a partial file.
+    """
+
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    for name, path in zip(DISK_CACHE_ARRAYS, _cache_paths(directory, key), strict=True):
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, getattr(maps, name))
+        os.replace(tmp, path)
+
+
+MAP_GENERATOR_ATTEMPTS = 20
+
+
+def generate_collision_maps(
+    env_spec: EnvSpec,
+    reset_options: ResetOptions,
+    rng: np.random.Generator,
+    attempts: int = MAP_GENERATOR_ATTEMPTS,
+) -> CollisionMaps:
+    """
+    Generates the obstacles with the map_generator of the reset options, clearing the start
+    cell's surroundings. Only the candy free cells the start can reach are kept, and maps where
+    it reaches none are generated again.
+    """
+
+    res, map_size = env_spec.collision_map_resolution, reset_options.map_size
+    margin = max(int(env_spec.hit_obstacle_distance * (res / map_size)), 1) + 1
+
+    start = point_cells(np.asarray(reset_options.start_pos_coords) * map_size, map_size, res)
+    row, col = int(start[0]), int(start[1])
+
+    for _ in range(attempts):
+        obstacles_map = generate_obstacles_map(reset_options.map_generator, rng, res)
+        obstacles_map[
+            max(row - margin, 0) : row + margin + 1, max(col - margin, 0) : col + margin + 1
+        ] = 0
+
+        maps = collision_maps_from(env_spec, obstacles_map, map_size)
+        reachable = reachable_cells(maps.safe_map_snake == 1, (row, col))
+
+        # Free cells sit on cell corners, which map back to their cell exactly.
+        cells = np.rint(maps.free_pos_candy / map_size * res).astype(np.int64)
+        keep = reachable[cells[:, 1], cells[:, 0]]
+        if keep.any():
+            return CollisionMaps(obstacles_map, maps.safe_map_snake, maps.free_pos_candy[keep])
+
+    raise RuntimeError(
+        f"Map generator '{reset_options.map_generator}' made no map where the start can reach "
+        f"a candy in {attempts} attempts."
+    )
+
+
+BITMAP_SUFFIXES = (".png", ".bmp", ".gif", ".jpg", ".jpeg")
+POOL_META_FILE = "pool.json"
+POOL_ARRAYS = ("obstacles_maps", "safe_maps", "free_cells", "free_offsets")
+
+
+class MapPool:
+    """
+    Collision maps of N bitmaps for one map size, stacked into single arrays: obstacles and safe
+    maps of shape (N, res, res), and the candy free cells of all maps concatenated, map i owning
+    the rows free_offsets[i]:free_offsets[i + 1].
+
+    A saved pool is opened memory-mapped, so processes using the same pool share its pages.
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[str],
+        map_size: float,
+        params: Mapping[str, Any],
+        obstacles_maps: np.ndarray,
+        safe_maps: np.ndarray,
+        free_cells: np.ndarray,
+        free_offsets: np.ndarray,
+    ) -> None:
+        if not len(paths):
+            raise ValueError("A map pool needs at least one map.")
+
+        self.paths = list(paths)
+        self.map_size = map_size
+        self.params = dict(params)
+
+        self.obstacles_maps = obstacles_maps
+        self.safe_maps = safe_maps
+        self.free_cells = free_cells
+        self.free_offsets = free_offsets
+
+        # Built once, so that the candy cell index is only rebuilt when the map changes.
+        self._maps = [
+            CollisionMaps(
+                obstacles_maps[i], safe_maps[i], free_cells[free_offsets[i] : free_offsets[i + 1]]
+            )
+            for i in range(len(self.paths))
+        ]
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __getitem__(self, i: int) -> CollisionMaps:
+        return self._maps[i]
+
+    def pick(self, rng: np.random.Generator) -> int:
+        """
+        Draws the index of a map, every map being equally likely.
+        """
+
+        return int(rng.integers(len(self.paths)))
+
+    def matches(self, env_spec: EnvSpec, map_size: float) -> bool:
+        return self.map_size == map_size and self.params == collision_map_params(env_spec)
+
+    @staticmethod
+    def from_bitmaps(env_spec: EnvSpec, paths: Sequence[str], map_size: float) -> MapPool:
+        maps = [build_collision_maps(env_spec, str(path), map_size) for path in paths]
+        sizes = [len(m.free_pos_candy) for m in maps]
+
+        return MapPool(
+            [str(path) for path in paths],
+            map_size,
+            collision_map_params(env_spec),
+            np.stack([m.obstacles_map for m in maps]),
+            np.stack([m.safe_map_snake for m in maps]),
+            np.concatenate([m.free_pos_candy for m in maps]),
+            np.concatenate(([0], np.cumsum(sizes))).astype(np.int64),
+        )
+
+    @staticmethod
+    def from_directory(env_spec: EnvSpec, directory: str, map_size: float) -> MapPool:
+        """
+        Preloads every bitmap of the directory, in name order.
+        """
+
+        paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower() in BITMAP_SUFFIXES)
+        if not paths:
+            raise ValueError(f"No bitmaps in '{directory}'.")
+        return MapPool.from_bitmaps(env_spec, [str(p) for p in paths], map_size)
+
+    def save(self, directory: str | Path) -> None:
+        """
+        Writes the stacked arrays as .npy files next to a pool.json describing them.
+        """
+
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        for name in POOL_ARRAYS:
+            np.save(directory / f"{name}.npy", getattr(self, name))
+
+        meta = {"paths": self.paths, "map_size": self.map_size, "params": self.params}
+        (directory / POOL_META_FILE).write_text(json.dumps(meta, indent=2))
+
+    @staticmethod
+    def open(directory: str | Path) -> MapPool:
+        """
+        Opens a saved pool with its arrays memory-mapped read-only.
+        """
+
+        directory = Path(directory)
+        meta = json.loads((directory / POOL_META_FILE).read_text())
+        arrays = [np.load(directory / f"{name}.npy", mmap_mode="r") for name in POOL_ARRAYS]
+        return MapPool(meta["paths"], meta["map_size"], meta["params"], *arrays)
+
+
+def load_map_pool(env_spec: EnvSpec, map_size: float) -> MapPool:
+    """
+    Opens the pool saved in EnvSpec.map_pool, or preloads the bitmaps it holds.
+    """
+
+    directory = Path(env_spec.map_pool)
+    if (directory / POOL_META_FILE).exists():
+        pool = MapPool.open(directory)
+        if not pool.matches(env_spec, map_size):
+            raise ValueError(
+                f"Map pool '{directory}' was saved for map size {pool.map_size} and "
+                f"{pool.params}, not for map size {map_size} and {collision_map_params(env_spec)}."
+            )
+        return pool
+    return MapPool.from_directory(env_spec, str(directory), map_size)
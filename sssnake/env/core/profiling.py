@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from functools import wraps
+from typing import Any, Callable, DefaultDict, Dict
+
+
+class EnvMetrics:
+    """
+    Cumulative per-phase timers and event counters of an instrumented env.
+
+    Phases are measured by wrapping the env's methods on the instance, so an env created without
+    profiling runs its plain methods and pays nothing.
+    """
+
+    def __init__(self) -> None:
+        self.seconds: DefaultDict[str, float] = defaultdict(float)
+        self.calls: DefaultDict[str, int] = defaultdict(int)
+        self.counters: DefaultDict[str, int] = defaultdict(int)
+
+    def timed(self, name: str, fn: Callable, count_true: str | None = None) -> Callable:
+        """
+        Wraps fn, adding its run time and call to the phase name. When count_true is given, truthy
+        results are also counted under that counter.
+        """
+
+        seconds, calls, counters = self.seconds, self.calls, self.counters
+        clock = time.perf_counter_ns
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            result = fn(*args, **kwargs)
+            seconds[name] += (clock() - start) * 1e-9
+            calls[name] += 1
+            if count_true is not None and result:
+                counters[count_true] += 1
+            return result
+
+        return wrapper
+
+    def clear(self):
+        self.seconds.clear()
+        self.calls.clear()
+        self.counters.clear()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "seconds": dict(self.seconds),
+            "calls": dict(self.calls),
+            "counters": dict(self.counters),
+        }
+
+
+def instrument_env(env, metrics: EnvMetrics):
+    """
+    Replaces the step phases of an EnvEngine and its collision / candies helpers with timed
+    wrappers recording into metrics.
+    """
+
+    for name in (
+        "step",
+        "reset",
+        "apply_turn",
+        "move_head",
+        "update_body_segments",
+        "get_obs",
+    ):
+        setattr(env, name, metrics.timed(name, getattr(env, name)))
+
+    collision = env.env_collision
+    collision.hit_anything = metrics.timed(
+        "hit_anything", collision.hit_anything, count_true="collisions"
+    )
+    for name in ("hit_tail", "hit_wall", "hit_obstacle"):
+        setattr(collision, name, metrics.timed(name, getattr(collision, name)))
+    collision.update_tail_index = metrics.timed("update_tail_index", collision.update_tail_index)
+
+    candies = env.env_candies
+    candies.met_candy = metrics.timed("met_candy", candies.met_candy, count_true="candies_eaten")
+    candies.random_candy_pos = metrics.timed("random_candy_pos", candies.random_candy_pos)
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import json
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import gymnasium as gym
+import numpy as np
+
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.core.map_cache import MapPool
+from sssnake.env.utils.config_def import EnvSpec, ResetOptions
+from sssnake.env.utils.schema import build_observation_space
+
+INDEX_FILE = "index.json"
+
+
+class EpisodeRecorder(gym.Wrapper):
+    """
+    Records the episodes of an EnvEngine as their seed, ResetOptions and uint8 action stream,
+    which is enough to replay them deterministically with EpisodeDataset.
+
+    Episodes played on a map of a pool point to the pool's bitmap paths, stored once in the index,
+    so that the replay picks the same map even when the pool wasn't part of the env spec.
+
+    Values of dense_keys (obs keys of the underlying state, typed after the observation space)
+    are stored too, for datasets which need them without a replay. Steps are written in chunks
+    of whole episodes, one .npy file per array and chunk, so that the dataset can be
+    memory-mapped.
+    """
+
+    def __init__(
+        self,
+        env: gym.Env,
+        directory: str | Path,
+        dense_keys: Sequence[str] = (),
+        chunk_size: int = 1 << 16,
+        seed: int | None = None,
+    ) -> None:
+        super().__init__(env)
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dense_keys = list(dense_keys)
+        self.chunk_size = chunk_size
+
+        # Draws the seeds of episodes reset without one, the replay needs them all.
+        self._seeds = np.random.default_rng(seed)
+
+        self.episodes: List[Dict[str, Any]] = []
+        self.chunks: List[Dict[str, Any]] = []
+        self.map_pools: List[List[str]] = []
+        self._map_pool_ids: Dict[Tuple[str, ...], int] = {}
+
+        self._actions: List[int] = []
+        self._dense: Dict[str, List[np.ndarray]] = {k: [] for k in self.dense_keys}
+        space = build_observation_space(self.engine.env_spec, self.dense_keys)
+        self._dense_dtypes = {k: space[k].dtype for k in self.dense_keys}
+        self._open = False
+        self._closed = False
+
+    @property
+    def engine(self) -> EnvEngine:
+        engine = self.env.unwrapped
+        assert isinstance(engine, EnvEngine)
+        return engine
+
+    def reset(self, *, seed: int | None = None, options: Any = None):
+        if seed is None:
+            seed = int(self._seeds.integers(2**31))
+
+        # Resetting ends the previous episode, finished or not.
+        self._open = False
+        if len(self._actions) >= self.chunk_size:
+            self.flush()
+
+        obs, info = self.env.reset(seed=seed, options=options)
+
+        opts = self.engine.last_reset_options
+        assert opts is not None
+        self.episodes.append(
+            {
+                "seed": seed,
+                "options": asdict(opts),
+                "map_pool": self._map_pool_id(opts),
+                "chunk": len(self.chunks),
+                "start": len(self._actions),
+                "length": 0,
+            }
+        )
+        self._open = True
+        return obs, info
+
+    def _map_pool_id(self, opts: ResetOptions) -> int | None:
+        """
+        Index in map_pools of the pool the episode's map was picked from, None without a pool.
+        """
+
+        pool = self.engine.map_pool
+        if pool is None or opts.map_generator:
+            return None
+
+        paths = tuple(pool.paths)
+        if paths not in self._map_pool_ids:
+            self._map_pool_ids[paths] = len(self.map_pools)
+            self.map_pools.append(list(paths))
+        return self._map_pool_ids[paths]
+
+    def step(self, action):
+        if not self._open:
+            raise RuntimeError("Reset the env before stepping it.")
+
+        obs, reward, terminated, truncated, info = self.env.step(action)
+
+        self._actions.append(int(action))
+        if self.dense_keys:
+            values = self.engine.state.to_obs(self.dense_keys, sensors=self.engine.obs_sensors)
+            for key in self.dense_keys:
+                self._dense[key].append(np.array(values[key], dtype=self._dense_dtypes[key]))
+        self.episodes[-1]["length"] += 1
+
+        if terminated or truncated:
+            self._open = False
+            if len(self._actions) >= self.chunk_size:
+                self.flush()
+
+        return obs, reward, terminated, truncated, info
+
+    def flush(self, include_open: bool = False):
+        """
+        Writes the buffered steps of finished episodes as a new chunk and updates the index. The
+        episode in progress stays buffered, unless include_open is set.
+        """
+
+        keep_open = self._open and not include_open
+        cut = self.episodes[-1]["start"] if keep_open else len(self._actions)
+
+        if cut:
+            chunk = len(self.chunks)
+            actions = np.asarray(self._actions[:cut], dtype=np.uint8)
+            np.save(self._chunk_path("actions", chunk), actions)
+            for key, values in self._dense.items():
+                np.save(self._chunk_path(key, chunk), np.stack(values[:cut]))
+            self.chunks.append({"steps": cut})
+
+            del self._actions[:cut]
+            for values in self._dense.values():
+                del values[:cut]
+
+            if keep_open:
+                self.episodes[-1].update(chunk=chunk + 1, start=0)
+
+        self._write_index()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.flush(include_open=True)
+        super().close()
+
+    def _chunk_path(self, key: str, chunk: int) -> Path:
+        return self.directory / f"{key}_{chunk:05d}.npy"
+
+    def _write_index(self):
+        index = {
+            "env_spec": asdict(self.engine.env_spec),
+            "dense_keys": self.dense_keys,
+            "map_pools": self.map_pools,
+            "chunks": self.chunks,
+            "episodes": [e for e in self.episodes if e["chunk"] < len(self.chunks)],
+        }
+        (self.directory / INDEX_FILE).write_text(json.dumps(index, indent=1))
+
+
+class EpisodeDataset:
+    """
+    Episodes written by EpisodeRecorder. Actions and dense arrays are memory-mapped, observations
+    and frames are reconstructed by replaying the actions.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+        index = json.loads((self.directory / INDEX_FILE).read_text())
+        self.env_spec = EnvSpec.from_dict(index["env_spec"])
+        self.dense_keys: List[str] = index["dense_keys"]
+        self.episodes: List[Dict[str, Any]] = index["episodes"]
+        self.map_pools: List[List[str]] = index.get("map_pools", [])
+        self.num_chunks = len(index["chunks"])
+
+        self._arrays: Dict[Tuple[str, int], np.ndarray] = {}
+        self._pools: Dict[Tuple[int, float], MapPool] = {}
+
+    def __len__(self) -> int:
+        return len(self.episodes)
+
+    def actions(self, episode: int) -> np.ndarray:
+        return self._episode_slice("actions", episode)
+
+    def dense(self, key: str, episode: int) -> np.ndarray:
+        if key not in self.dense_keys:
+            raise KeyError(f"'{key}' wasn't recorded, recorded keys are {self.dense_keys}")
+        return self._episode_slice(key, episode)
+
+    def reset_options(self, episode: int) -> ResetOptions:
+        return ResetOptions.from_dict(self.episodes[episode]["options"])
+
+    def replay(
+        self, episode: int, render: bool = False, **env_kwargs
+    ) -> Iterator[Tuple[Any, float, bool, bool, np.ndarray | None]]:
+        """
+        Steps a fresh EnvEngine through the episode, yielding (obs, reward, terminated, truncated,
+        frame) after every action. The first item holds the reset observation, with no reward.
+        Episodes recorded on a map pool are replayed on the same pool.
+        """
+
+        meta = self.episodes[episode]
+        options = self.reset_options(episode)
+        if meta.get("map_pool") is not None and "map_pool" not in env_kwargs:
+            env_kwargs["map_pool"] = self.map_pool(meta["map_pool"], options.map_size)
+        env = EnvEngine(self.env_spec, render_mode="rgb_array" if render else None, **env_kwargs)
+
+        obs, _ = env.reset(seed=meta["seed"], options=options)
+        yield obs, 0.0, False, False, env.render() if render else None
+
+        for action in self.actions(episode):
+            obs, reward, terminated, truncated, _ = env.step(int(action))
+            yield obs, reward, terminated, truncated, env.render() if render else None
+
+    def map_pool(self, pool_id: int, map_size: float) -> MapPool:
+        """
+        Loads the recorded pool from its bitmaps, in the recorded order so that picks match.
+        """
+
+        key = (pool_id, map_size)
+        if key not in self._pools:
+            paths = self.map_pools[pool_id]
+            self._pools[key] = MapPool.from_bitmaps(self.env_spec, paths, map_size)
+        return self._pools[key]
+
+    def _episode_slice(self, key: str, episode: int) -> np.ndarray:
+        meta = self.episodes[episode]
+        chunk = meta["chunk"]
+
+        arr = self._arrays.get((key, chunk))
+        if arr is None:
+            arr = np.load(self.directory / f"{key}_{chunk:05d}.npy", mmap_mode="r")
+            self._arrays[(key, chunk)] = arr
+
+        return arr[meta["start"] : meta["start"] + meta["length"]]
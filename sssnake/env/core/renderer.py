@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import math
+import os
 import random
+from functools import lru_cache
 from importlib.resources import files
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 
 import numpy as np
 from PIL import Image
@@ -17,8 +19,12 @@ _HEAD_BASE = Image.open(str(texture_path / "head.png")).convert("RGBA")
 _SEGMENT_BASE = Image.open(str(texture_path / "segment.png")).convert("RGBA")
 _CANDY_BASE = Image.open(str(texture_path / "candy.png")).convert("RGBA")
 
+RENDER_ENGINES = ("exact", "atlas")
+
 _sprite_cache: Dict[Tuple[int, int], Image.Image] = {}
+_atlas_cache: Dict[Tuple[int, int, int], List[Image.Image]] = {}
 _candy_angles: Dict[Tuple[int, int], float] = {}
+_array_backgrounds: Dict[int, Tuple[np.ndarray, Image.Image]] = {}
 
 
 def get_cached_sprite(base: Image.Image, size: int) -> Image.Image:
@@ -29,29 +35,102 @@ def get_cached_sprite(base: Image.Image, size: int) -> Image.Image:
     return _sprite_cache[key]
 
 
+def get_sprite_atlas(base: Image.Image, size: int, angle_steps: int) -> List[Image.Image]:
+    """
+    Returns the sprite resized to size and pre-rotated at angle_steps evenly spaced angles.
+    """
+
+    key = (id(base), size, angle_steps)
+    if key not in _atlas_cache:
+        sprite = get_cached_sprite(base, size)
+        _atlas_cache[key] = [
+            sprite.rotate(step * 360.0 / angle_steps, expand=True, resample=Resampling.BICUBIC)
+            for step in range(angle_steps)
+        ]
+    return _atlas_cache[key]
+
+
+def get_cached_background(collision_bitmap_path: str, out_size: int) -> Image.Image:
+    """
+    Returns the map background resized to out_size. Callers must copy it before drawing.
+    """
+
+    if not collision_bitmap_path:
+        return _load_background("", None, out_size)
+
+    mtime = os.stat(collision_bitmap_path).st_mtime_ns
+    return _load_background(collision_bitmap_path, mtime, out_size)
+
+
+def get_array_background(obstacles_map: np.ndarray, out_size: int) -> Image.Image:
+    """
+    Returns the background of an obstacles map array, obstacles in white like in map bitmaps,
+    resized to out_size. The last background of every size is kept while its map is the same
+    array. Callers must copy it before drawing.
+    """
+
+    cached = _array_backgrounds.get(out_size)
+    if cached is None or cached[0] is not obstacles_map:
+        gray = Image.fromarray((np.asarray(obstacles_map) != 0).astype(np.uint8) * 255, "L")
+        background = gray.resize((out_size, out_size), Resampling.NEAREST).convert("RGBA")
+        cached = _array_backgrounds[out_size] = (obstacles_map, background)
+    return cached[1]
+
+
+@lru_cache(maxsize=16)
+def _load_background(collision_bitmap_path: str, mtime: int | None, out_size: int) -> Image.Image:
+    if not collision_bitmap_path:
+        return Image.new("RGBA", (out_size, out_size), "black")
+
+    return (
+        Image.open(collision_bitmap_path)
+        .convert("L")
+        .resize((out_size, out_size), Resampling.LANCZOS)
+        .convert("RGBA")
+    )
+
+
 def state_to_array(
-    render_state: RenderState, collision_bitmap_path: str = "", out_size: int = 320
+    render_state: RenderState,
+    collision_bitmap_path: str = "",
+    out_size: int = 320,
+    engine: str = "exact",
+    angle_steps: int = 72,
+    obstacles_map: np.ndarray | None = None,
 ) -> np.ndarray:
-    if collision_bitmap_path:
-        off = (
-            Image.open(collision_bitmap_path)
-            .convert("L")
-            .resize((out_size, out_size), Resampling.LANCZOS)
-            .convert("RGBA")
-        )
+    """
+    Draws the state over the map background, drawn from obstacles_map when given (e.g. a
+    generated map) and from the collision bitmap otherwise.
+
+    The "exact" engine rotates every sprite to its precise angle, the "atlas" engine picks the
+    closest of angle_steps pre-rotated sprites, so a frame is only pastes of cached images.
+    """
+
+    if engine not in RENDER_ENGINES:
+        raise ValueError(f"Unknown render engine '{engine}', expected {RENDER_ENGINES}")
+
+    def rotated(base: Image.Image, size: int, angle: float) -> Image.Image:
+        if engine == "atlas":
+            atlas = get_sprite_atlas(base, size, angle_steps)
+            return atlas[round(angle * angle_steps / 360.0) % angle_steps]
+        sprite = get_cached_sprite(base, size)
+        return sprite.rotate(angle, expand=True, resample=Resampling.BICUBIC)
+
+    if obstacles_map is not None:
+        off = get_array_background(obstacles_map, out_size).copy()
     else:
-        off = Image.new("RGBA", (out_size, out_size), "black")
+        off = get_cached_background(collision_bitmap_path, out_size).copy()
 
     map_size = render_state.map_size
 
     # candy
     cx, cy = render_state.candy_position
     candy_px = max(1, int(2 * 1.45 * out_size / map_size))
-    candy_sprite = get_cached_sprite(_CANDY_BASE, candy_px)
     key = (int(cx), int(cy))
     if key not in _candy_angles:
-        _candy_angles[key] = random.uniform(140, 220)
-    candy_sprite = candy_sprite.rotate(_candy_angles[key], expand=True, resample=Resampling.BICUBIC)
+        # Seeded by the position, so that replayed episodes render identical frames
+        _candy_angles[key] = random.Random(hash(key)).uniform(140, 220)
+    candy_sprite = rotated(_CANDY_BASE, candy_px, _candy_angles[key])
     cw, ch = candy_sprite.size
     off.paste(
         candy_sprite,
@@ -61,7 +140,6 @@ def state_to_array(
 
     # segments
     seg_px = max(1, int(2 * 1.3 * out_size / map_size))
-    seg_base = get_cached_sprite(_SEGMENT_BASE, seg_px)
 
     positions = render_state.segments_positions[: int(render_state.segments_num)]
     prev_positions = [render_state.head_position] + list(positions[:-1])
@@ -69,7 +147,7 @@ def state_to_array(
     for (sx, sy), (tx, ty) in zip(reversed(positions), reversed(prev_positions), strict=False):
         dx, dy = tx - sx, ty - sy
         angle = math.degrees(math.atan2(-dy, dx)) + 90
-        seg_sprite = seg_base.rotate(angle, expand=True, resample=Resampling.BICUBIC)
+        seg_sprite = rotated(_SEGMENT_BASE, seg_px, angle)
         sw, sh = seg_sprite.size
         off.paste(
             seg_sprite,
@@ -79,12 +157,7 @@ def state_to_array(
 
     # head
     head_px = max(1, int(2 * 1.5 * out_size / map_size))
-    head_sprite = get_cached_sprite(_HEAD_BASE, head_px)
-    head_sprite = head_sprite.rotate(
-        render_state.head_direction + 180,
-        expand=True,
-        resample=Resampling.BICUBIC,
-    )
+    head_sprite = rotated(_HEAD_BASE, head_px, render_state.head_direction + 180)
     hw, hh = head_sprite.size
     hx, hy = render_state.head_position
     off.paste(
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+# Cell coordinates are packed into a single int key, the map never spans this many cells.
+_ROW_STRIDE = 1 << 20
+
+
+class SegmentGrid:
+    """
+    Uniform grid of the active body segments, used to find segments close to the head.
+
+    With the cell size equal to the query radius, every segment closer than the radius lies in
+    the 3x3 block of cells around the queried point. The grid is updated incrementally: only the
+    segments which moved to another cell are re-bucketed.
+    """
+
+    def __init__(self, cell_size: float, capacity: int) -> None:
+        self.cell_size = cell_size
+
+        self._keys = np.zeros(capacity, dtype=np.int64)
+        self._count = 0
+        self._cells: Dict[int, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def reset(self):
+        self._count = 0
+        self._cells.clear()
+
+    def update(self, positions: np.ndarray, count: int):
+        """
+        Synchronizes the grid with the first count rows of positions.
+        """
+
+        old_count = self._count
+        keys = self._cell_keys(positions[:count])
+
+        common = min(old_count, count)
+        moved = np.flatnonzero(keys[:common] != self._keys[:common])
+
+        for i in moved.tolist():
+            self._remove(int(self._keys[i]), i)
+            self._add(int(keys[i]), i)
+
+        for i in range(common, count):
+            self._add(int(keys[i]), i)
+
+        for i in range(count, old_count):
+            self._remove(int(self._keys[i]), i)
+
+        self._keys[:count] = keys
+        self._count = count
+
+    def any_within(self, positions: np.ndarray, point: Tuple[float, float], radius: float) -> bool:
+        """
+        Checks whether any indexed segment lies closer than radius to the point.
+        """
+
+        if self._count == 0:
+            return False
+
+        cx = math.floor(point[0] / self.cell_size)
+        cy = math.floor(point[1] / self.cell_size)
+
+        candidates: List[int] = []
+        for x in (cx - 1, cx, cx + 1):
+            for y in (cy - 1, cy, cy + 1):
+                cell = self._cells.get(x * _ROW_STRIDE + y)
+                if cell:
+                    candidates.extend(cell)
+
+        if not candidates:
+            return False
+
+        d = positions[candidates].astype(np.float64) - point
+        return bool((np.hypot(d[:, 0], d[:, 1]) < radius).any())
+
+    def _cell_keys(self, positions: np.ndarray) -> np.ndarray:
+        cells = np.floor(np.divide(positions, self.cell_size, dtype=np.float64)).astype(np.int64)
+        return cells[:, 0] * _ROW_STRIDE + cells[:, 1]
+
+    def _add(self, key: int, idx: int):
+        cell = self._cells.get(key)
+        if cell is None:
+            self._cells[key] = {idx}
+        else:
+            cell.add(idx)
+
+    def _remove(self, key: int, idx: int):
+        cell = self._cells[key]
+        cell.discard(idx)
+        if not cell:
+            del self._cells[key]
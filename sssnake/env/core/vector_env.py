@@ -0,0 +1,466 @@
+from __future__ import annotations
+
+from importlib.resources import files
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+from gymnasium import spaces
+from gymnasium.utils import seeding
+from gymnasium.vector import AutoresetMode, VectorEnv
+from gymnasium.vector.utils import batch_space
+
+from sssnake.env.core import kernels
+from sssnake.env.core.candies import EnvCandies
+from sssnake.env.core.collision import EnvCollision
+from sssnake.env.core.map_cache import load_collision_maps
+from sssnake.env.utils.config_def import EnvSpec, ResetOptions
+from sssnake.env.utils.env_helpers import load_config
+from sssnake.env.utils.lidar import LidarSensor
+from sssnake.env.utils.raster import LocalViewCropper, OccupancyRasterizer
+from sssnake.env.utils.schema import build_observation_space, split_obs_keys
+from sssnake.env.utils.snake_action import SnakeAction
+from sssnake.env.utils.state_def import EnvSnapshot, InfoDict, ObservationDict, ObsSensors
+
+
+class SssnakeVectorEnv(VectorEnv):
+    """
+    Vectorized env stepping all sub-envs at once on struct-of-arrays state.
+
+    Every sub-env follows the same dynamics as an independent EnvEngine, the sub-envs are
+    autoreset on the step following their termination / truncation.
+    """
+
+    def __init__(
+        self,
+        num_envs: int = 1,
+        env_spec_in: EnvSpec | None = None,
+        render_mode: str | None = None,
+        copy: bool = True,
+        obs_keys: Sequence[str] | None = None,
+        static_obs_on_reset: bool = False,
+    ) -> None:
+        super().__init__()
+        self.metadata = {"render_modes": [], "autoreset_mode": AutoresetMode.NEXT_STEP}
+
+        default_json = files("sssnake.env.utils").joinpath("default_params.json")
+        env_spec_loaded, self.last_reset_options = load_config(jsonpath=str(default_json))
+
+        env_spec = env_spec_loaded if env_spec_in is None else env_spec_in
+
+        if render_mode is not None:
+            raise ValueError(f"Rendermode '{render_mode}' not supported.")
+
+        # All sub-envs share one safe map.
+        if env_spec.map_pool:
+            raise ValueError("Map pools are not supported by SssnakeVectorEnv, use EnvEngine.")
+
+        self.num_envs = num_envs
+        self.render_mode = render_mode
+        self.copy = copy
+        self.env_spec = env_spec
+
+        self.obs_keys, self.static_obs_keys = split_obs_keys(obs_keys, static_obs_on_reset)
+
+        self.single_action_space = spaces.Discrete(len(SnakeAction))
+        self.action_space = batch_space(self.single_action_space, num_envs)
+        self.single_observation_space = build_observation_space(env_spec, self.obs_keys)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+
+        n, m = num_envs, env_spec.tail_max_segment
+        res = env_spec.collision_map_resolution
+
+        self.head_position = np.zeros((n, 2), dtype=np.float64)
+        self.head_direction = np.zeros(n, dtype=np.float64)
+        self.speed = np.zeros(n, dtype=np.float64)
+        self.turnspeed = np.zeros(n, dtype=np.float64)
+        self.map_size = np.zeros(n, dtype=np.float64)
+        self.candy_position = np.zeros((n, 2), dtype=np.float64)
+        self.segments_num = np.zeros(n, dtype=np.int64)
+        self.segments_positions = np.zeros((n, m, 2), dtype=np.float32)
+        self.num_steps = np.zeros(n, dtype=np.int64)
+        self.safe_map_snake = np.ones((res, res), dtype=np.int8)
+        self.obs_sensors = ObsSensors(env_spec)
+
+        self.segment_length = env_spec.tail_segment_length
+        self.max_path_distance = m * self.segment_length
+
+        # Head paths of all sub-envs share the write column, each one keeps its own start column.
+        self._path_capacity = 64
+        self._path_xy = np.zeros((n, self._path_capacity, 2), dtype=np.float64)
+        self._path_s = np.zeros((n, self._path_capacity), dtype=np.float64)
+        self._path_start = np.zeros(n, dtype=np.int64)
+        self._path_end = 0
+
+        self.env_collision = EnvCollision(env_spec)
+        self.env_candies: List[EnvCandies] = [EnvCandies(env_spec) for _ in range(n)]
+        self.np_randoms: List[np.random.Generator | None] = [None] * n
+
+        self._autoreset_envs = np.zeros(n, dtype=np.bool_)
+        self._obs_buffers: Dict[str, np.ndarray] = {
+            k: np.zeros((n, *space.shape), dtype=space.dtype)
+            for k, space in self.single_observation_space.items()
+            if isinstance(space, spaces.Box)
+        }
+
+    @property
+    def lidar(self) -> LidarSensor:
+        return self.obs_sensors.lidar
+
+    @property
+    def local_view(self) -> LocalViewCropper:
+        return self.obs_sensors.local_view
+
+    @property
+    def occupancy(self) -> OccupancyRasterizer:
+        return self.obs_sensors.occupancy
+
+    def reset(
+        self,
+        *,
+        seed: int | Sequence[int | None] | None = None,
+        options: Dict[str, Any] | ResetOptions | None = None,
+    ):
+        if isinstance(seed, int):
+            seeds: Sequence[int | None] = [seed + i for i in range(self.num_envs)]
+        elif seed is None:
+            seeds = [None] * self.num_envs
+        else:
+            seeds = seed
+
+        if len(seeds) != self.num_envs:
+            raise ValueError(f"Expected {self.num_envs} seeds, got {len(seeds)}.")
+
+        for i, env_seed in enumerate(seeds):
+            if env_seed is not None or self.np_randoms[i] is None:
+                self.np_randoms[i], _ = seeding.np_random(env_seed)
+
+        if options is not None:
+            if isinstance(options, dict):
+                self.last_reset_options = ResetOptions.from_dict(options)
+            else:
+                self.last_reset_options = options
+
+        if self.last_reset_options is None:
+            raise RuntimeError("ResetOptions not initialized.")
+
+        self.prepare_collision_map(self.last_reset_options)
+
+        self._path_end = 0
+        self.reset_envs(np.arange(self.num_envs))
+        self._autoreset_envs[:] = False
+
+        info: InfoDict = {}
+        if self.static_obs_keys:
+            # Static keys are shared by all sub-envs, so they aren't batched.
+            info["static_obs"] = {k: getattr(self, k) for k in self.static_obs_keys}
+        return self.build_obs(), info
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        n = self.num_envs
+
+        rewards = np.zeros(n, dtype=np.float64)
+        terminated = np.zeros(n, dtype=np.bool_)
+        truncated = np.zeros(n, dtype=np.bool_)
+
+        self.advance_path_column()
+
+        resetting = self._autoreset_envs
+        if resetting.any():
+            self.reset_envs(np.flatnonzero(resetting))
+            idx = np.flatnonzero(~resetting)
+        else:
+            idx = np.arange(n)
+
+        self.apply_turn(idx, actions[idx])
+        self.move_head(idx)
+
+        hit = self.hit_anything(idx)
+        terminated[idx[hit]] = True
+        rewards[idx[hit]] = -1
+
+        alive = idx[~hit]
+
+        met = self.met_candy(alive)
+        eaten = alive[met]
+        rewards[eaten] = 1
+        grow = eaten[self.segments_num[eaten] < self.env_spec.tail_max_segment]
+        self.segments_num[grow] += 1
+
+        self.trim_paths(alive)
+        self.update_body_segments(alive)
+
+        for i in eaten:
+            self.candy_position[i] = self.random_candy_pos(i)
+        self.num_steps[alive] += 1
+        truncated[alive] = self.num_steps[alive] >= self.env_spec.max_num_steps
+
+        self._autoreset_envs = terminated | truncated
+
+        info: InfoDict = {}
+        return self.build_obs(), rewards, terminated, truncated, info
+
+    def reset_envs(self, idx: np.ndarray):
+        """
+        Resets the chosen sub-envs to the initial state defined by the last reset options.
+        """
+
+        opts = self.last_reset_options
+        assert opts is not None
+
+        self.head_direction[idx] = opts.start_dir
+        self.speed[idx] = opts.snake_speed
+        self.turnspeed[idx] = opts.snake_turnspeed
+        self.map_size[idx] = opts.map_size
+        self.segments_num[idx] = 0
+        self.segments_positions[idx] = 0.0
+        self.num_steps[idx] = 0
+
+        self.head_position[idx, 0] = opts.start_pos_coords[0] * opts.map_size
+        self.head_position[idx, 1] = opts.start_pos_coords[1] * opts.map_size
+
+        col = self._path_end
+        self._path_start[idx] = col
+        self._path_xy[idx, col] = self.head_position[idx]
+        self._path_s[idx, col] = 0.0
+
+        for i in idx:
+            self.env_candies[i].set_rng(self.np_randoms[i])
+            self.candy_position[i] = self.random_candy_pos(i)
+
+    def random_candy_pos(self, i: int):
+        """
+        Draws a new candy position for the i-th sub-env, avoiding its tail if configured.
+        """
+
+        candies = self.env_candies[i]
+        head = (float(self.head_position[i, 0]), float(self.head_position[i, 1]))
+        tail = self.segments_positions[i, : self.segments_num[i]] if candies.avoid_tail else None
+        return candies.random_candy_pos_from(head, tail)
+
+    def load_snapshot(self, snapshot: EnvSnapshot):
+        """
+        Puts every sub-env into the state of an EnvEngine snapshot, including its RNG state, e.g. to
+        roll many action sequences out of it.
+        """
+
+        state = snapshot.state
+        self.last_reset_options = snapshot.reset_options
+
+        self.head_position[:] = state.head_position
+        self.head_direction[:] = state.head_direction
+        self.speed[:] = state.speed
+        self.turnspeed[:] = state.turnspeed
+        self.map_size[:] = state.map_size
+        self.candy_position[:] = state.candy_position
+        self.segments_num[:] = state.segments_num
+        self.segments_positions[:] = state.segments_positions
+        self.num_steps[:] = snapshot.num_steps
+
+        self.safe_map_snake = state.safe_map_snake
+        if "safe_map_snake" in self._obs_buffers:
+            self._obs_buffers["safe_map_snake"][...] = self.safe_map_snake
+
+        n = len(snapshot.path_arc_lengths)
+        if n >= self._path_capacity:
+            self._path_capacity = 1 << n.bit_length()
+            self._path_xy = np.zeros((self.num_envs, self._path_capacity, 2), dtype=np.float64)
+            self._path_s = np.zeros((self.num_envs, self._path_capacity), dtype=np.float64)
+        self._path_xy[:, :n] = snapshot.path_positions
+        self._path_s[:, :n] = snapshot.path_arc_lengths
+        self._path_start[:] = 0
+        self._path_end = n - 1
+
+        bit_generator = getattr(np.random, snapshot.rng_state["bit_generator"])
+        for i, candies in enumerate(self.env_candies):
+            rng = np.random.Generator(bit_generator())
+            rng.bit_generator.state = snapshot.rng_state
+            self.np_randoms[i] = rng
+
+            candies.set_rng(rng)
+            candies.set_map_size(state.map_size)
+            candies.set_free_cells(snapshot.free_pos_candy, snapshot.candy_cell_index)
+
+        self._autoreset_envs[:] = False
+
+    def prepare_collision_map(self, reset_options: ResetOptions):
+        """
+        Loads the obstacles map once and shares the derived maps between all sub-envs. A
+        map_generator generates it with the first sub-env's np_random, once per reset() call.
+        """
+
+        # A generated map would have to differ per sub-env and per episode to follow independent
+        # EnvEngines, which the shared safe map can't.
+        if reset_options.map_generator:
+            raise ValueError(
+                "Map generators are not supported by SssnakeVectorEnv, use "
+                "SssnakeAsyncVectorEnv or EnvEngine."
+            )
+        maps = load_collision_maps(self.env_spec, reset_options)
+        self.safe_map_snake = maps.safe_map_snake
+
+        if "safe_map_snake" in self._obs_buffers:
+            self._obs_buffers["safe_map_snake"][...] = self.safe_map_snake
+
+        index = None
+        for candies in self.env_candies:
+            candies.set_map_size(reset_options.map_size)
+            candies.set_free_cells(maps.free_pos_candy, index)
+            index = candies.cell_index
+
+    def apply_turn(self, idx: np.ndarray, actions: np.ndarray):
+        """
+        Applies the turning actions of the chosen sub-envs.
+        """
+
+        kernels.turn_heads(self.head_direction, self.turnspeed, actions, idx)
+
+    def move_head(self, idx: np.ndarray):
+        """
+        Moves the heads of the chosen sub-envs and appends them to their paths.
+        """
+
+        kernels.move_heads(
+            self.head_position,
+            self.head_direction,
+            self.speed,
+            self._path_xy,
+            self._path_s,
+            self._path_end,
+            idx,
+        )
+
+    def hit_anything(self, idx: np.ndarray) -> np.ndarray:
+        return kernels.hit_anything(
+            self.head_position,
+            self.map_size,
+            self.segments_positions,
+            self.segments_num,
+            self.safe_map_snake,
+            self.env_collision.wall_hit_distance,
+            self.env_collision.tail_hit_distance,
+            idx,
+        )
+
+    def met_candy(self, idx: np.ndarray) -> np.ndarray:
+        return kernels.met_candies(
+            self.head_position, self.candy_position, self.env_candies[0].candy_distance, idx
+        )
+
+    def advance_path_column(self):
+        """
+        Moves the shared path write column forward, compacting or growing the buffers when full.
+        """
+
+        end = self._path_end
+        if end + 1 < self._path_capacity:
+            self._path_end = end + 1
+            return
+
+        first = int(self._path_start.min())
+        window = end - first + 1
+
+        if 2 * window > self._path_capacity:
+            self._path_capacity *= 2
+
+        xy = np.zeros((self.num_envs, self._path_capacity, 2), dtype=np.float64)
+        s = np.zeros((self.num_envs, self._path_capacity), dtype=np.float64)
+        xy[:, :window] = self._path_xy[:, first : end + 1]
+        s[:, :window] = self._path_s[:, first : end + 1]
+
+        self._path_xy, self._path_s = xy, s
+        self._path_start -= first
+        self._path_end = window
+
+    def trim_paths(self, idx: np.ndarray):
+        """
+        Drops path points older than the farthest distance a segment can ever be sampled at.
+        """
+
+        kernels.trim_paths(
+            self._path_s, self._path_start, self._path_end, self.max_path_distance, idx
+        )
+
+    def update_body_segments(self, idx: np.ndarray):
+        """
+        Samples the body segments of the chosen sub-envs from their paths.
+        """
+
+        kernels.sample_paths(
+            self._path_xy,
+            self._path_s,
+            self._path_start,
+            self._path_end,
+            self.segments_num,
+            self.segment_length,
+            self.segments_positions,
+            idx,
+        )
+
+    def build_obs(self) -> ObservationDict:
+        """
+        Writes the current state of all sub-envs into the batched observation buffers.
+        """
+
+        obs = self._obs_buffers
+
+        for k, getter in BATCHED_OBS_GETTERS.items():
+            if k in obs:
+                obs[k][...] = getter(self)
+
+        if "lidar" in obs:
+            self.lidar.cast(
+                self.head_position,
+                self.head_direction,
+                self.map_size,
+                self.safe_map_snake,
+                self.segments_positions,
+                self.segments_num,
+                out=obs["lidar"],
+            )
+
+        if "occupancy_grid" in obs:
+            grids = obs["occupancy_grid"]
+            for i in range(self.num_envs):
+                self.occupancy.rasterize(
+                    self.safe_map_snake,
+                    self.head_position[i],
+                    self.segments_positions[i, : self.segments_num[i]],
+                    self.candy_position[i],
+                    self.map_size[i],
+                    out=grids[i],
+                )
+
+        if "local_view" in obs:
+            views = obs["local_view"]
+            for i in range(self.num_envs):
+                self.local_view.crop(
+                    self.safe_map_snake,
+                    self.head_position[i],
+                    self.head_direction[i],
+                    self.segments_positions[i, : self.segments_num[i]],
+                    self.map_size[i],
+                    out=views[i],
+                )
+
+        if self.copy:
+            return {k: obs[k].copy() for k in self.obs_keys}
+        return dict(obs)
+
+
+def _direction_vectors(env: SssnakeVectorEnv) -> np.ndarray:
+    ang = np.radians(env.head_direction)
+    return np.stack((np.sin(ang), np.cos(ang)), axis=1)
+
+
+# Per-step keys, evaluated only for the keys of the observation space.
+BATCHED_OBS_GETTERS: Dict[str, Callable[[SssnakeVectorEnv], np.ndarray]] = {
+    "head_position": lambda env: env.head_position,
+    "head_direction_vec": _direction_vectors,
+    "segments_num": lambda env: env.segments_num,
+    "segments_positions": lambda env: env.segments_positions,
+    "speed": lambda env: env.speed,
+    "turnspeed": lambda env: env.turnspeed,
+    "map_size": lambda env: env.map_size,
+    "candy_position": lambda env: env.candy_position,
+}
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import json
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import gymnasium as gym
+import numpy as np
+from PIL import GifImagePlugin, Image
+
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.core.renderer import state_to_array
+from sssnake.env.utils.state_def import RenderState
+
+VIDEO_FORMATS = ("gif", "raw")
+
+_STOP = None
+
+
+class GifWriter:
+    """
+    Animated GIF written frame by frame. Every frame is quantized on its own local palette and
+    appended to the file right away, nothing but the open file is kept between frames.
+
+    The writer owns the file: it is opened here and stays open until close(), which has to be
+    called once done (FrameStream.close does it).
+    """
+
+    def __init__(self, path: str | Path, fps: float = 30.0, loop: int = 0) -> None:
+        self.path = Path(path)
+        self.duration = round(1000 / fps)
+        self.loop = loop
+        self.frames = 0
+
+        self._file = open(self.path, "wb")
+
+    def write(self, frame: np.ndarray):
+        im = Image.fromarray(np.ascontiguousarray(frame[..., :3])).quantize(256)
+
+        if self.frames == 0:
+            header, _ = GifImagePlugin.getheader(
+                im, info={"loop": self.loop, "duration": self.duration}
+            )
+            self._file.writelines(header)
+
+        data = GifImagePlugin.getdata(im, duration=self.duration, include_color_table=True)
+        self._file.writelines(data)
+        self.frames += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            # GIF trailer
+            self._file.write(b";")
+        finally:
+            self._file.close()
+
+
+class RawFrameWriter:
+    """
+    Frames appended as raw uint8 bytes, with their shape and count in a JSON file next to them
+    once closed. load_raw_frames memory-maps the result.
+
+    Like GifWriter, the writer owns the file until close().
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.shape: Tuple[int, ...] | None = None
+        self.frames = 0
+
+        self._file = open(self.path, "wb")
+
+    def write(self, frame: np.ndarray):
+        if self.shape is None:
+            self.shape = frame.shape
+        elif frame.shape != self.shape:
+            raise ValueError(f"Frame of shape {frame.shape}, expected {self.shape}")
+
+        self._file.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+        self.frames += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+
+        meta = {"shape": list(self.shape or ()), "dtype": "uint8", "frames": self.frames}
+        raw_meta_path(self.path).write_text(json.dumps(meta))
+
+
+def raw_meta_path(path: str | Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".json")
+
+
+def load_raw_frames(path: str | Path) -> np.ndarray:
+    """
+    Memory-maps the frames written by RawFrameWriter as a (frames, height, width, channels) array.
+    """
+
+    meta = json.loads(raw_meta_path(path).read_text())
+    if meta["frames"] == 0:
+        return np.zeros((0, *meta["shape"]), dtype=meta["dtype"])
+    return np.memmap(path, dtype=meta["dtype"], mode="r", shape=(meta["frames"], *meta["shape"]))
+
+
+class FrameStream:
+    """
+    Renders and encodes frames in a background thread.
+
+    Render states are queued with a bounded queue, so a slow encoder blocks the producer instead
+    of piling frames up in memory. Errors of the thread are raised by the next submit or close.
+    The stream takes the writer over and closes it in close(), even after an error.
+    """
+
+    def __init__(
+        self, writer: GifWriter | RawFrameWriter, queue_size: int = 32, **render_kwargs
+    ) -> None:
+        self.writer = writer
+        self.render_kwargs = render_kwargs
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._error: Exception | None = None
+        self._thread = threading.Thread(target=self._run, name="sssnake-video", daemon=True)
+        self._thread.start()
+
+    @property
+    def frames(self) -> int:
+        return self.writer.frames
+
+    def submit(
+        self,
+        render_state: RenderState,
+        bitmap_path: str = "",
+        obstacles_map: np.ndarray | None = None,
+    ):
+        self._raise_error()
+        self._queue.put((render_state, bitmap_path, obstacles_map))
+
+    def close(self):
+        try:
+            if self._thread.is_alive():
+                self._queue.put(_STOP)
+                self._thread.join()
+        finally:
+            self.writer.close()
+        self._raise_error()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._error is not None:
+                # Keep draining, so that the producer never blocks on a dead stream.
+                continue
+            try:
+                render_state, bitmap_path, obstacles_map = item
+                frame = state_to_array(
+                    render_state, bitmap_path, obstacles_map=obstacles_map, **self.render_kwargs
+                )
+                self.writer.write(frame)
+            except Exception as e:
+                # Raised by the next submit or close, in the caller's thread.
+                self._error = e
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError("Video encoding failed") from self._error
+
+
+class VideoRecorder(gym.Wrapper):
+    """
+    Streams the frames of an EnvEngine into a video file, one frame after the reset and one after
+    every step. Rendering and encoding run in a background thread, memory use doesn't grow with
+    the episode length.
+
+    The format is "gif" for an animated GIF, or "raw" for raw RGBA frames readable with
+    load_raw_frames. By default it follows the file suffix. The env doesn't need a render mode.
+    """
+
+    def __init__(
+        self,
+        env: gym.Env,
+        path: str | Path,
+        video_format: str | None = None,
+        fps: float = 30.0,
+        out_size: int = 320,
+        queue_size: int = 32,
+    ) -> None:
+        super().__init__(env)
+
+        path = Path(path)
+        if video_format is None:
+            video_format = "gif" if path.suffix.lower() == ".gif" else "raw"
+        if video_format not in VIDEO_FORMATS:
+            raise ValueError(f"Video format '{video_format}' not supported.")
+
+        writer = GifWriter(path, fps) if video_format == "gif" else RawFrameWriter(path)
+
+        spec = self.engine.env_spec
+        render_kwargs: Dict[str, Any] = {
+            "out_size": out_size,
+            "engine": spec.render_engine,
+            "angle_steps": spec.render_angle_steps,
+        }
+        self.stream = FrameStream(writer, queue_size, **render_kwargs)
+
+    @property
+    def engine(self) -> EnvEngine:
+        engine = self.env.unwrapped
+        assert isinstance(engine, EnvEngine)
+        return engine
+
+    @property
+    def frames(self) -> int:
+        return self.stream.frames
+
+    def reset(self, *, seed: int | None = None, options: Any = None):
+        obs, info = self.env.reset(seed=seed, options=options)
+        self._submit()
+        return obs, info
+
+    def step(self, action):
+        result = self.env.step(action)
+        self._submit()
+        return result
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+    def _submit(self):
+        engine = self.engine
+        assert engine.last_reset_options is not None
+        self.stream.submit(
+            RenderState.from_full_state(engine.state),
+            engine.last_reset_options.map_bitmap_path,
+            engine.obstacles_map,
+        )
@@ -32,6 +32,21 @@ class EnvSpec:
     max_num_steps: float
     seed: Optional[int] = None
 
+    tail_collision_grid: bool = False
+    safe_map_engine: str = "square"
+    candy_sampler: str = "rejection"
+    candy_avoid_tail: bool = False
+    render_engine: str = "exact"
+    render_angle_steps: int = 72
+    occupancy_grid_resolution: int = 64
+    lidar_rays: int = 16
+    lidar_fov: float = 360.0
+    lidar_range: float = 30.0
+    local_view_size: int = 16
+    local_view_headings: int = 72
+    map_pool: str = ""
+    map_cache_dir: str = ""
+
     @staticmethod
     def from_dict(d: Mapping[str, Any]) -> EnvSpec:
         return EnvSpec(**d)
@@ -47,6 +62,7 @@ class ResetOptions:
 
     map_size: float
     map_bitmap_path: str = ""
+    map_generator: str = ""
 
     @staticmethod
     def from_dict(d: Mapping[str, Any]) -> ResetOptions:
@@ -60,6 +76,8 @@ class ResetOptions:
 @dataclass(frozen=True, slots=True)
 class RenderConfig:
     map_bitmap_path: str
+    render_engine: str = "exact"
+    render_angle_steps: int = 72
 
     @classmethod
     def from_reset(cls, opts: ResetOptions) -> RenderConfig:
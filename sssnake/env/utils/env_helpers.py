@@ -27,15 +27,25 @@ def load_obstacles_map(path: Union[str, Path], col_res: int) -> np.ndarray:
     return obstacles
 
 
+SAFE_MAP_ENGINES = ("square", "edt")
+
+
 def generate_safe_map(
     margin_units: float,
     map_size: float,
     obstacles_map: np.ndarray,
+    engine: str = "square",
 ) -> np.ndarray:
     """
     Generates a safe map based on an obstacles map.
+
+    The "square" engine dilates obstacles with a square kernel, the "edt" engine keeps the cells
+    farther than the margin from any obstacle in Euclidean distance (a circular margin).
     """
 
+    if engine not in SAFE_MAP_ENGINES:
+        raise ValueError(f"Safe map engine '{engine}' not supported.")
+
     obst = np.asarray(obstacles_map, dtype=np.int8)
     n = obst.shape[0]
     margin = max(int(margin_units * (n / map_size)), 1)
@@ -43,6 +53,9 @@ def generate_safe_map(
     if obst.max() == 0:
         return np.ones_like(obst, dtype=np.int8)
 
+    if engine == "edt":
+        return (distance_transform_sq(obst) > margin * margin).astype(np.int8)
+
     dilated = np.zeros_like(obst, dtype=np.int8)
 
     for dy in range(-margin, margin + 1):
@@ -58,6 +71,76 @@ def generate_safe_map(
     return safe_map.astype(np.int8)
 
 
+def distance_transform_sq(obstacles_map: np.ndarray) -> np.ndarray:
+    """
+    Exact squared Euclidean distance from every cell to the nearest obstacle cell.
+
+    Separable linear-time transform: a per-column sweep, then the lower envelope of parabolas
+    (Felzenszwalb & Huttenlocher) along the rows, computed for all the rows at once.
+    """
+
+    obst = np.asarray(obstacles_map) != 0
+    h, w = obst.shape
+    big = float(4 * (h * h + w * w))
+
+    # Distance to the nearest obstacle within the same column.
+    rows = np.arange(h, dtype=np.float64)[:, None]
+    above = np.maximum.accumulate(np.where(obst, rows, -np.inf), axis=0)
+    below = np.minimum.accumulate(np.where(obst, rows, np.inf)[::-1], axis=0)[::-1]
+    col_dist = np.minimum(rows - above, below - rows)
+    f = np.where(np.isfinite(col_dist), col_dist**2, big)
+
+    return _lower_envelope_rows(f)
+
+
+def _lower_envelope_rows(f: np.ndarray) -> np.ndarray:
+    """
+    Computes min over q' of f[:, q'] + (q - q')^2 for every row of f.
+    """
+
+    r, n = f.shape
+    rows = np.arange(r)
+    ft = np.ascontiguousarray(f.T)
+
+    # Parabola apexes v and envelope breakpoints z of every row, stored column-major and
+    # addressed through flat indices, so each row keeps its own envelope length k.
+    v = np.zeros((n + 1) * r, dtype=np.int64)
+    z = np.full((n + 2) * r, np.inf)
+    z[:r] = -np.inf
+    k = np.zeros(r, dtype=np.int64)
+    fv = ft[0].copy()
+
+    for q in range(1, n):
+        fq = ft[q] + q * q
+        vk = v[k * r + rows]
+        s = (fq - (fv + vk * vk)) / (2 * (q - vk))
+        popping = s <= z[k * r + rows]
+        while popping.any():
+            sel = rows[popping]
+            k[sel] -= 1
+            vk = v[k[sel] * r + sel]
+            s[sel] = (fq[sel] - (ft[vk, sel] + vk * vk)) / (2 * (q - vk))
+            popping[sel] = s[sel] <= z[k[sel] * r + sel]
+
+        k += 1
+        v[k * r + rows] = q
+        z[k * r + rows] = s
+        z[(k + 1) * r + rows] = np.inf
+        fv = ft[q].copy()
+
+    # Every query q lies on the parabola whose breakpoint interval contains it: count the
+    # breakpoints below q with a histogram of the first integer query past each breakpoint.
+    breaks = z[r:].reshape(n + 1, r)
+    first_q = np.floor(np.clip(breaks, -1.0, float(n))).astype(np.int64) + 1
+    first_q[np.arange(1, n + 2)[:, None] > k] = n + 1
+    counts = np.bincount((first_q * r + rows).ravel(), minlength=(n + 2) * r)
+    seg = np.cumsum(counts.reshape(n + 2, r), axis=0)[:n]
+
+    vk = v.reshape(n + 1, r)[seg, rows]
+    queries = np.arange(n)[:, None]
+    return ((queries - vk) ** 2 + ft[vk, rows]).T
+
+
 def load_config(jsonpath: str):
     with open(jsonpath, "r", encoding="utf-8") as f:
         raw = json.load(f)
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+
+from sssnake.env.core import kernels
+
+LIDAR_CHANNELS = ("wall", "obstacle", "tail")
+DEFAULT_LIDAR_RAYS = 16
+DEFAULT_LIDAR_FOV = 360.0
+DEFAULT_LIDAR_RANGE = 30.0
+
+# sin(a + pi / 2) is cos(a).
+_SIN_COS_PHASE = np.array([0.0, np.pi / 2])
+
+
+def ray_offsets(rays: int, fov: float) -> np.ndarray:
+    """
+    Angles of the rays relative to the head direction, in degrees, spread from the right (-fov/2)
+    to the left. A full circle doesn't repeat its first ray.
+    """
+
+    full = fov >= 360.0
+    return np.linspace(-fov / 2, fov / 2, rays, endpoint=not full or rays == 1)
+
+
+class LidarSensor:
+    """
+    Distances along rays fanned around the head direction to the first wall, unsafe safe-map cell
+    and tail segment, one channel per entry of LIDAR_CHANNELS. Nothing within max_range reads as
+    max_range.
+
+    All rays of a batch of snakes are cast at once: the safe map is marched exactly, checking the
+    cell entered at every grid line a ray crosses before leaving the map or max_range, and
+    segments are intersected as discs of radius tail_radius. Tables derived from the safe map and
+    the marching buffers are kept between casts, so a sensor is meant to be reused. With the Numba
+    kernel backend, rays are cast by the compiled kernels.cast_rays instead.
+    """
+
+    def __init__(
+        self,
+        rays: int = DEFAULT_LIDAR_RAYS,
+        fov: float = DEFAULT_LIDAR_FOV,
+        max_range: float = DEFAULT_LIDAR_RANGE,
+        tail_radius: float = 1.0,
+    ) -> None:
+        self.rays = rays
+        self.fov = fov
+        self.max_range = max_range
+        self.tail_radius = tail_radius
+
+        self.offsets = ray_offsets(rays, fov)
+        # Rotating (sin, cos) of the head direction by the offsets gives the ray directions.
+        rad = np.radians(self.offsets)
+        self._offset_sin, self._offset_cos = np.sin(rad), np.cos(rad)
+        self._rotate_same = np.stack((self._offset_cos, self._offset_cos), axis=-1)
+        self._rotate_swapped = np.stack((self._offset_sin, -self._offset_sin), axis=-1)
+
+        self._safe_map_source: np.ndarray | None = None
+        self._unsafe_table = np.zeros(0)
+        self._has_unsafe = False
+
+        self._steps = np.zeros(0)
+        self._march = np.zeros((3, 0))
+        self._march_index = np.zeros(0, dtype=np.intp)
+        self._march_key: Tuple[int, ...] = ()
+        self._march_views: Tuple[np.ndarray, ...] = ()
+
+        # Batch of one inputs of cast_one.
+        self._one_head = np.zeros((1, 2))
+        self._one_direction = np.zeros(1)
+        self._one_map_size = np.zeros(1)
+        self._one_count = np.zeros(1, dtype=np.int64)
+
+    @property
+    def shape(self):
+        return self.rays, len(LIDAR_CHANNELS)
+
+    def cast(
+        self,
+        head: np.ndarray,
+        direction: np.ndarray,
+        map_size: np.ndarray,
+        safe_map: np.ndarray,
+        segments: np.ndarray,
+        counts: np.ndarray,
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Casts the rays of B snakes: head (B, 2), direction (B,) in degrees, map_size (B,),
+        segments (B, M, 2) of which the first counts (B,) are active. Returns (B, rays, 3).
+        """
+
+        head = np.asarray(head, dtype=np.float64)
+        map_size = np.asarray(map_size, dtype=np.float64)
+        if out is None:
+            out = np.empty((len(head), *self.shape), dtype=np.float32)
+
+        if kernels.cast_rays is not None:
+            kernels.cast_rays(
+                head,
+                np.asarray(direction, dtype=np.float64),
+                map_size,
+                safe_map,
+                segments,
+                np.asarray(counts),
+                self._offset_sin,
+                self._offset_cos,
+                self.max_range,
+                self.tail_radius,
+                self._has_unsafe_cells(safe_map),
+                out,
+            )
+            return out
+
+        # Ray directions (sin, cos) as (B, rays, 2).
+        ang = np.radians(np.asarray(direction, dtype=np.float64))[:, None] + _SIN_COS_PHASE
+        heading = np.sin(ang)[:, None, :]
+        rays = heading * self._rotate_same + heading[..., ::-1] * self._rotate_swapped
+
+        # Axis-aligned rays take huge but finite steps along the other axis.
+        inv = 1.0 / np.copysign(np.maximum(np.abs(rays), 1e-12), rays)
+
+        wall = self._wall(head, map_size, inv)
+        out[..., 0] = wall
+        out[..., 1] = self._obstacle(head, map_size, rays, inv, wall, safe_map)
+        out[..., 2] = self._tail(head, rays, segments, counts)
+        np.minimum(out, self.max_range, out=out)
+        np.maximum(out, 0.0, out=out)
+        return out
+
+    def cast_one(
+        self,
+        head: Tuple[float, float],
+        direction: float,
+        map_size: float,
+        safe_map: np.ndarray,
+        segments: np.ndarray,
+        count: int,
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Casts the rays of a single snake, segments (M, 2), returning (rays, 3).
+        """
+
+        self._one_head[0, 0], self._one_head[0, 1] = head
+        self._one_direction[0] = direction
+        self._one_map_size[0] = map_size
+        self._one_count[0] = count
+        return self.cast(
+            self._one_head,
+            self._one_direction,
+            self._one_map_size,
+            safe_map,
+            segments[None],
+            self._one_count,
+            out=None if out is None else out[None],
+        )[0]
+
+    def _wall(self, head, size, inv) -> np.ndarray:
+        axes = (np.where(inv > 0, size[:, None, None], 0.0) - head[:, None, :]) * inv
+        return np.minimum(axes[..., 0], axes[..., 1])
+
+    def _obstacle(self, head, size, rays, inv, wall, safe_map) -> np.ndarray:
+        if not self._has_unsafe_cells(safe_map):
+            return np.full(wall.shape, self.max_range)
+
+        res = safe_map.shape[0]
+        cell = (size / res)[:, None]
+        start = np.floor(head / cell)
+
+        # Crossing the k-th grid line of an axis enters the cell k + 1 steps away along that axis,
+        # the cell along the other axis follows from where the ray is at that point. Cells are
+        # indexed in the safe map padded by one safe cell, so that rays leaving the map through a
+        # corner never wrap around to the next row. Rays never march past the walls, nor past
+        # max_range.
+        width = res + 2
+        reach = min(self.max_range, float(wall.max())) * res / float(size.min())
+        lines = min(res + 1, int(reach) + 1)
+        steps = self._step_range(lines)
+        t, other, index, flat = self._march_buffers(rays.shape, lines)
+
+        forward = inv > 0
+        sign = np.where(forward, 1.0, -1.0)
+        # Flat index factors of the crossed axis and of the other axis, for x and y crossings.
+        crossed = np.array([1.0, width])
+        along = crossed[::-1]
+
+        t0 = ((start[:, None, :] + forward) * cell[..., None] - head[:, None, :]) * inv
+        t_step = cell[..., None] * np.abs(inv)
+        np.multiply(t_step[..., None], steps, out=t)
+        t += t0[..., None]
+
+        # Other axis cell, 1 + floor(position / cell), as a linear function of the crossing.
+        rel_other = (head[:, None, ::-1] + rays[..., ::-1] * t0) / cell[..., None] + 1.0
+        other_step = rays[..., ::-1] * t_step / cell[..., None]
+        np.multiply(other_step[..., None], steps, out=other)
+        other += rel_other[..., None]
+        np.floor(other, out=other)
+        other *= along[:, None]
+
+        first = (start[:, None, :] + 1.0 + sign) * crossed
+        np.multiply((sign * crossed)[..., None], steps, out=index)
+        index += first[..., None]
+        index += other
+        np.copyto(flat, index, casting="unsafe")
+
+        table = self._unsafe_table
+        np.take(table, flat, out=index, mode="clip")
+        index += t
+        hit = index.min(axis=(-2, -1))
+
+        # Hits past the walls are cells outside the map.
+        far = np.where(hit < wall, hit, self.max_range)
+
+        # A head already in an unsafe cell reads 0.
+        first_cell = ((start + 1.0) * crossed).sum(axis=-1).astype(np.intp)
+        return np.minimum(far, table.take(first_cell, mode="clip")[:, None], out=far)
+
+    def _has_unsafe_cells(self, safe_map: np.ndarray) -> bool:
+        if safe_map is not self._safe_map_source:
+            unsafe = safe_map == 0
+            padded = np.zeros((unsafe.shape[0] + 2, unsafe.shape[1] + 2), dtype=np.bool_)
+            padded[1:-1, 1:-1] = unsafe
+            # 0 for unsafe cells and inf for the others, so that adding the crossing distances
+            # keeps the distances of the unsafe cells only.
+            self._unsafe_table = np.where(padded, 0.0, np.inf).ravel()
+            self._has_unsafe = bool(unsafe.any())
+            self._safe_map_source = safe_map
+        return self._has_unsafe
+
+    def _step_range(self, lines: int) -> np.ndarray:
+        if len(self._steps) < lines:
+            self._steps = np.arange(lines, dtype=np.float64)
+        return self._steps[:lines]
+
+    def _march_buffers(self, shape, lines: int):
+        """
+        Float buffers for the crossing distances, other axis cells and flat cell indices of
+        shape (*shape, lines), and the intp copy of the indices. Reused while the shape holds.
+        """
+
+        key = (*shape, lines)
+        if key != self._march_key:
+            size = int(np.prod(key))
+            if self._march.shape[1] < size:
+                self._march = np.empty((3, size))
+                self._march_index = np.empty(size, dtype=np.intp)
+            self._march_views = (
+                *(buf[:size].reshape(key) for buf in self._march),
+                self._march_index[:size].reshape(key),
+            )
+            self._march_key = key
+        return self._march_views
+
+    def _tail(self, head, rays, segments, counts) -> np.ndarray:
+        longest = int(np.asarray(counts).max(initial=0))
+        if longest == 0:
+            return np.full(rays.shape[:2], self.max_range)
+
+        rel = segments[:, :longest].astype(np.float64) - head[:, None, :]
+        # Inactive segments of shorter snakes never intersect.
+        rel[np.arange(longest) >= np.asarray(counts)[:, None]] = np.nan
+
+        # Projection of every segment on every ray, and its squared distance from the ray.
+        along = np.matmul(rays, rel.transpose(0, 2, 1))
+        half_chord_sq = self.tail_radius**2 - ((rel**2).sum(axis=-1)[:, None, :] - along**2)
+        half_chord = np.sqrt(np.maximum(half_chord_sq, 0.0))
+
+        hit = (half_chord_sq > 0) & (along + half_chord > 0)
+        entry = np.where(hit, np.maximum(along - half_chord, 0.0), np.inf)
+        return entry.min(axis=-1)
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+
+MapGenerator = Callable[..., np.ndarray]
+
+
+def random_rectangles(
+    rng: np.random.Generator,
+    resolution: int,
+    count: int | None = None,
+    min_size: int | None = None,
+    max_size: int | None = None,
+) -> np.ndarray:
+    """
+    Scatters count axis-aligned rectangles with sides between min_size and max_size cells.
+    """
+
+    count = resolution // 5 if count is None else count
+    min_size = max(1, resolution // 10) if min_size is None else min_size
+    max_size = max(min_size, resolution // 4) if max_size is None else max_size
+
+    size = rng.integers(min_size, max_size + 1, size=(2, count))
+    start = rng.integers(0, resolution - size + 1)
+
+    cells = np.arange(resolution)
+    rows = (cells >= start[1][:, None]) & (cells < (start[1] + size[1])[:, None])
+    cols = (cells >= start[0][:, None]) & (cells < (start[0] + size[0])[:, None])
+    return (rows[:, :, None] & cols[:, None, :]).any(axis=0).astype(np.int8)
+
+
+def cellular_caves(
+    rng: np.random.Generator,
+    resolution: int,
+    fill: float = 0.42,
+    iterations: int = 4,
+) -> np.ndarray:
+    """
+    Fills cells at random and smooths them with the 4-5 cellular automaton rule: a cell becomes
+    an obstacle with at least 5 obstacle neighbours, or stays one with at least 4. Cells beyond
+    the border count as obstacles.
+    """
+
+    obstacles = rng.random((resolution, resolution)) < fill
+
+    for _ in range(iterations):
+        padded = np.pad(obstacles, 1, constant_values=True).astype(np.int8)
+        neighbours = sum(
+            padded[1 + dy : 1 + dy + resolution, 1 + dx : 1 + dx + resolution]
+            for dy in (-1, 0, 1)
+            for dx in (-1, 0, 1)
+            if dy or dx
+        )
+        obstacles = (neighbours >= 5) | (obstacles & (neighbours >= 4))
+
+    return obstacles.astype(np.int8)
+
+
+def binary_tree_maze(
+    rng: np.random.Generator,
+    resolution: int,
+    passage: int | None = None,
+    wall: int = 1,
+) -> np.ndarray:
+    """
+    Perfect maze of passage cells wide corridors separated by wall cells thick walls, every maze
+    cell opening either down or right at random (towards the other one along the last row and
+    column).
+    """
+
+    passage = max(3, resolution // 10) if passage is None else passage
+    cells = max(1, (resolution - wall) // (passage + wall))
+
+    # Lattice of walls (odd sizes) and maze cells (even sizes) before scaling them up.
+    lattice = np.ones((2 * cells + 1, 2 * cells + 1), dtype=np.int8)
+    lattice[1::2, 1::2] = 0
+
+    down = rng.random((cells, cells)) < 0.5
+    down[:, -1] = True
+    down[-1, :] = False
+    right = ~down
+    right[-1, -1] = False
+
+    lattice[2:-1:2, 1::2] = ~down[:-1]
+    lattice[1::2, 2:-1:2] = ~right[:, :-1]
+
+    widths = np.where(np.arange(2 * cells + 1) % 2, passage, wall)
+    maze = np.repeat(np.repeat(lattice, widths, axis=0), widths, axis=1)
+
+    obstacles = np.ones((resolution, resolution), dtype=np.int8)
+    obstacles[: maze.shape[0], : maze.shape[1]] = maze
+    return obstacles
+
+
+def random_corridors(
+    rng: np.random.Generator,
+    resolution: int,
+    count: int = 6,
+    width: int | None = None,
+) -> np.ndarray:
+    """
+    Carves corridors width cells wide out of a solid map, joining count + 1 random points one
+    after another with L-shaped turns, so that every corridor is reachable from the others.
+    """
+
+    width = max(3, resolution // 10) if width is None else width
+    points = rng.integers(0, resolution - width + 1, size=(count + 1, 2))
+    horizontal_first = rng.random(count) < 0.5
+
+    obstacles = np.ones((resolution, resolution), dtype=np.int8)
+    for (x0, y0), (x1, y1), flat in zip(points[:-1], points[1:], horizontal_first, strict=True):
+        corner = (x1, y0) if flat else (x0, y1)
+        for (ax, ay), (bx, by) in (((x0, y0), corner), (corner, (x1, y1))):
+            obstacles[min(ay, by) : max(ay, by) + width, min(ax, bx) : max(ax, bx) + width] = 0
+
+    return obstacles
+
+
+MAP_GENERATORS: Dict[str, MapGenerator] = {
+    "rectangles": random_rectangles,
+    "caves": cellular_caves,
+    "maze": binary_tree_maze,
+    "corridors": random_corridors,
+}
+
+
+def generate_obstacles_map(
+    name: str, rng: np.random.Generator, resolution: int, **params: Any
+) -> np.ndarray:
+    """
+    Generates a resolution x resolution int8 obstacles map, 1 marking an obstacle like in maps
+    loaded by load_obstacles_map.
+    """
+
+    if name not in MAP_GENERATORS:
+        raise ValueError(f"Unknown map generator '{name}', expected {list(MAP_GENERATORS)}")
+    return MAP_GENERATORS[name](rng, resolution, **params)
+
+
+def reachable_cells(free: np.ndarray, start: Tuple[int, int]) -> np.ndarray:
+    """
+    Marks the free cells 4-connected to the start (row, column) cell.
+
+    Rather than visiting cells one by one, every sweep spreads the reached cells along whole
+    runs of free cells, alternately along the rows and the columns, until nothing changes.
+    """
+
+    free = np.asarray(free, dtype=np.bool_)
+    reached = np.zeros_like(free)
+    if not free[start]:
+        return reached
+    reached[start] = True
+
+    # Runs of free cells along the rows, and along the columns, labelled with flat run ids.
+    runs = []
+    for grid in (free, free.T):
+        starts = grid.copy()
+        starts[:, 1:] &= ~grid[:, :-1]
+        runs.append((np.cumsum(starts.ravel()).reshape(grid.shape) - 1, grid))
+
+    changed = True
+    while changed:
+        changed = False
+        for axis, (labels, grid) in enumerate(runs):
+            view = reached.T if axis else reached
+            hit = np.zeros(labels.max() + 1, dtype=np.bool_)
+            hit[labels[view]] = True
+
+            spread = grid & hit[labels]
+            if (spread != view).any():
+                changed = True
+                view[...] = spread
+
+    return reached
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+
+OCCUPANCY_CHANNELS = ("obstacles", "body", "head", "candy")
+DEFAULT_OCCUPANCY_RESOLUTION = 64
+
+LOCAL_VIEW_CHANNELS = ("obstacles", "body")
+DEFAULT_LOCAL_VIEW_SIZE = 16
+DEFAULT_LOCAL_VIEW_HEADINGS = 72
+
+
+def pool_obstacles(safe_map: np.ndarray, resolution: int) -> np.ndarray:
+    """
+    Downsamples the safe map to resolution x resolution, marking a cell as an obstacle when any
+    of the safe map's cells it covers is unsafe.
+    """
+
+    res = safe_map.shape[0]
+    starts = np.arange(resolution) * res // resolution
+
+    safe = np.minimum.reduceat(safe_map, starts, axis=0)
+    safe = np.minimum.reduceat(safe, starts, axis=1)
+    return (safe == 0).astype(np.uint8)
+
+
+def point_cells(
+    points: np.ndarray | Tuple[float, float], map_size: float, resolution: int
+) -> Tuple[np.ndarray, ...]:
+    """
+    Converts map coordinates into (row, column) grid indices, the same way as hit_obstacle.
+    """
+
+    cells = (np.asarray(points, dtype=np.float64) / map_size * resolution).astype(np.int64)
+    np.clip(cells, 0, resolution - 1, out=cells)
+    return cells[..., 1], cells[..., 0]
+
+
+class OccupancyRasterizer:
+    """
+    Rasterizes the state into a resolution x resolution grid with one uint8 channel per entry of
+    OCCUPANCY_CHANNELS. The pooled obstacles are kept until the safe map changes.
+    """
+
+    def __init__(self, resolution: int = DEFAULT_OCCUPANCY_RESOLUTION) -> None:
+        self.resolution = resolution
+
+        self._source: np.ndarray | None = None
+        self._obstacles = np.zeros((resolution, resolution), dtype=np.uint8)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.resolution, self.resolution, len(OCCUPANCY_CHANNELS)
+
+    def obstacles(self, safe_map: np.ndarray) -> np.ndarray:
+        if safe_map is not self._source:
+            self._obstacles = pool_obstacles(safe_map, self.resolution)
+            self._source = safe_map
+        return self._obstacles
+
+    def rasterize(
+        self,
+        safe_map: np.ndarray,
+        head_position: Tuple[float, float],
+        segments_positions: np.ndarray,
+        candy_position: Tuple[float, float],
+        map_size: float,
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Writes the occupancy grid into out, allocating it when not given.
+        """
+
+        if out is None:
+            out = np.zeros(self.shape, dtype=np.uint8)
+        else:
+            out[...] = 0
+
+        res = self.resolution
+        out[..., 0] = self.obstacles(safe_map)
+
+        if len(segments_positions):
+            rows, cols = point_cells(segments_positions, map_size, res)
+            out[rows, cols, 1] = 1
+
+        row, col = point_cells(head_position, map_size, res)
+        out[row, col, 2] = 1
+
+        row, col = point_cells(candy_position, map_size, res)
+        out[row, col, 3] = 1
+
+        return out
+
+
+def sampling_grids(size: int, headings: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row and column offsets (headings, size, size) from the head's cell to the cell under every
+    window cell, for headings evenly spread over the full circle. Window rows run from ahead of
+    the head to behind it and columns from its left to its right, the head's cell being at
+    (size // 2, size // 2) whatever the heading.
+    """
+
+    ahead = size // 2 - np.arange(size)[:, None]
+    right = np.arange(size)[None, :] - size // 2
+
+    ang = np.radians(np.arange(headings) * 360.0 / headings)[:, None, None]
+    sin, cos = np.sin(ang), np.cos(ang)
+
+    # The head moves along (sin, cos), its right is that vector turned by -90 degrees.
+    x = ahead * sin - right * cos
+    y = ahead * cos + right * sin
+    return np.floor(y + 0.5).astype(np.int64), np.floor(x + 0.5).astype(np.int64)
+
+
+class LocalViewCropper:
+    """
+    Crops a size x size window of the safe map around the head, rotated so the head always points
+    up, with one uint8 channel per entry of LOCAL_VIEW_CHANNELS. A window cell covers one safe map
+    cell and everything outside the map reads as an obstacle.
+
+    The sampling grid of every quantized heading is precomputed, so a crop is a single gather
+    from the obstacle and body layers of a padded copy of the safe map, kept until it changes.
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_LOCAL_VIEW_SIZE,
+        headings: int = DEFAULT_LOCAL_VIEW_HEADINGS,
+    ) -> None:
+        self.size = size
+        self.headings = headings
+
+        self._rows, self._cols = sampling_grids(size, headings)
+        self._pad = int(np.abs(np.concatenate((self._rows, self._cols))).max())
+
+        self._source: np.ndarray | None = None
+        self._layers = np.zeros((0, len(LOCAL_VIEW_CHANNELS)), dtype=np.uint8)
+        self._offsets = np.zeros((headings, size * size), dtype=np.intp)
+        self._index = np.zeros(size * size, dtype=np.intp)
+        # Gather target when out may be a non-contiguous or non-uint8 view, like a flat obs.
+        self._window = np.zeros(self.shape, dtype=np.uint8)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.size, self.size, len(LOCAL_VIEW_CHANNELS)
+
+    def _prepare(self, safe_map: np.ndarray) -> None:
+        if safe_map is self._source:
+            return
+
+        pad, width = self._pad, safe_map.shape[1] + 2 * self._pad
+        layers = np.zeros((safe_map.shape[0] + 2 * pad, width, 2), dtype=np.uint8)
+        layers[..., 0] = np.pad(safe_map == 0, pad, constant_values=True)
+
+        # Layers are flattened so that the window is gathered with flat cell indices.
+        self._layers = layers.reshape(-1, 2)
+        self._offsets = (self._rows * width + self._cols).reshape(self.headings, -1)
+        self._source = safe_map
+
+    def crop(
+        self,
+        safe_map: np.ndarray,
+        head_position: Tuple[float, float] | np.ndarray,
+        head_direction: float,
+        segments_positions: np.ndarray,
+        map_size: float,
+        out: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """
+        Writes the window around the head into out, allocating it when not given.
+        """
+
+        self._prepare(safe_map)
+        res, pad = safe_map.shape[0], self._pad
+        width = safe_map.shape[1] + 2 * pad
+
+        row, col = point_cells(head_position, map_size, res)
+        heading = round(head_direction / 360.0 * self.headings) % self.headings
+        np.add(self._offsets[heading], (row + pad) * width + col + pad, out=self._index)
+
+        body = None
+        if len(segments_positions):
+            rows, cols = point_cells(segments_positions, map_size, res)
+            body = (rows + pad) * width + cols + pad
+            self._layers[body, 1] = 1
+
+        window = np.empty(self.shape, dtype=np.uint8) if out is None else self._window
+        np.take(self._layers, self._index, axis=0, out=window.reshape(-1, 2), mode="clip")
+
+        if body is not None:
+            self._layers[body, 1] = 0
+
+        if out is None:
+            return window
+        np.copyto(out, window.reshape(out.shape))
+        return out
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from typing import Callable, Dict, Sequence
+from typing import Callable, Dict, List, Sequence, Tuple
 
 import numpy as np
 from gymnasium import spaces
 
 from sssnake.env.utils.config_def import EnvSpec
+from sssnake.env.utils.lidar import LIDAR_CHANNELS
+from sssnake.env.utils.raster import LOCAL_VIEW_CHANNELS, OCCUPANCY_CHANNELS
 
 SpaceFactory = Callable[[EnvSpec], spaces.Space]
 
@@ -46,6 +48,28 @@ OBS_SPACE_FACTORIES: Dict[str, SpaceFactory] = {
         shape=(spec.collision_map_resolution, spec.collision_map_resolution),
         dtype=np.int64,
     ),
+    "occupancy_grid": lambda spec: spaces.Box(
+        low=0,
+        high=1,
+        shape=(
+            spec.occupancy_grid_resolution,
+            spec.occupancy_grid_resolution,
+            len(OCCUPANCY_CHANNELS),
+        ),
+        dtype=np.uint8,
+    ),
+    "lidar": lambda spec: spaces.Box(
+        low=0.0,
+        high=spec.lidar_range,
+        shape=(spec.lidar_rays, len(LIDAR_CHANNELS)),
+        dtype=np.float32,
+    ),
+    "local_view": lambda spec: spaces.Box(
+        low=0,
+        high=1,
+        shape=(spec.local_view_size, spec.local_view_size, len(LOCAL_VIEW_CHANNELS)),
+        dtype=np.uint8,
+    ),
 }
 
 
@@ -54,4 +78,60 @@ def build_observation_space(spec: EnvSpec, obs_keys: Sequence[str] | None = None
     return spaces.Dict({k: OBS_SPACE_FACTORIES[k](spec) for k in keys})
 
 
-DEFAULT_OBS_KEYS = list(OBS_SPACE_FACTORIES)
+def split_obs_keys(
+    obs_keys: Sequence[str] | None, static_on_reset: bool = False
+) -> Tuple[List[str], List[str]]:
+    """
+    Validates the chosen obs keys and splits them into keys emitted every step and static keys
+    emitted only on reset, the latter being empty unless static_on_reset is set.
+    """
+
+    keys = list(obs_keys) if obs_keys is not None else list(DEFAULT_OBS_KEYS)
+
+    unknown = [k for k in keys if k not in OBS_SPACE_FACTORIES]
+    if unknown:
+        raise ValueError(
+            f"Unknown obs keys {unknown}, expected some of {list(OBS_SPACE_FACTORIES)}"
+        )
+
+    if not static_on_reset:
+        return keys, []
+    return (
+        [k for k in keys if k not in STATIC_OBS_KEYS],
+        [k for k in keys if k in STATIC_OBS_KEYS],
+    )
+
+
+def build_flat_observation_space(space: spaces.Dict) -> spaces.Box:
+    """
+    Builds a float32 Box concatenating all the keys of a Dict observation space, in its key order.
+    """
+
+    lows, highs = [], []
+    for sub in space.values():
+        assert isinstance(sub, spaces.Box)
+        lows.append(np.broadcast_to(sub.low, sub.shape).ravel())
+        highs.append(np.broadcast_to(sub.high, sub.shape).ravel())
+
+    return spaces.Box(
+        low=np.concatenate(lows).astype(np.float32),
+        high=np.concatenate(highs).astype(np.float32),
+        dtype=np.float32,
+    )
+
+
+DEFAULT_OBS_KEYS = [
+    "head_position",
+    "head_direction_vec",
+    "candy_position",
+    "segments_num",
+    "speed",
+    "turnspeed",
+    "map_size",
+    "segments_positions",
+    "safe_map_snake",
+]
+OBS_FORMATS = ("dict", "array", "flat")
+
+# Keys constant for a whole episode.
+STATIC_OBS_KEYS = ("safe_map_snake",)
@@ -2,11 +2,15 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from math import cos, radians, sin
-from typing import Any, Dict, List, Sequence, Tuple
+from typing import Any, Callable, Dict, Mapping, Sequence, Tuple
 
 import numpy as np
+from gymnasium import spaces
 
 from sssnake.env.utils.config_def import EnvSpec, ResetOptions
+from sssnake.env.utils.lidar import LidarSensor
+from sssnake.env.utils.raster import LocalViewCropper, OccupancyRasterizer
+from sssnake.env.utils.schema import DEFAULT_OBS_KEYS
 
 
 @dataclass
@@ -14,7 +18,7 @@ class FullState:
     head_position: Tuple[float, float]
     head_direction: float
     segments_num: int
-    segments_positions: List[Tuple[float, float]]
+    segments_positions: np.ndarray
     speed: float
     turnspeed: float
     map_size: float
@@ -27,7 +31,7 @@ class FullState:
             head_position=(0.0, 0.0),
             head_direction=opts.start_dir,
             segments_num=0,
-            segments_positions=[(0.0, 0.0)] * spec.tail_max_segment,
+            segments_positions=np.zeros((spec.tail_max_segment, 2), dtype=np.float32),
             speed=opts.snake_speed,
             turnspeed=opts.snake_turnspeed,
             map_size=opts.map_size,
@@ -38,22 +42,126 @@ class FullState:
             ),
         )
 
-    def to_obs(self, keys: Sequence[str] | None = None) -> ObservationDict:
-        obs: Dict[str, Any] = {
-            "head_position": self.head_position,
-            "head_direction_vec": self.direction_vector(),
-            "segments_num": self.segments_num,
-            "segments_positions": self.segments_positions,
-            "speed": self.speed,
-            "turnspeed": self.turnspeed,
-            "map_size": self.map_size,
-            "candy_position": self.candy_position,
-            "safe_map_snake": self.safe_map_snake,
-        }
+    def to_obs(
+        self,
+        keys: Sequence[str] | None = None,
+        out: ObsBuffers | None = None,
+        sensors: ObsSensors | None = None,
+    ) -> ObservationDict:
+        """
+        Builds the observation of the keys, or refreshes out. Keys derived by the env's sensors,
+        like occupancy_grid, lidar and local_view, need its ObsSensors.
+        """
+
+        if out is not None:
+            return self.write_obs(out, sensors)
 
         if keys is None:
-            return obs
-        return {k: obs[k] for k in keys if k in obs}
+            keys = DEFAULT_OBS_KEYS
+
+        # Only the requested keys are computed.
+        return {
+            k: OBS_GETTERS[k](self) if k in OBS_GETTERS else self.sensor_obs(k, sensors)
+            for k in keys
+            if k in OBS_GETTERS or k in SENSOR_OBS_GETTERS
+        }
+
+    def sensor_obs(
+        self, key: str, sensors: ObsSensors | None, out: np.ndarray | None = None
+    ) -> np.ndarray:
+        if sensors is None:
+            raise ValueError(f"Obs key '{key}' needs the ObsSensors of the env.")
+        return SENSOR_OBS_GETTERS[key](self, sensors, out)
+
+    def write_obs(self, out: ObsBuffers, sensors: ObsSensors | None = None) -> ObservationDict:
+        """
+        Refreshes the preallocated observation arrays in place and returns them.
+        """
+
+        arrays = out.arrays
+
+        for key, pos in (
+            ("head_position", self.head_position),
+            ("candy_position", self.candy_position),
+        ):
+            if key in arrays:
+                arr = arrays[key]
+                arr[0] = pos[0]
+                arr[1] = pos[1]
+
+        if "head_direction_vec" in arrays:
+            arr = arrays["head_direction_vec"]
+            ang = radians(self.head_direction)
+            arr[0] = sin(ang)
+            arr[1] = cos(ang)
+
+        for key, value in (
+            ("segments_num", self.segments_num),
+            ("speed", self.speed),
+            ("turnspeed", self.turnspeed),
+            ("map_size", self.map_size),
+        ):
+            if key in arrays:
+                arrays[key][...] = value
+
+        if "segments_positions" in arrays:
+            np.copyto(arrays["segments_positions"], self.segments_positions)
+
+        if "safe_map_snake" in arrays and out.safe_map_source is not self.safe_map_snake:
+            np.copyto(arrays["safe_map_snake"], self.safe_map_snake)
+            out.safe_map_source = self.safe_map_snake
+
+        for key in arrays.keys() & SENSOR_OBS_GETTERS.keys():
+            self.sensor_obs(key, sensors, out=arrays[key])
+
+        return arrays
+
+    def occupancy_grid(
+        self, rasterizer: OccupancyRasterizer, out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Rasterizes the obstacles, active segments, head and candy into a multi-channel grid.
+        """
+
+        return rasterizer.rasterize(
+            self.safe_map_snake,
+            self.head_position,
+            self.segments_positions[: self.segments_num],
+            self.candy_position,
+            self.map_size,
+            out=out,
+        )
+
+    def lidar_readings(self, sensor: LidarSensor, out: np.ndarray | None = None) -> np.ndarray:
+        """
+        Casts the lidar rays from the head, returning the (rays, channels) distances.
+        """
+
+        return sensor.cast_one(
+            self.head_position,
+            self.head_direction,
+            self.map_size,
+            self.safe_map_snake,
+            self.segments_positions,
+            self.segments_num,
+            out=out,
+        )
+
+    def local_view_window(
+        self, cropper: LocalViewCropper, out: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Crops the safe map and the active segments around the head, rotated to its heading.
+        """
+
+        return cropper.crop(
+            self.safe_map_snake,
+            self.head_position,
+            self.head_direction,
+            self.segments_positions[: self.segments_num],
+            self.map_size,
+            out=out,
+        )
 
     def direction_vector(self) -> Tuple[float, float]:
         ang = radians(self.head_direction)
@@ -63,12 +171,145 @@ class FullState:
 ObservationDict = Dict[str, Any]
 InfoDict = Dict[str, Any]
 
+OBS_GETTERS: Dict[str, Callable[[FullState], Any]] = {
+    "head_position": lambda s: s.head_position,
+    "head_direction_vec": lambda s: s.direction_vector(),
+    "segments_num": lambda s: s.segments_num,
+    "segments_positions": lambda s: s.segments_positions,
+    "speed": lambda s: s.speed,
+    "turnspeed": lambda s: s.turnspeed,
+    "map_size": lambda s: s.map_size,
+    "candy_position": lambda s: s.candy_position,
+    "safe_map_snake": lambda s: s.safe_map_snake,
+}
+
+
+class ObsSensors:
+    """
+    Helpers deriving obs keys from a FullState, like the occupancy grid rasterizer, the lidar
+    sensor or the local view cropper. They keep caches and precomputed tables, so an env owns one
+    instance, and each helper is only built once its key is asked for.
+    """
+
+    def __init__(self, spec: EnvSpec) -> None:
+        self.spec = spec
+        self._occupancy: OccupancyRasterizer | None = None
+        self._lidar: LidarSensor | None = None
+        self._local_view: LocalViewCropper | None = None
+
+    @property
+    def occupancy(self) -> OccupancyRasterizer:
+        if self._occupancy is None:
+            self._occupancy = OccupancyRasterizer(self.spec.occupancy_grid_resolution)
+        return self._occupancy
+
+    @property
+    def lidar(self) -> LidarSensor:
+        if self._lidar is None:
+            spec = self.spec
+            self._lidar = LidarSensor(
+                spec.lidar_rays, spec.lidar_fov, spec.lidar_range, spec.hit_tail_distance
+            )
+        return self._lidar
+
+    @property
+    def local_view(self) -> LocalViewCropper:
+        if self._local_view is None:
+            self._local_view = LocalViewCropper(
+                self.spec.local_view_size, self.spec.local_view_headings
+            )
+        return self._local_view
+
+
+SensorObsGetter = Callable[[FullState, ObsSensors, np.ndarray | None], np.ndarray]
+
+SENSOR_OBS_GETTERS: Dict[str, SensorObsGetter] = {
+    "occupancy_grid": lambda s, sensors, out: s.occupancy_grid(sensors.occupancy, out),
+    "lidar": lambda s, sensors, out: s.lidar_readings(sensors.lidar, out),
+    "local_view": lambda s, sensors, out: s.local_view_window(sensors.local_view, out),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class EnvSnapshot:
+    """
+    Complete dynamic state of an EnvEngine. Static data (maps, candy cells, reset options) is
+    shared by reference, arrays that change during the episode are copied.
+    """
+
+    state: FullState
+    path_positions: np.ndarray
+    path_arc_lengths: np.ndarray
+    num_steps: int
+    rng_state: Mapping[str, Any]
+    reset_options: ResetOptions | None
+    free_pos_candy: np.ndarray | None
+    candy_cell_index: Any
+    obstacles_map: np.ndarray | None = None
+
+
+@dataclass(slots=True)
+class SimulationResult:
+    """
+    Outcome of K simulated action sequences of length H.
+
+    Steps after a sequence's episode ended (terminated_at / truncated_at, -1 if it didn't) are
+    not simulated, final_head_positions holds the head positions at that point.
+    """
+
+    rewards: np.ndarray
+    step_rewards: np.ndarray
+    terminated_at: np.ndarray
+    truncated_at: np.ndarray
+    final_head_positions: np.ndarray
+
+
+class ObsBuffers:
+    """
+    Preallocated observation arrays, typed after the observation space and refreshed in place.
+
+    With flat=True every key is a view into a single float32 vector, laid out in the key order
+    of the observation space. Given arrays (e.g. views of shared memory) are written into instead
+    of allocating new ones.
+    """
+
+    def __init__(
+        self,
+        space: spaces.Dict,
+        flat: bool = False,
+        arrays: Dict[str, np.ndarray] | None = None,
+    ) -> None:
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.flat: np.ndarray | None = None
+        self.safe_map_source: np.ndarray | None = None
+
+        if arrays is not None:
+            assert not flat, "Flat buffers always own their vector"
+            for key, sub in space.items():
+                if arrays[key].shape != (sub.shape or ()) or arrays[key].dtype != sub.dtype:
+                    raise ValueError(f"Array of '{key}' doesn't match {sub}")
+                self.arrays[key] = arrays[key]
+            return
+
+        if not flat:
+            for key, sub in space.items():
+                self.arrays[key] = np.zeros(sub.shape or (), dtype=sub.dtype)
+            return
+
+        sizes = [int(np.prod(sub.shape or ())) for sub in space.values()]
+        self.flat = np.zeros(sum(sizes), dtype=np.float32)
+
+        offset = 0
+        for (key, sub), size in zip(space.items(), sizes, strict=True):
+            self.arrays[key] = self.flat[offset : offset + size].reshape(sub.shape or ())
+            offset += size
+
 
 @dataclass(slots=True)
 class RenderState:
     head_position: Tuple[float, float]
     head_direction: float
-    segments_positions: Sequence[Tuple[float, float]]
+    segments_positions: Sequence[Tuple[float, float]] | np.ndarray
     segments_num: float
     map_size: float
     candy_position: Tuple[float, float]
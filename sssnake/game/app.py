@@ -60,7 +60,13 @@ class App:
 
     def start_game(self) -> None:
         self.env.reset(options=self.reset_options)
-        self.renderer.set_render_config(RenderConfig.from_reset(self.reset_options))
+
+        # The env's options hold the bitmap picked from a map pool, its obstacles map the
+        # generated map.
+        assert self.env.last_reset_options is not None
+        self.renderer.set_render_config(
+            RenderConfig.from_reset(self.env.last_reset_options), self.env.obstacles_map
+        )
 
         self.game_loop: GameLoop = GameLoop(  # type: ignore[call-arg]
             master=self,
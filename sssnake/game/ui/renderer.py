@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import tkinter as tk
 
+import numpy as np
 from PIL import Image, ImageTk
 
 from sssnake.env.core.renderer import state_to_array
@@ -24,6 +25,7 @@ class Renderer:
         self.canvas_id = None
 
         self.render_config: RenderConfig | None = None
+        self.obstacles_map: np.ndarray | None = None
 
     def set_parent(self, mainview):
         self.parent = mainview.get_render_frame()
@@ -42,15 +44,28 @@ class Renderer:
         self.frame_buffer = ImageTk.PhotoImage(blank)
         self.canvas_id = self.canvas.create_image(0, 0, anchor="nw", image=self.frame_buffer)
 
-    def set_render_config(self, render_config: RenderConfig):
+    def set_render_config(
+        self, render_config: RenderConfig, obstacles_map: np.ndarray | None = None
+    ):
+        """
+        Sets what to draw the states on: the config's bitmap, or the env's generated obstacles map
+        when it has one.
+        """
+
         self.render_config = render_config
+        self.obstacles_map = obstacles_map
 
     def compute_render(self, render_state: RenderState) -> Image.Image:
-        bmp = ""
-        if self.render_config:
-            bmp = self.render_config.map_bitmap_path
-
-        arr = state_to_array(render_state, collision_bitmap_path=bmp, out_size=self.width)
+        config = self.render_config or RenderConfig(map_bitmap_path="")
+
+        arr = state_to_array(
+            render_state,
+            collision_bitmap_path=config.map_bitmap_path,
+            obstacles_map=self.obstacles_map,
+            out_size=self.width,
+            engine=config.render_engine,
+            angle_steps=config.render_angle_steps,
+        )
 
         return Image.fromarray(arr, mode="RGBA")
 
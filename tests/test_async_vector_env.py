@@ -0,0 +1,50 @@
+import numpy as np
+
+from sssnake.env.core.async_vector_env import SssnakeAsyncVectorEnv
+from sssnake.env.core.vector_env import SssnakeVectorEnv
+from sssnake.env.utils.snake_action import SnakeAction
+
+
+def test_async_matches_vector_env(spec_and_opts):
+    spec, opts = spec_and_opts
+    keys = ["head_position", "candy_position", "segments_num", "safe_map_snake"]
+
+    vec = SssnakeVectorEnv(num_envs=5, env_spec_in=spec, obs_keys=keys)
+    envs = SssnakeAsyncVectorEnv(num_envs=5, env_spec_in=spec, obs_keys=keys, num_workers=2)
+    try:
+        expected, _ = vec.reset(seed=11, options=opts)
+        obs, _ = envs.reset(seed=11, options=opts)
+        assert envs.observation_space.contains(obs)
+
+        rng = np.random.default_rng(0)
+        done_any = False
+        for _ in range(200):
+            actions = rng.integers(len(SnakeAction), size=5)
+            expected, exp_rew, exp_term, exp_trunc, _ = vec.step(actions)
+            obs, rewards, terminated, truncated, _ = envs.step(actions)
+
+            for key in keys:
+                np.testing.assert_allclose(obs[key], expected[key], atol=1e-5, err_msg=key)
+            np.testing.assert_array_equal(rewards, exp_rew)
+            np.testing.assert_array_equal(terminated, exp_term)
+            np.testing.assert_array_equal(truncated, exp_trunc)
+            done_any |= bool(terminated.any())
+
+        assert done_any, "Random actions should end some episodes, covering the autoreset"
+    finally:
+        envs.close()
+
+
+def test_async_reports_worker_errors(spec_and_opts):
+    spec, opts = spec_and_opts
+    envs = SssnakeAsyncVectorEnv(num_envs=2, env_spec_in=spec, num_workers=2)
+    try:
+        envs.reset(seed=0, options=opts)
+        try:
+            envs.step(np.array([0, 99]))
+        except RuntimeError as err:
+            assert "ValueError" in str(err)
+        else:
+            raise AssertionError("Invalid action should fail in the worker")
+    finally:
+        envs.close()
@@ -0,0 +1,25 @@
+import json
+
+from sssnake.bench import bench_reset, bench_steps, compare, main
+
+
+def test_bench_steps_and_reset():
+    assert bench_steps(length=20, resolution=40, bitmap_path="", steps=50)["steps_per_sec"] > 0
+
+    reset = bench_reset(resolution=40, bitmap_path="", repeats=2)
+    assert reset["cold_reset_ms"] > 0 and reset["reset_ms"] > 0
+
+
+def test_compare_flags_regressions(tmp_path):
+    base = {"results": {"step": {"steps_per_sec": 1000.0}, "reset": {"reset_ms": 1.0}}}
+    new = {"results": {"step": {"steps_per_sec": 850.0}, "reset": {"reset_ms": 0.5}}}
+
+    rows, regressions = compare(base, new, threshold=0.1)
+    assert len(rows) == 2
+    assert regressions == ["step steps_per_sec"]
+
+    base_path, new_path = tmp_path / "base.json", tmp_path / "new.json"
+    base_path.write_text(json.dumps(base))
+    new_path.write_text(json.dumps(new))
+    assert main(["--compare", str(base_path), str(new_path)]) == 1
+    assert main(["--compare", str(base_path), str(new_path), "--threshold", "0.2"]) == 0
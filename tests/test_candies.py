@@ -1,4 +1,9 @@
+from dataclasses import replace
+
 import numpy as np
+import pytest
+
+from sssnake.env.core.candies import CANDY_SAMPLERS, EnvCandies
 
 
 def test_random_candy_in_bounds(env_candies):
@@ -33,3 +38,59 @@ def test_random_candy_pos_head_dist(env_candies, full_state):
 
     pos = env_candies.random_candy_pos(full_state)
     assert pos == (just_right, 0.0), f"{pos} chosen, instead of {(just_right, 0.0)}"
+
+
+def sampled_counts(candies, head, tail, cells, draws):
+    lookup = {tuple(c): i for i, c in enumerate(cells.tolist())}
+    counts = np.zeros(len(cells))
+    for _ in range(draws):
+        counts[lookup[candies.random_candy_pos_from(head, tail)]] += 1
+    return counts
+
+
+@pytest.mark.parametrize("head_fraction", [0.1, 0.5])
+def test_rejection_sampler_matches_scan(spec_and_opts, head_fraction):
+    spec, opts = spec_and_opts
+    cells = np.stack(np.meshgrid(np.arange(12), np.arange(12)), axis=-1).reshape(-1, 2)
+    cells = (cells * 0.5).astype(np.float32)
+    spec = replace(spec, candy_head_distance=head_fraction * 6.0)
+    head = (2.0, 2.5)
+
+    expected = np.hypot(cells[:, 0] - head[0], cells[:, 1] - head[1]) >= spec.candy_head_distance
+    assert expected.any() and not expected.all()
+    draws = 200 * int(expected.sum())
+
+    for sampler in CANDY_SAMPLERS:
+        candies = EnvCandies(replace(spec, candy_sampler=sampler))
+        candies.set_map_size(opts.map_size)
+        candies.set_rng(np.random.default_rng(0))
+        candies.free_pos_candy = cells
+
+        counts = sampled_counts(candies, head, None, cells, draws)
+
+        assert not counts[~expected].any(), f"{sampler} placed a candy too close to the head"
+        mean = draws / expected.sum()
+        chi2 = ((counts[expected] - mean) ** 2 / mean).sum()
+        # Well above the 99.9th percentile of chi2 with up to 143 degrees of freedom
+        assert chi2 < 220, f"{sampler} sampler isn't uniform, chi2={chi2:.1f}"
+
+
+def test_candy_avoids_tail(spec_and_opts):
+    spec, opts = spec_and_opts
+    spec = replace(spec, candy_avoid_tail=True, candy_head_distance=0.0)
+    candies = EnvCandies(spec)
+    candies.set_map_size(opts.map_size)
+    candies.set_rng(np.random.default_rng(0))
+
+    cells = np.array([[1.0, 1.0], [1.0, 1.5], [8.0, 8.0]], dtype=np.float32)
+    candies.free_pos_candy = cells
+    tail = np.array([[1.0, 1.2]], dtype=np.float32)
+
+    for _ in range(50):
+        assert candies.random_candy_pos_from((5.0, 5.0), tail) == (8.0, 8.0)
+
+
+def test_unknown_candy_sampler(spec_and_opts):
+    spec, _ = spec_and_opts
+    with pytest.raises(ValueError):
+        EnvCandies(replace(spec, candy_sampler="nope"))
@@ -1,3 +1,8 @@
+import numpy as np
+
+from sssnake.env.core.collision import EnvCollision
+
+
 def test_hit_wall_true(collision_checker, full_state):
     thresh = collision_checker.wall_hit_distance
 
@@ -17,6 +22,7 @@ def test_hit_tail_true(collision_checker, full_state):
     thresh = collision_checker.tail_hit_distance
     full_state.head_position = (0.0, 0.0)
     full_state.segments_positions = [(thresh / 2, 0.0)]
+    full_state.segments_num = 1
     assert collision_checker.hit_tail(full_state)
 
 
@@ -24,4 +30,24 @@ def test_hit_tail_false(collision_checker, full_state):
     thresh = collision_checker.tail_hit_distance
     full_state.head_position = (0.0, 0.0)
     full_state.segments_positions = [(thresh * 2, 0.0)]
+    full_state.segments_num = 1
     assert not collision_checker.hit_tail(full_state)
+
+
+def test_tail_grid_matches_brute_force(spec_and_opts, full_state):
+    spec, _ = spec_and_opts
+    brute = EnvCollision(spec)
+    gridded = EnvCollision(spec, tail_grid=True)
+    rng = np.random.default_rng(0)
+
+    positions = rng.uniform(0, 12, size=(spec.tail_max_segment, 2)).astype(np.float32)
+    full_state.segments_positions = positions
+
+    for step in range(60):
+        positions += rng.normal(0, 0.3, size=positions.shape).astype(np.float32)
+        full_state.segments_num = int(rng.integers(0, spec.tail_max_segment)) if step % 7 else 0
+        gridded.update_tail_index(full_state)
+
+        for head in rng.uniform(0, 12, size=(20, 2)):
+            full_state.head_position = (float(head[0]), float(head[1]))
+            assert gridded.hit_tail(full_state) == brute.hit_tail(full_state)
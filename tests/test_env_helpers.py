@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from sssnake.env.utils.env_helpers import distance_transform_sq, generate_safe_map
+
+
+def kernel_safe_map(obstacles_map, margin, circular):
+    """
+    Reference: the square kernel dilation, optionally restricted to a disk.
+    """
+
+    n = obstacles_map.shape[0]
+    dilated = np.zeros_like(obstacles_map)
+    for dy in range(-margin, margin + 1):
+        for dx in range(-margin, margin + 1):
+            if circular and dx * dx + dy * dy > margin * margin:
+                continue
+            shifted = np.zeros_like(obstacles_map)
+            shifted[max(0, dy) : n + min(0, dy), max(0, dx) : n + min(0, dx)] = obstacles_map[
+                max(0, -dy) : n + min(0, -dy), max(0, -dx) : n + min(0, -dx)
+            ]
+            dilated = np.maximum(dilated, shifted)
+    return (1 - dilated).astype(np.int8)
+
+
+@pytest.fixture
+def random_obstacles():
+    rng = np.random.default_rng(5)
+    return (rng.random((48, 48)) < 0.02).astype(np.int8)
+
+
+def test_distance_transform_is_exact(random_obstacles):
+    ys, xs = np.nonzero(random_obstacles)
+    grid_y, grid_x = np.mgrid[:48, :48]
+    expected = ((grid_y[..., None] - ys) ** 2 + (grid_x[..., None] - xs) ** 2).min(axis=-1)
+
+    np.testing.assert_array_equal(distance_transform_sq(random_obstacles), expected)
+
+
+@pytest.mark.parametrize("margin_units", [1.0, 2.5, 4.0])
+def test_square_engine_matches_kernel(random_obstacles, margin_units):
+    margin = int(margin_units * 48 / 30)
+    safe = generate_safe_map(margin_units, 30, random_obstacles, engine="square")
+
+    np.testing.assert_array_equal(safe, kernel_safe_map(random_obstacles, margin, circular=False))
+
+
+@pytest.mark.parametrize("margin_units", [1.0, 2.5, 4.0])
+def test_edt_engine_is_circular_kernel(random_obstacles, margin_units):
+    margin = int(margin_units * 48 / 30)
+    square = generate_safe_map(margin_units, 30, random_obstacles, engine="square")
+    circle = generate_safe_map(margin_units, 30, random_obstacles, engine="edt")
+
+    np.testing.assert_array_equal(circle, kernel_safe_map(random_obstacles, margin, circular=True))
+    assert (circle >= square).all(), "Circular margin must stay within the square one"
+    assert circle.dtype == square.dtype
+
+
+def test_edt_engine_empty_map():
+    empty = np.zeros((16, 16), dtype=np.int8)
+    assert generate_safe_map(1.0, 30, empty, engine="edt").all()
@@ -1,3 +1,15 @@
+import math
+import tracemalloc
+from dataclasses import replace
+from pathlib import Path
+
+import gymnasium as gym
+import numpy as np
+import pytest
+from gymnasium import spaces
+
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.utils.env_helpers import load_config
 from sssnake.env.utils.snake_action import SnakeAction
 
 
@@ -23,3 +35,281 @@ def test_candy_reward(env_engine):
     _, reward, terminated, _, _ = env_engine.step(SnakeAction.NONE.value)
     assert reward == 1
     assert not terminated
+
+
+def test_array_obs_reuses_typed_buffers(spec_and_opts):
+    spec, opts = spec_and_opts
+    env = EnvEngine(spec, obs_format="array")
+    obs, _ = env.reset(seed=0, options=opts)
+    assert env.observation_space.contains(obs)
+
+    next_obs, _, _, _, _ = env.step(SnakeAction.LEFT.value)
+    assert env.observation_space.contains(next_obs)
+    for key, arr in next_obs.items():
+        assert arr is obs[key], f"Buffer of '{key}' was reallocated"
+        assert arr.dtype == env.observation_space[key].dtype
+
+    np.testing.assert_allclose(next_obs["head_position"], env.state.head_position, rtol=1e-6)
+
+
+def test_flat_obs_matches_flattened_dict(spec_and_opts):
+    spec, opts = spec_and_opts
+    dict_env = EnvEngine(spec, obs_format="array")
+    flat_env = EnvEngine(spec, obs_format="flat")
+    dict_env.reset(seed=3, options=opts)
+    flat_env.reset(seed=3, options=opts)
+
+    for _ in range(5):
+        obs, _, _, _, _ = dict_env.step(SnakeAction.RIGHT.value)
+        flat, _, _, _, _ = flat_env.step(SnakeAction.RIGHT.value)
+
+    assert flat_env.observation_space.contains(flat)
+    expected = spaces.flatten(dict_env.observation_space, obs)
+    np.testing.assert_allclose(flat, expected, rtol=1e-6)
+
+
+def test_obs_keys_shrink_observation(spec_and_opts):
+    spec, opts = spec_and_opts
+    keys = ["head_position", "candy_position", "occupancy_grid"]
+
+    env = gym.make("Sssnake-v0", env_spec_in=spec, obs_keys=keys, disable_env_checker=True)
+    obs, _ = env.reset(seed=0, options=opts)
+
+    assert list(env.observation_space.keys()) == sorted(keys)
+    assert set(obs) == set(keys)
+    assert env.observation_space.contains(obs)
+
+    with pytest.raises(ValueError):
+        EnvEngine(spec, obs_keys=["head_position", "nope"])
+
+
+def test_static_obs_only_on_reset(spec_and_opts):
+    spec, opts = spec_and_opts
+    env = EnvEngine(spec, obs_format="array", static_obs_on_reset=True)
+    obs, info = env.reset(seed=0, options=opts)
+
+    assert "safe_map_snake" not in env.observation_space.spaces
+    assert "safe_map_snake" not in obs
+    assert info["static_obs"]["safe_map_snake"] is env.state.safe_map_snake
+
+    obs, _, _, _, info = env.step(SnakeAction.NONE.value)
+    assert "safe_map_snake" not in obs and "static_obs" not in info
+    assert env.get_static_obs()["safe_map_snake"] is env.state.safe_map_snake
+
+
+def test_profiled_env_collects_metrics(spec_and_opts):
+    spec, opts = spec_and_opts
+    env = EnvEngine(spec, profile=True)
+    env.reset(seed=0, options=opts)
+
+    steps = 0
+    for _ in range(30):
+        steps += 1
+        _, _, terminated, _, _ = env.step(SnakeAction.LEFT.value)
+        if terminated:
+            break
+
+    metrics = env.get_metrics()
+    assert metrics["calls"]["step"] == steps
+    assert metrics["calls"]["reset"] == 1
+    assert metrics["calls"]["hit_anything"] == steps
+    assert metrics["calls"]["hit_tail"] == steps
+    assert metrics["seconds"]["move_head"] > 0
+    assert metrics["seconds"]["step"] >= metrics["seconds"]["update_body_segments"]
+
+    env.reset_metrics()
+    assert not env.get_metrics()["calls"]
+
+    with pytest.raises(RuntimeError):
+        EnvEngine(spec).get_metrics()
+
+
+def test_snapshot_restore_replays_identically(spec_and_opts):
+    spec, opts = spec_and_opts
+    env = EnvEngine(spec, obs_format="flat")
+    env.reset(seed=4, options=opts)
+
+    rng = np.random.default_rng(1)
+    for action in rng.integers(len(SnakeAction), size=40):
+        _, _, terminated, _, _ = env.step(int(action))
+        assert not terminated
+
+    snap = env.snapshot()
+    assert snap.state.safe_map_snake is env.state.safe_map_snake
+
+    actions = rng.integers(len(SnakeAction), size=60)
+
+    def rollout():
+        trace = []
+        for action in actions:
+            obs, reward, terminated, truncated, _ = env.step(int(action))
+            trace.append((obs.copy(), reward, terminated, env.state.candy_position))
+            if terminated or truncated:
+                break
+        # Consumes the RNG, so that a restore must bring its state back.
+        trace.append(env.env_candies.random_candy_pos(env.state))
+        return trace
+
+    first = rollout()
+    for _ in range(2):
+        env.restore(snap)
+        again = rollout()
+        assert len(again) == len(first)
+        for a, b in zip(first[:-1], again[:-1], strict=True):
+            np.testing.assert_array_equal(a[0], b[0])
+            assert a[1:] == b[1:]
+        assert first[-1] == again[-1]
+
+
+def test_simulate_matches_stepping(spec_and_opts):
+    spec, opts = spec_and_opts
+    env = EnvEngine(spec)
+    env.reset(seed=2, options=opts)
+    for _ in range(10):
+        env.step(SnakeAction.NONE.value)
+
+    rng = np.random.default_rng(5)
+    actions = rng.integers(len(SnakeAction), size=(6, 150))
+    actions[0] = SnakeAction.LEFT.value
+    actions[1, :20] = SnakeAction.NONE.value
+
+    # A candy right ahead, so that sequences draw the next candy from the RNG
+    x, y = env.state.head_position
+    env.state.candy_position = (x, y + 3.0)
+    start = env.snapshot()
+
+    result = env.simulate(actions)
+    assert env.state.head_position == start.state.head_position, "simulate() moved the env"
+
+    for k, sequence in enumerate(actions):
+        env.restore(start)
+        total, terminated_at = 0, -1
+        for t, action in enumerate(sequence):
+            _, reward, terminated, truncated, _ = env.step(int(action))
+            total += reward
+            if terminated or truncated:
+                terminated_at = t if terminated else -1
+                break
+
+        assert result.rewards[k] == total
+        assert result.terminated_at[k] == terminated_at
+        np.testing.assert_allclose(result.final_head_positions[k], env.state.head_position)
+
+    assert (result.terminated_at >= 0).any(), "Some random sequence should crash"
+    assert result.step_rewards[1].max() == 1, "The second sequence should eat the candy"
+
+
+def test_preallocated_env_matches_plain(spec_and_opts):
+    spec, opts = spec_and_opts
+    plain = EnvEngine(spec, obs_format="array")
+    prealloc = EnvEngine(spec, obs_format="array", preallocate=True)
+
+    rng = np.random.default_rng(7)
+    for seed in range(3):
+        for env in (plain, prealloc):
+            env.reset(seed=seed, options=opts)
+
+        for t in range(300):
+            if t % 10 == 0:
+                # Feed the snake, so that its tail keeps growing.
+                for env in (plain, prealloc):
+                    env.state.candy_position = env.state.head_position
+
+            action = int(rng.integers(len(SnakeAction)))
+            expected = plain.step(action)
+            result = prealloc.step(action)
+
+            for key, value in expected[0].items():
+                np.testing.assert_array_equal(result[0][key], value, err_msg=f"{key} at {t}")
+            assert result[1:4] == expected[1:4]
+            if expected[2] or expected[3]:
+                break
+
+    with pytest.raises(ValueError):
+        EnvEngine(spec, preallocate=True)
+
+
+def circle_period(spec, opts, length):
+    """
+    Steps between left turns, so that the snake drives a circle long enough for its whole tail.
+    """
+
+    radius = (length * spec.tail_segment_length + 10.0) / (2 * math.pi)
+    return math.ceil(radius * math.radians(opts.snake_turnspeed) / opts.snake_speed)
+
+
+def circling_env(spec_and_opts, length, **env_kwargs):
+    """
+    An env on the largest map whose snake circles with a tail of the given length, and whose
+    candy sits in a corner away from the circle.
+    """
+
+    spec, opts = spec_and_opts
+    spec = replace(spec, tail_max_segment=length, max_num_steps=math.inf)
+    period = circle_period(spec, opts, length)
+    radius = opts.snake_speed * period / math.radians(opts.snake_turnspeed)
+    opts = replace(
+        opts,
+        map_size=spec.max_map_size,
+        start_pos_coords=(0.5 - radius / spec.max_map_size, 0.5),
+        start_dir=0.0,
+        map_bitmap_path="",
+    )
+
+    env = EnvEngine(spec, **env_kwargs)
+    env.reset(seed=0, options=opts)
+
+    # Whole turn periods, so that the snake keeps following the same circle.
+    warmup = math.ceil(length * spec.tail_segment_length / opts.snake_speed / period + 1) * period
+    for t in range(warmup):
+        env.step(circle_action(t, period))
+
+    env.state.segments_num = length
+    env.update_body_segments()
+    env.env_collision.update_tail_index(env.state)
+    env.state.candy_position = (1.0, 1.0)
+    return env, period
+
+
+def circle_action(step, period):
+    return SnakeAction.LEFT.value if step % period == 0 else SnakeAction.NONE.value
+
+
+def test_preallocated_step_allocates_no_tail_sized_arrays():
+    """
+    A step still allocates a couple of KB of small objects (array views, floats), but neither keeps
+    them nor allocates anything the size of the tail.
+    """
+
+    config_path = Path(__file__).parent / "input_data" / "default_params.json"
+
+    def step_memory(length):
+        env, period = circling_env(
+            load_config(config_path), length, obs_format="flat", preallocate=True
+        )
+        for t in range(2 * period):
+            env.step(circle_action(t, period))
+
+        max_peak = 0
+        tracemalloc.start()
+        try:
+            start, _ = tracemalloc.get_traced_memory()
+            for t in range(2 * period, 20 * period):
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                _, _, terminated, _, _ = env.step(circle_action(t, period))
+                _, peak = tracemalloc.get_traced_memory()
+                max_peak = max(max_peak, peak - before)
+                assert not terminated
+            growth = tracemalloc.get_traced_memory()[0] - start
+        finally:
+            tracemalloc.stop()
+        return growth, max_peak
+
+    short_growth, short_peak = step_memory(20)
+    growth, peak = step_memory(200)
+
+    # The segment positions of the long tail alone take 200 * 2 * 8 B.
+    assert growth < 1024 and short_growth < 1024
+    assert peak < 3072, f"Step peak of {peak} B"
+    assert peak - short_peak < 256, f"Step peak of {peak} B with a long tail, {short_peak} B short"
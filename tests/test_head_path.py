@@ -0,0 +1,126 @@
+import math
+
+import numpy as np
+import pytest
+
+from sssnake.env.core.head_path import HeadPath
+
+
+def walk_back(path, distance_behind_head):
+    """
+    Reference: walks an unbounded list of points back from the head.
+    """
+
+    if len(path) < 2:
+        return path[0]
+
+    accumulated = 0.0
+    for idx in range(len(path) - 1, 0, -1):
+        x1, y1 = path[idx]
+        x0, y0 = path[idx - 1]
+        seg_len = math.sqrt((x1 - x0) ** 2 + (y1 - y0) ** 2)
+        if accumulated + seg_len >= distance_behind_head:
+            ratio = (distance_behind_head - accumulated) / seg_len
+            return x1 + (x0 - x1) * ratio, y1 + (y0 - y1) * ratio
+        accumulated += seg_len
+
+    return path[0]
+
+
+@pytest.fixture
+def random_walk():
+    rng = np.random.default_rng(3)
+    angles = np.cumsum(rng.uniform(-0.3, 0.3, size=1500))
+    steps = rng.uniform(0.1, 0.4, size=1500)
+    points = np.cumsum(np.stack((np.sin(angles) * steps, np.cos(angles) * steps), axis=1), axis=0)
+    return [(0.0, 0.0)] + [(float(x), float(y)) for x, y in points]
+
+
+def test_position_at_matches_walk(random_walk):
+    path = HeadPath(max_distance=20.0, capacity=4)
+    path.reset(random_walk[0])
+
+    for n, point in enumerate(random_walk[1:], start=2):
+        path.append(point)
+        if n % 50:
+            continue
+        for distance in (0.5, 3.3, 12.0, 20.0):
+            np.testing.assert_allclose(
+                path.position_at(distance), walk_back(random_walk[:n], distance), atol=1e-9
+            )
+
+
+def test_path_is_bounded(random_walk):
+    path = HeadPath(max_distance=5.0, capacity=4)
+    path.reset(random_walk[0])
+    for point in random_walk[1:]:
+        path.append(point)
+
+    assert len(path) < 60, f"{len(path)} points kept for a 5.0 long path"
+    assert path.arc_lengths[-1] - path.arc_lengths[1] < 5.0
+    assert path[-1] == random_walk[-1]
+
+
+def test_short_path_returns_start():
+    path = HeadPath(max_distance=10.0)
+    path.reset((1.0, 2.0))
+    assert path.position_at(3.0) == (1.0, 2.0)
+
+    path.append((1.0, 3.0))
+    assert path.position_at(3.0) == (1.0, 2.0)
+    assert path.position_at(0.25) == (1.0, 2.75)
+
+
+def test_sample_without_distances():
+    path = HeadPath(max_distance=10.0)
+    path.reset((1.0, 2.0))
+    path.append((1.0, 3.0))
+
+    out = np.zeros((0, 2))
+    assert path.sample(np.zeros(0), out) is out
+
+
+def test_sample_matches_position_at(random_walk):
+    path = HeadPath(max_distance=30.0)
+    path.reset(random_walk[0])
+    distances = np.arange(1, 23) * 1.35
+    out = np.zeros((40, 2), dtype=np.float32)
+
+    for n, point in enumerate(random_walk[1:200]):
+        path.append(point)
+        path.sample(distances, out[: len(distances)])
+
+        expected = [path.position_at(d) for d in distances]
+        np.testing.assert_allclose(out[: len(distances)], expected, rtol=1e-6)
+        assert not out[len(distances) :].any(), f"Step {n} wrote past the sampled segments"
+
+
+def test_reserved_sample_matches_search(random_walk):
+    plain = HeadPath(max_distance=30.0)
+    reserved = HeadPath(max_distance=30.0)
+    reserved.reserve(capacity=400, max_samples=22)
+    buffers = reserved._xy
+
+    distances = np.arange(1, 23) * 1.35
+    expected = np.zeros((22, 2), dtype=np.float32)
+    out = np.zeros((22, 2), dtype=np.float32)
+
+    for path in (plain, reserved):
+        path.reset(random_walk[0])
+
+    for n, point in enumerate(random_walk[1:], start=1):
+        if n == 700:
+            for path in (plain, reserved):
+                path.reset(point)
+            continue
+
+        plain.append(point)
+        reserved.append(point)
+
+        # The tail grows now and then, like when a candy is eaten.
+        m = min(22, 1 + n // 40 % 30)
+        plain.sample(distances[:m], expected[:m])
+        reserved.sample(distances[:m], out[:m])
+        np.testing.assert_array_equal(out[:m], expected[:m], err_msg=f"Step {n}")
+
+    assert reserved._xy is buffers, "The reserved path reallocated its points"
@@ -0,0 +1,147 @@
+import math
+
+import numpy as np
+import pytest
+
+from sssnake.env.core import kernels
+from sssnake.env.core.head_path import HeadPath
+from sssnake.env.utils.snake_action import SnakeAction
+
+BACKENDS = ["numpy", "loop"]
+if kernels.numba is not None:
+    BACKENDS.append("numba")
+
+
+def get_kernels(backend):
+    if backend == "loop":
+        # The uncompiled loops, which Numba compiles when installed.
+        return dict(kernels._LOOP_KERNELS)
+    return kernels.batched_kernels(backend)
+
+
+def random_state(n=12, m=30, capacity=80, seed=0):
+    """
+    Batched state whose paths are random walks of different lengths.
+    """
+
+    rng = np.random.default_rng(seed)
+    end = capacity - 10
+    start = rng.integers(0, end - 1, size=n)
+
+    steps = rng.uniform(0.2, 1.0, size=(n, capacity))
+    angles = np.cumsum(rng.uniform(-0.5, 0.5, size=(n, capacity)), axis=1)
+    path_xy = 50.0 + np.cumsum(
+        np.stack((np.sin(angles) * steps, np.cos(angles) * steps), axis=-1), axis=1
+    )
+    d = np.diff(path_xy, axis=1)
+    path_s = np.concatenate(
+        (np.zeros((n, 1)), np.cumsum(np.hypot(d[..., 0], d[..., 1]), axis=1)), axis=1
+    )
+
+    safe_map = (rng.random((40, 40)) > 0.3).astype(np.int8)
+    return {
+        "head": path_xy[:, end - 1].copy(),
+        "direction": rng.uniform(0, 360, size=n),
+        "speed": rng.uniform(0.3, 0.9, size=n),
+        "turnspeed": np.full(n, 10.0),
+        "map_size": np.full(n, 100.0),
+        "candy": path_xy[:, end - 1] + rng.normal(0, 1.0, size=(n, 2)),
+        "counts": rng.integers(0, m + 1, size=n),
+        "segments": np.zeros((n, m, 2), dtype=np.float32),
+        "path_xy": path_xy,
+        "path_s": path_s,
+        "start": start,
+        "end": end,
+        "safe_map": safe_map,
+        "idx": np.sort(rng.choice(n, size=n - 3, replace=False)),
+    }
+
+
+def run_step(k, st, actions):
+    idx = st["idx"]
+    k["turn_heads"](st["direction"], st["turnspeed"], actions, idx)
+    k["move_heads"](
+        st["head"], st["direction"], st["speed"], st["path_xy"], st["path_s"], st["end"], idx
+    )
+    hit = k["hit_anything"](
+        st["head"], st["map_size"], st["segments"], st["counts"], st["safe_map"], 1.0, 1.2, idx
+    )
+    met = k["met_candies"](st["head"], st["candy"], 1.5, idx)
+    k["trim_paths"](st["path_s"], st["start"], st["end"], 12.0, idx)
+    k["sample_paths"](
+        st["path_xy"],
+        st["path_s"],
+        st["start"],
+        st["end"],
+        st["counts"],
+        0.7,
+        st["segments"],
+        idx,
+    )
+    return hit, met
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_batched_kernels_agree(backend):
+    expected_state, state = random_state(), random_state()
+    actions = np.random.default_rng(1).integers(len(SnakeAction), size=len(state["idx"]))
+
+    for _ in range(3):
+        expected = run_step(get_kernels("numpy"), expected_state, actions)
+        result = run_step(get_kernels(backend), state, actions)
+
+        np.testing.assert_array_equal(result[0], expected[0])
+        np.testing.assert_array_equal(result[1], expected[1])
+        for key, value in expected_state.items():
+            np.testing.assert_allclose(state[key], value, rtol=1e-12, atol=1e-6, err_msg=key)
+
+        expected_state["end"] += 1
+        state["end"] += 1
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_sample_paths_matches_head_path(backend):
+    state = random_state(n=4, m=40, seed=3)
+    idx = np.arange(4)
+    state["counts"][:] = 40
+    get_kernels(backend)["sample_paths"](
+        state["path_xy"],
+        state["path_s"],
+        state["start"],
+        state["end"],
+        state["counts"],
+        0.7,
+        state["segments"],
+        idx,
+    )
+
+    for i in idx:
+        path = HeadPath(max_distance=math.inf)
+        path.load(
+            state["path_xy"][i, state["start"][i] : state["end"] + 1],
+            state["path_s"][i, state["start"][i] : state["end"] + 1],
+        )
+        expected = [path.position_at(d) for d in np.arange(1, 41) * 0.7]
+        np.testing.assert_allclose(state["segments"][i], expected, rtol=1e-6)
+
+
+def test_scalar_kernels():
+    assert kernels.turn(355.0, SnakeAction.LEFT, 10.0) == pytest.approx(5.0)
+    assert kernels.turn(5.0, SnakeAction.RIGHT, 10.0) == pytest.approx(355.0)
+    assert kernels.turn(5.0, SnakeAction.NONE, 10.0) == 5.0
+
+    x, y = kernels.advance(1.0, 1.0, 90.0, 2.0)
+    assert (x, y) == pytest.approx((3.0, 1.0))
+
+    assert kernels.hit_wall(0.5, 50.0, 100.0, 1.0)
+    assert not kernels.hit_wall(50.0, 50.0, 100.0, 1.0)
+
+    safe_map = np.ones((10, 10), dtype=np.int8)
+    safe_map[2, 7] = 0
+    assert kernels.hit_obstacle(75.0, 25.0, 100.0, safe_map)
+    assert not kernels.hit_obstacle(25.0, 75.0, 100.0, safe_map)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        kernels.batched_kernels("cuda")
@@ -0,0 +1,163 @@
+import math
+
+import numpy as np
+import pytest
+
+from sssnake.env.core import kernels
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.core.vector_env import SssnakeVectorEnv
+from sssnake.env.utils.lidar import LidarSensor, ray_offsets
+
+
+def cast_one(sensor, head, direction, safe_map, segments=(), map_size=30.0):
+    segs = np.zeros((1, max(1, len(segments)), 2), dtype=np.float32)
+    if len(segments):
+        segs[0, : len(segments)] = segments
+    return sensor.cast(
+        np.array([head]),
+        np.array([direction]),
+        np.array([map_size]),
+        safe_map,
+        segs,
+        np.array([len(segments)]),
+    )[0]
+
+
+def marched_obstacle(head, angle, safe_map, map_size, max_range, step=1e-3):
+    """
+    Reference: walks the ray in tiny steps until it enters an unsafe cell.
+    """
+
+    res = safe_map.shape[0]
+    dx, dy = math.sin(math.radians(angle)), math.cos(math.radians(angle))
+    for t in np.arange(0.0, max_range, step):
+        col = math.floor((head[0] + dx * t) / map_size * res)
+        row = math.floor((head[1] + dy * t) / map_size * res)
+        if not (0 <= col < res and 0 <= row < res):
+            break
+        if safe_map[row, col] == 0:
+            return t
+    return max_range
+
+
+def test_offsets_fan_around_heading():
+    np.testing.assert_allclose(ray_offsets(4, 360.0), [-180.0, -90.0, 0.0, 90.0])
+    np.testing.assert_allclose(ray_offsets(3, 90.0), [-45.0, 0.0, 45.0])
+    np.testing.assert_allclose(ray_offsets(1, 90.0), [-45.0])
+
+
+def test_wall_distances():
+    sensor = LidarSensor(rays=4, fov=360.0, max_range=100.0)
+    readings = cast_one(sensor, (10.0, 20.0), 0.0, np.ones((8, 8), dtype=np.int8))
+
+    # Behind, right, ahead and left of a head moving along +y.
+    np.testing.assert_allclose(readings[:, 0], [20.0, 10.0, 10.0, 20.0], atol=1e-5)
+    np.testing.assert_allclose(readings[:, 1], 100.0)
+    np.testing.assert_allclose(readings[:, 2], 100.0)
+
+
+@pytest.mark.parametrize(
+    "head, direction", [((14.3, 16.1), 37.0), ((14.3, 16.1), 0.0), ((2.2, 27.9), 90.0)]
+)
+def test_obstacle_distances_match_marching(head, direction):
+    rng = np.random.default_rng(0)
+    safe_map = (rng.random((40, 40)) > 0.04).astype(np.int8)
+    sensor = LidarSensor(rays=32, fov=360.0, max_range=12.0)
+
+    safe_map[int(head[1] / 30 * 40), int(head[0] / 30 * 40)] = 1
+    readings = cast_one(sensor, head, direction, safe_map)
+
+    for offset, reading in zip(sensor.offsets, readings[:, 1], strict=True):
+        expected = marched_obstacle(head, direction + offset, safe_map, 30.0, 12.0)
+        assert reading == pytest.approx(expected, abs=2e-3), f"Ray at {offset}"
+
+
+def test_head_in_unsafe_cell():
+    safe_map = np.ones((8, 8), dtype=np.int8)
+    safe_map[2, 5] = 0
+    sensor = LidarSensor(rays=8, fov=360.0, max_range=30.0)
+
+    readings = cast_one(sensor, (20.0, 8.0), 45.0, safe_map)
+    np.testing.assert_array_equal(readings[:, 1], 0.0)
+
+
+def test_cast_one_matches_cast():
+    rng = np.random.default_rng(1)
+    safe_map = (rng.random((40, 40)) > 0.05).astype(np.int8)
+    segments = rng.random((6, 2)).astype(np.float32) * 30
+    sensor = LidarSensor(rays=16, fov=270.0, max_range=20.0)
+
+    single = sensor.cast_one((12.0, 9.5), 123.0, 30.0, safe_map, segments, 4)
+    np.testing.assert_array_equal(
+        single, cast_one(sensor, (12.0, 9.5), 123.0, safe_map, segments[:4], 30.0)
+    )
+
+
+@pytest.mark.parametrize("backend", ["loop", "numba"])
+def test_ray_kernel_matches_numpy(backend, monkeypatch):
+    if backend == "numba" and kernels.numba is None:
+        pytest.skip("Numba isn't installed")
+    kernel = (
+        kernels.cast_rays_loop
+        if backend == "loop"
+        else kernels.batched_kernels("numba")["cast_rays"]
+    )
+
+    rng = np.random.default_rng(4)
+    safe_map = (rng.random((40, 40)) > 0.05).astype(np.int8)
+    head = rng.uniform(2.0, 28.0, size=(5, 2))
+    direction = rng.uniform(0.0, 360.0, size=5)
+    map_size = np.full(5, 30.0)
+    segments = rng.uniform(0.0, 30.0, size=(5, 12, 2)).astype(np.float32)
+    counts = rng.integers(0, 13, size=5)
+    sensor = LidarSensor(rays=24, fov=360.0, max_range=15.0, tail_radius=1.3)
+
+    monkeypatch.setattr(kernels, "cast_rays", None)
+    expected = sensor.cast(head, direction, map_size, safe_map, segments, counts)
+    monkeypatch.setattr(kernels, "cast_rays", kernel)
+    result = sensor.cast(head, direction, map_size, safe_map, segments, counts)
+
+    np.testing.assert_allclose(result, expected, atol=1e-4)
+
+
+def test_tail_distances():
+    sensor = LidarSensor(rays=4, fov=360.0, max_range=30.0, tail_radius=1.0)
+    segments = [(15.0, 20.0), (15.0, 12.0), (15.5, 11.0)]
+    readings = cast_one(sensor, (15.0, 15.0), 0.0, np.ones((8, 8), dtype=np.int8), segments)
+
+    np.testing.assert_allclose(readings[:, 2], [2.0, 30.0, 4.0, 30.0], atol=1e-5)
+
+
+def test_batched_matches_single(spec_and_opts):
+    spec, opts = spec_and_opts
+    env = SssnakeVectorEnv(num_envs=3, env_spec_in=spec, obs_keys=["lidar"])
+    obs, _ = env.reset(seed=0, options=opts)
+    assert obs["lidar"].shape == (3, spec.lidar_rays, 3)
+
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        obs, *_ = env.step(rng.integers(3, size=3))
+
+    for i in range(3):
+        single = cast_one(
+            env.lidar,
+            env.head_position[i],
+            env.head_direction[i],
+            env.safe_map_snake,
+            env.segments_positions[i, : env.segments_num[i]],
+            float(env.map_size[i]),
+        )
+        np.testing.assert_allclose(obs["lidar"][i], single)
+
+
+def test_engine_lidar_obs(spec_and_opts):
+    spec, opts = spec_and_opts
+    env = EnvEngine(spec, obs_format="array", obs_keys=["lidar", "head_position"])
+    obs, _ = env.reset(seed=0, options=opts)
+    for _ in range(5):
+        obs, *_ = env.step(0)
+
+    assert env.observation_space.contains(obs)
+    np.testing.assert_array_equal(
+        obs["lidar"], env.state.to_obs(["lidar"], sensors=env.obs_sensors)["lidar"]
+    )
@@ -0,0 +1,185 @@
+import os
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from sssnake.env.core import map_cache
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.core.map_cache import MapCache, MapPool, load_collision_maps
+
+
+@pytest.fixture
+def load_counter(monkeypatch):
+    calls = []
+    original = map_cache.load_obstacles_map
+
+    def counting_load(path, col_res):
+        calls.append(path)
+        return original(path, col_res)
+
+    monkeypatch.setattr(map_cache, "load_obstacles_map", counting_load)
+    map_cache.MAP_CACHE.clear()
+    yield calls
+    map_cache.MAP_CACHE.clear()
+
+
+def test_resets_reuse_cached_maps(spec_and_opts, load_counter):
+    spec, opts = spec_and_opts
+    env = EnvEngine(spec)
+
+    env.reset(seed=0, options=opts)
+    first_map = env.state.safe_map_snake
+    env.reset(seed=1)
+    env.reset(seed=2)
+
+    assert len(load_counter) == 1
+    assert env.state.safe_map_snake is first_map
+    assert not first_map.flags.writeable
+
+
+def test_bitmap_change_invalidates(spec_and_opts, load_counter, tmp_path):
+    spec, opts = spec_and_opts
+    bmp = tmp_path / "map.png"
+    Image.new("L", (8, 8), color=0).save(bmp)
+    opts.map_bitmap_path = str(bmp)
+
+    load_collision_maps(spec, opts)
+    load_collision_maps(spec, opts)
+    assert len(load_counter) == 1
+
+    Image.new("L", (8, 8), color=255).save(bmp)
+    stat = os.stat(bmp)
+    os.utime(bmp, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    maps = load_collision_maps(spec, opts)
+    assert len(load_counter) == 2
+    assert not maps.safe_map_snake.any()
+
+
+def test_lru_eviction(spec_and_opts):
+    spec, opts = spec_and_opts
+    cache = MapCache(maxsize=2)
+
+    for size in (20, 30, 40):
+        opts.map_size = size
+        load_collision_maps(spec, opts, cache=cache)
+    assert len(cache) == 2
+
+    opts.map_size = 20
+    assert cache.get(map_cache.collision_maps_key(spec, opts)) is None
+
+
+@pytest.fixture
+def bitmap_dir(tmp_path):
+    directory = tmp_path / "maps"
+    directory.mkdir()
+    for i in range(3):
+        img = Image.new("L", (40, 40), color=0)
+        img.paste(255, (4 + 10 * i, 4, 10 + 10 * i, 30))
+        img.save(directory / f"map_{i}.png")
+    (directory / "notes.txt").write_text("Not a bitmap")
+    return directory
+
+
+def test_pool_resets_pick_preloaded_maps(spec_and_opts, bitmap_dir, load_counter):
+    spec, opts = spec_and_opts
+    env = EnvEngine(replace(spec, map_pool=str(bitmap_dir)))
+    env.reset(seed=0, options=opts)
+    assert env.map_pool is not None and len(env.map_pool) == 3
+
+    loads = len(load_counter)
+    picked = {}
+    for seed in range(20):
+        env.reset(seed=seed)
+        i = env.map_pool.paths.index(env.last_reset_options.map_bitmap_path)
+        assert env.state.safe_map_snake is env.map_pool[i].safe_map_snake
+        picked[seed] = i
+
+    assert len(load_counter) == loads, "Resets must not decode bitmaps"
+    assert len(set(picked.values())) == 3
+
+    env.reset(seed=7)
+    assert env.last_reset_options.map_bitmap_path == env.map_pool.paths[picked[7]]
+
+
+def test_pooled_env_simulates(spec_and_opts, bitmap_dir):
+    spec, opts = spec_and_opts
+    env = EnvEngine(replace(spec, map_pool=str(bitmap_dir)))
+    env.reset(seed=3, options=opts)
+    start = env.snapshot()
+
+    actions = np.random.default_rng(0).integers(3, size=(4, 60))
+    result = env.simulate(actions)
+
+    for k, sequence in enumerate(actions):
+        env.restore(start)
+        total = 0.0
+        for action in sequence:
+            _, reward, terminated, truncated, _ = env.step(int(action))
+            total += reward
+            if terminated or truncated:
+                break
+        assert result.rewards[k] == total
+        np.testing.assert_allclose(result.final_head_positions[k], env.state.head_position)
+
+
+def test_saved_pool_is_memory_mapped(spec_and_opts, bitmap_dir, tmp_path):
+    spec, opts = spec_and_opts
+    pool = MapPool.from_directory(spec, str(bitmap_dir), opts.map_size)
+    pool.save(tmp_path / "pool")
+
+    opened = MapPool.open(tmp_path / "pool")
+    assert isinstance(opened.safe_maps, np.memmap)
+    assert opened.paths == pool.paths
+    for i in range(len(pool)):
+        expected = load_collision_maps(spec, replace(opts, map_bitmap_path=pool.paths[i]))
+        np.testing.assert_array_equal(opened[i].safe_map_snake, expected.safe_map_snake)
+        np.testing.assert_array_equal(opened[i].free_pos_candy, expected.free_pos_candy)
+
+    env = EnvEngine(spec, map_pool=opened)
+    env.reset(seed=0, options=opts)
+    assert np.shares_memory(env.state.safe_map_snake, opened.safe_maps)
+
+    with pytest.raises(ValueError):
+        env.reset(options=replace(opts, map_size=opts.map_size + 1))
+
+
+def test_disk_cache_is_memory_mapped(spec_and_opts, load_counter, tmp_path):
+    spec, opts = spec_and_opts
+    cached_spec = replace(spec, map_cache_dir=str(tmp_path / "cache"))
+
+    expected = load_collision_maps(spec, opts, cache=None)
+    first = load_collision_maps(cached_spec, opts, cache=None)
+    assert len(load_counter) == 2
+    assert len(list((tmp_path / "cache").glob("*.npy"))) == 3
+
+    # Another process would find the files: nothing is decoded, the pages are shared.
+    maps = load_collision_maps(cached_spec, opts, cache=None)
+    assert len(load_counter) == 2
+    for name in ("obstacles_map", "safe_map_snake", "free_pos_candy"):
+        assert isinstance(getattr(maps, name), np.memmap)
+        np.testing.assert_array_equal(getattr(maps, name), getattr(expected, name))
+        np.testing.assert_array_equal(getattr(first, name), getattr(expected, name))
+
+    env = EnvEngine(cached_spec)
+    env.reset(seed=0, options=opts)
+    assert len(load_counter) == 2
+
+
+def test_disk_cache_key(spec_and_opts, tmp_path):
+    spec, _ = spec_and_opts
+    bmp = tmp_path / "map.png"
+    Image.new("L", (8, 8), color=0).save(bmp)
+
+    key = map_cache.disk_cache_key(spec, str(bmp), 30.0)
+    copy = tmp_path / "copy.png"
+    copy.write_bytes(bmp.read_bytes())
+    assert map_cache.disk_cache_key(spec, str(copy), 30.0) == key
+
+    assert map_cache.disk_cache_key(spec, str(bmp), 31.0) != key
+    assert map_cache.disk_cache_key(replace(spec, hit_obstacle_distance=2), str(bmp), 30.0) != key
+
+    Image.new("L", (8, 8), color=255).save(bmp)
+    assert map_cache.disk_cache_key(spec, str(bmp), 30.0) != key
@@ -0,0 +1,140 @@
+from collections import deque
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from sssnake.env.core.async_vector_env import SssnakeAsyncVectorEnv
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.core.vector_env import SssnakeVectorEnv
+from sssnake.env.utils.map_generators import (
+    MAP_GENERATORS,
+    generate_obstacles_map,
+    reachable_cells,
+)
+
+
+def flood_fill(free, start):
+    """
+    Reference: breadth-first search over the 4-connected free cells.
+    """
+
+    reached = np.zeros_like(free, dtype=bool)
+    if not free[start]:
+        return reached
+    reached[start] = True
+    queue = deque([start])
+    while queue:
+        r, c = queue.popleft()
+        for nr, nc in ((r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)):
+            inside = 0 <= nr < free.shape[0] and 0 <= nc < free.shape[1]
+            if inside and free[nr, nc] and not reached[nr, nc]:
+                reached[nr, nc] = True
+                queue.append((nr, nc))
+    return reached
+
+
+@pytest.mark.parametrize("name", list(MAP_GENERATORS))
+def test_generators_are_seeded(name):
+    first = generate_obstacles_map(name, np.random.default_rng(0), 40)
+    again = generate_obstacles_map(name, np.random.default_rng(0), 40)
+    other = generate_obstacles_map(name, np.random.default_rng(1), 40)
+
+    assert first.shape == (40, 40) and first.dtype == np.int8
+    assert set(np.unique(first)) <= {0, 1}
+    assert 0 < first.sum() < first.size
+    np.testing.assert_array_equal(first, again)
+    assert (first != other).any()
+
+
+@pytest.mark.parametrize("name", ["maze", "corridors"])
+def test_carved_maps_are_connected(name):
+    for seed in range(5):
+        free = generate_obstacles_map(name, np.random.default_rng(seed), 40) == 0
+        start = tuple(np.argwhere(free)[0])
+        np.testing.assert_array_equal(reachable_cells(free, start), free)
+
+
+def test_reachable_cells_match_flood_fill():
+    for seed in range(10):
+        free = generate_obstacles_map("caves", np.random.default_rng(seed), 40) == 0
+        for start in np.argwhere(free)[:: max(1, int(free.sum()) // 5)]:
+            start = tuple(start)
+            np.testing.assert_array_equal(reachable_cells(free, start), flood_fill(free, start))
+
+    assert not reachable_cells(np.zeros((4, 4), dtype=bool), (1, 1)).any()
+
+
+def test_unknown_generator():
+    with pytest.raises(ValueError):
+        generate_obstacles_map("islands", np.random.default_rng(0), 40)
+
+
+@pytest.mark.parametrize("name", list(MAP_GENERATORS))
+def test_engine_generates_reachable_maps(spec_and_opts, name):
+    spec, opts = spec_and_opts
+    opts = replace(opts, map_generator=name, map_bitmap_path="")
+    env = EnvEngine(spec, render_mode="rgb_array")
+
+    maps = []
+    for seed in (0, 1, 0):
+        env.reset(seed=seed, options=opts)
+        maps.append(env.state.safe_map_snake)
+
+        res = spec.collision_map_resolution
+        start = tuple(int(c * res) for c in reversed(opts.start_pos_coords))
+        reachable = reachable_cells(env.state.safe_map_snake == 1, start)
+
+        cells = np.rint(env.env_candies.free_pos_candy / opts.map_size * res).astype(int)
+        assert reachable[cells[:, 1], cells[:, 0]].all()
+
+        for _ in range(3):
+            env.step(0)
+        frame = env.render()
+        assert frame is not None and frame.shape == (320, 320, 4)
+
+    np.testing.assert_array_equal(maps[0], maps[2])
+    assert (maps[0] != maps[1]).any()
+
+
+def test_vector_env_rejects_generators(spec_and_opts):
+    spec, opts = spec_and_opts
+    env = SssnakeVectorEnv(num_envs=2, env_spec_in=spec)
+    with pytest.raises(ValueError, match="Map generators"):
+        env.reset(seed=0, options=replace(opts, map_generator="caves"))
+
+
+def test_async_env_matches_engines_with_generator(spec_and_opts):
+    spec, opts = spec_and_opts
+    opts = replace(opts, map_generator="caves", map_bitmap_path="")
+    keys = ["head_position", "candy_position", "segments_num"]
+
+    engines = [EnvEngine(spec, obs_keys=keys) for _ in range(3)]
+    envs = SssnakeAsyncVectorEnv(num_envs=3, env_spec_in=spec, obs_keys=keys, num_workers=2)
+    try:
+        obs, _ = envs.reset(seed=5, options=opts)
+        for i, engine in enumerate(engines):
+            expected, _ = engine.reset(seed=5 + i, options=opts)
+            np.testing.assert_allclose(obs["head_position"][i], expected["head_position"])
+
+        rng = np.random.default_rng(0)
+        done = np.zeros(3, dtype=bool)
+        resets = 0
+        for _ in range(300):
+            actions = rng.integers(3, size=3)
+            obs, rewards, terminated, truncated, _ = envs.step(actions)
+            for i, engine in enumerate(engines):
+                if done[i]:
+                    expected, reward = engine.reset()[0], 0.0
+                    resets += 1
+                else:
+                    expected, reward, term, trunc, _ = engine.step(int(actions[i]))
+                    assert (terminated[i], truncated[i]) == (term, trunc)
+                for key in keys:
+                    np.testing.assert_allclose(obs[key][i], expected[key], atol=1e-5)
+                assert rewards[i] == reward
+            done = terminated | truncated
+
+        assert resets, "Random actions should end some episodes, regenerating their maps"
+    finally:
+        envs.close()
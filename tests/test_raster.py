@@ -0,0 +1,138 @@
+from dataclasses import replace
+
+import numpy as np
+from gymnasium import spaces
+
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.core.vector_env import SssnakeVectorEnv
+from sssnake.env.utils.raster import (
+    LOCAL_VIEW_CHANNELS,
+    OCCUPANCY_CHANNELS,
+    LocalViewCropper,
+    point_cells,
+    pool_obstacles,
+)
+from sssnake.env.utils.schema import build_observation_space
+from sssnake.env.utils.state_def import ObsSensors
+
+
+def test_pool_obstacles_keeps_thin_walls():
+    safe_map = np.ones((100, 100), dtype=np.int8)
+    safe_map[:, 37] = 0
+
+    pooled = pool_obstacles(safe_map, 10)
+    assert pooled.shape == (10, 10)
+    assert pooled[:, 3].all(), "A one cell wide wall must survive the downsampling"
+    assert pooled.sum() == 10
+
+
+def test_occupancy_grid_obs(spec_and_opts, full_state):
+    spec, _ = spec_and_opts
+    spec = replace(spec, occupancy_grid_resolution=16)
+    space = build_observation_space(spec, ["occupancy_grid"])
+
+    full_state.map_size = 16.0
+    full_state.head_position = (3.5, 8.2)
+    full_state.candy_position = (12.0, 1.0)
+    full_state.segments_positions[:2] = [(3.5, 7.0), (3.5, 6.0)]
+    full_state.segments_num = 2
+    full_state.segments_positions[2] = (15.0, 15.0)  # Inactive, must not be drawn
+
+    obs = full_state.to_obs(["occupancy_grid"], sensors=ObsSensors(spec))
+    grid = obs["occupancy_grid"]
+
+    assert space.contains(obs)
+    assert grid.shape == (16, 16, len(OCCUPANCY_CHANNELS))
+    assert grid[8, 3, 2] == 1 and grid[..., 2].sum() == 1
+    assert grid[1, 12, 3] == 1 and grid[..., 3].sum() == 1
+    assert grid[7, 3, 1] == 1 and grid[6, 3, 1] == 1 and grid[..., 1].sum() == 2
+
+
+def test_local_view_heading_up_is_a_flipped_slice():
+    rng = np.random.default_rng(0)
+    safe_map = (rng.random((40, 40)) > 0.2).astype(np.int8)
+    cropper = LocalViewCropper(size=16, headings=72)
+
+    view = cropper.crop(safe_map, (15.2, 10.9), 0.0, np.zeros((0, 2)), 30.0)
+    row, col = int(10.9 / 30 * 40), int(15.2 / 30 * 40)
+
+    # Ahead is up and the head's left (+x when moving along +y) is on the left.
+    expected = safe_map[row - 7 : row + 9, col - 7 : col + 9][::-1, ::-1] == 0
+    assert view.shape == (16, 16, len(LOCAL_VIEW_CHANNELS))
+    np.testing.assert_array_equal(view[..., 0], expected)
+    assert not view[..., 1].any()
+
+
+def test_local_view_follows_heading():
+    safe_map = np.ones((40, 40), dtype=np.int8)
+    cropper = LocalViewCropper(size=8, headings=4)
+    head = (20.0, 20.0)
+    segments = np.array([(18.0, 20.0)])
+
+    for direction in (0.0, 90.0, 180.0, 270.0):
+        ang = np.radians(direction)
+        blocked = safe_map.copy()
+        cells = point_cells((20.0 + 3 * np.sin(ang), 20.0 + 3 * np.cos(ang)), 40.0, 40)
+        blocked[cells] = 0
+
+        view = cropper.crop(blocked, head, direction, segments, 40.0)
+        assert view[..., 0].sum() == 1
+        assert view[1, 4, 0] == 1, f"The obstacle must be straight ahead at {direction}"
+
+    # The segment two cells away along -x is to the left when moving along -y.
+    view = cropper.crop(safe_map, head, 180.0, segments, 40.0)
+    assert view[..., 1].sum() == 1 and view[4, 2, 1] == 1
+
+    # Segments don't linger in the layers between crops.
+    view = cropper.crop(safe_map, head, 180.0, np.zeros((0, 2)), 40.0)
+    assert not view.any()
+
+
+def test_local_view_outside_map_is_obstacle():
+    cropper = LocalViewCropper(size=16, headings=72)
+    view = cropper.crop(np.ones((40, 40), dtype=np.int8), (0.2, 0.2), 45.0, np.zeros((0, 2)), 30.0)
+
+    assert view[..., 0].any()
+    assert not view[:9, 8, 0].any(), "Ahead towards the map centre is free"
+    assert view[-4:, 6:10, 0].all(), "Behind, beyond the corner, is outside"
+
+
+def test_local_view_obs(spec_and_opts):
+    spec, opts = spec_and_opts
+    env = SssnakeVectorEnv(num_envs=2, env_spec_in=spec, obs_keys=["local_view"])
+    obs, _ = env.reset(seed=0, options=opts)
+    for _ in range(15):
+        obs, *_ = env.step(np.array([1, 2]))
+
+    assert env.single_observation_space.contains({"local_view": obs["local_view"][0]})
+    for i in range(2):
+        expected = env.local_view.crop(
+            env.safe_map_snake,
+            env.head_position[i],
+            env.head_direction[i],
+            env.segments_positions[i, : env.segments_num[i]],
+            env.map_size[i],
+        )
+        np.testing.assert_array_equal(obs["local_view"][i], expected)
+
+    engine = EnvEngine(spec, obs_format="array", obs_keys=["local_view"])
+    obs, _ = engine.reset(seed=0, options=opts)
+    obs, *_ = engine.step(0)
+    np.testing.assert_array_equal(
+        obs["local_view"], engine.state.local_view_window(engine.obs_sensors.local_view)
+    )
+
+
+def test_local_view_flat_obs(spec_and_opts):
+    spec, opts = spec_and_opts
+    keys = ["head_position", "local_view"]
+    flat_env = EnvEngine(spec, obs_format="flat", obs_keys=keys)
+    dict_env = EnvEngine(spec, obs_keys=keys)
+    flat_env.reset(seed=0, options=opts)
+    obs, _ = dict_env.reset(seed=0, options=opts)
+    for _ in range(10):
+        flat, *_ = flat_env.step(1)
+        obs, *_ = dict_env.step(1)
+
+    assert flat_env.observation_space.contains(flat)
+    np.testing.assert_allclose(flat, spaces.flatten(dict_env.observation_space, obs), rtol=1e-6)
@@ -0,0 +1,88 @@
+import numpy as np
+from PIL import Image
+
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.core.map_cache import MapPool
+from sssnake.env.core.recording import EpisodeDataset, EpisodeRecorder
+
+
+def record_episodes(spec, opts, directory, num_episodes, chunk_size, **engine_kwargs):
+    env = EpisodeRecorder(
+        EnvEngine(spec, obs_format="array", **engine_kwargs),
+        directory,
+        dense_keys=["head_position", "segments_num"],
+        chunk_size=chunk_size,
+        seed=0,
+    )
+    rng = np.random.default_rng(1)
+    recorded = []
+    for _ in range(num_episodes):
+        obs, _ = env.reset(options=opts)
+        episode = [{k: v.copy() for k, v in obs.items()}]
+        for _ in range(120):
+            obs, _, terminated, truncated, _ = env.step(int(rng.integers(3)))
+            episode.append({k: v.copy() for k, v in obs.items()})
+            if terminated or truncated:
+                break
+        recorded.append(episode)
+    env.close()
+    return recorded
+
+
+def test_replay_reconstructs_observations(spec_and_opts, tmp_path):
+    spec, opts = spec_and_opts
+    recorded = record_episodes(spec, opts, tmp_path, num_episodes=4, chunk_size=150)
+
+    dataset = EpisodeDataset(tmp_path)
+    assert len(dataset) == 4
+    assert dataset.num_chunks > 1
+
+    for i, episode in enumerate(recorded):
+        actions = dataset.actions(i)
+        assert isinstance(actions.base, np.memmap) or isinstance(actions, np.memmap)
+        assert actions.dtype == np.uint8 and len(actions) == len(episode) - 1
+
+        heads = dataset.dense("head_position", i)
+        replayed = [
+            ({k: v.copy() for k, v in obs.items()}, *rest)
+            for obs, *rest in dataset.replay(i, obs_format="array")
+        ]
+        assert len(replayed) == len(episode)
+
+        for t, (obs, *_) in enumerate(replayed):
+            for key, value in episode[t].items():
+                np.testing.assert_array_equal(obs[key], value, err_msg=f"{key} at step {t}")
+            if t:
+                np.testing.assert_array_equal(heads[t - 1], obs["head_position"])
+
+
+def test_replay_picks_the_recorded_pool_map(spec_and_opts, tmp_path):
+    spec, opts = spec_and_opts
+    paths = []
+    for i in range(3):
+        img = Image.new("L", (40, 40), color=0)
+        img.paste(255, (4 + 10 * i, 4, 10 + 10 * i, 30))
+        img.save(tmp_path / f"map_{i}.png")
+        paths.append(str(tmp_path / f"map_{i}.png"))
+
+    # The pool is handed to the env rather than named in the spec.
+    pool = MapPool.from_bitmaps(spec, paths, opts.map_size)
+    recorded = record_episodes(spec, opts, tmp_path / "data", 4, 1000, map_pool=pool)
+
+    dataset = EpisodeDataset(tmp_path / "data")
+    assert dataset.map_pools == [paths]
+    for i, episode in enumerate(recorded):
+        for t, (obs, *_) in enumerate(dataset.replay(i, obs_format="array")):
+            for key, value in episode[t].items():
+                np.testing.assert_array_equal(obs[key], value, err_msg=f"{key} at step {t}")
+
+
+def test_replayed_frames_are_deterministic(spec_and_opts, tmp_path):
+    spec, opts = spec_and_opts
+    record_episodes(spec, opts, tmp_path, num_episodes=1, chunk_size=1000)
+    dataset = EpisodeDataset(tmp_path)
+
+    first = [frame for *_, frame in dataset.replay(0, render=True)][:10]
+    again = [frame for *_, frame in dataset.replay(0, render=True)][:10]
+    for a, b in zip(first, again, strict=True):
+        np.testing.assert_array_equal(a, b)
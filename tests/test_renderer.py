@@ -1,7 +1,16 @@
+from dataclasses import replace
+
 import numpy as np
 from PIL import Image
 
-from sssnake.env.core.renderer import get_cached_sprite, state_to_array
+from sssnake.env.core.renderer import (
+    get_cached_background,
+    get_cached_sprite,
+    get_sprite_atlas,
+    state_to_array,
+)
+from sssnake.env.utils.config_def import RenderConfig
+from sssnake.game.ui.renderer import Renderer
 
 
 def test_get_cached_sprite(simple_render_state):
@@ -31,3 +40,49 @@ def test_state_to_array(simple_render_state, tmp_path):
     assert arr2.shape == (8, 8, 4)
 
     assert arr2.mean() > 0, "Some pixels should be white"
+
+
+def test_sprite_atlas(simple_render_state):
+    base = Image.new("RGBA", (4, 8), "white")
+
+    atlas = get_sprite_atlas(base, 8, angle_steps=4)
+    assert len(atlas) == 4
+    assert get_sprite_atlas(base, 8, angle_steps=4) is atlas
+    assert atlas[1].size == (8, 8)
+
+
+def test_atlas_engine_matches_exact_on_steps(simple_render_state, tmp_path):
+    bg = Image.new("L", (4, 4), color=128)
+    bg_path = tmp_path / "bg.png"
+    bg.save(bg_path)
+
+    # The candy's angle, seeded by its position, isn't one of the atlas steps: keep it off the frame
+    state = replace(simple_render_state, head_direction=90.0, candy_position=(-50.0, -50.0))
+    exact = state_to_array(state, str(bg_path), out_size=32, engine="exact")
+    atlas = state_to_array(state, str(bg_path), out_size=32, engine="atlas", angle_steps=72)
+    np.testing.assert_array_equal(atlas, exact)
+
+    again = state_to_array(state, str(bg_path), out_size=32, engine="atlas", angle_steps=72)
+    np.testing.assert_array_equal(again, atlas)
+    assert get_cached_background(str(bg_path), 32) is get_cached_background(str(bg_path), 32)
+
+
+def test_array_background(simple_render_state):
+    obstacles = np.zeros((10, 10), dtype=np.int8)
+    obstacles[:, :2] = 1
+
+    frame = state_to_array(simple_render_state, out_size=100, obstacles_map=obstacles)
+    assert (frame[:, :20, :3] == 255).all()
+    assert (frame[:5, 30:, :3] == 0).all()
+
+
+def test_game_renderer_draws_generated_map(simple_render_state):
+    obstacles = np.zeros((10, 10), dtype=np.int8)
+    obstacles[:, :2] = 1
+
+    renderer = Renderer(width=100, height=100)
+    renderer.set_render_config(RenderConfig(map_bitmap_path=""), obstacles)
+    frame = np.asarray(renderer.compute_render(simple_render_state))
+
+    expected = state_to_array(simple_render_state, out_size=100, obstacles_map=obstacles)
+    np.testing.assert_array_equal(frame, expected)
@@ -0,0 +1,113 @@
+import math
+
+import gymnasium as gym
+import numpy as np
+
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.core.vector_env import SssnakeVectorEnv
+from sssnake.env.utils.snake_action import SnakeAction
+
+
+def chase_candy(head, direction, candy):
+    """
+    Simple policy turning the snake towards the candy, so that episodes grow a tail.
+    """
+
+    target = math.degrees(math.atan2(candy[0] - head[0], candy[1] - head[1])) % 360.0
+    diff = (target - direction + 180.0) % 360.0 - 180.0
+    if diff > 2.5:
+        return SnakeAction.LEFT.value
+    if diff < -2.5:
+        return SnakeAction.RIGHT.value
+    return SnakeAction.NONE.value
+
+
+def test_vector_env_matches_engines(spec_and_opts):
+    spec, opts = spec_and_opts
+    num_envs = 4
+
+    engines = [EnvEngine(spec) for _ in range(num_envs)]
+    for i, engine in enumerate(engines):
+        engine.reset(seed=7 + i, options=opts)
+
+    vec = SssnakeVectorEnv(num_envs=num_envs, env_spec_in=spec)
+    vec.reset(seed=7, options=opts)
+
+    done = [False] * num_envs
+    for _ in range(600):
+        actions = np.array(
+            [
+                chase_candy(e.state.head_position, e.state.head_direction, e.state.candy_position)
+                for e in engines
+            ]
+        )
+        _, rewards, terminated, truncated, _ = vec.step(actions)
+
+        for i, engine in enumerate(engines):
+            if done[i]:
+                engine.reset()
+                reward, term, trunc = 0, False, False
+            else:
+                _, reward, term, trunc, _ = engine.step(int(actions[i]))
+            done[i] = term or trunc
+
+            assert rewards[i] == reward
+            assert terminated[i] == term
+            assert truncated[i] == trunc
+
+            state = engine.state
+            np.testing.assert_allclose(vec.head_position[i], state.head_position, atol=1e-9)
+            np.testing.assert_allclose(vec.candy_position[i], state.candy_position, atol=1e-9)
+            assert vec.segments_num[i] == state.segments_num
+            np.testing.assert_allclose(
+                vec.segments_positions[i], np.asarray(state.segments_positions), atol=1e-9
+            )
+
+    assert vec.segments_num.max() > 0, "Policy should have collected some candies"
+
+
+def test_vector_env_autoreset(spec_and_opts):
+    spec, opts = spec_and_opts
+    vec = SssnakeVectorEnv(num_envs=3, env_spec_in=spec)
+    obs, _ = vec.reset(seed=0, options=opts)
+    start = obs["head_position"].copy()
+
+    terminated = np.zeros(3, dtype=bool)
+    for _ in range(400):
+        _, _, terminated, _, _ = vec.step(np.zeros(3, dtype=np.int64))
+        if terminated.any():
+            break
+    assert terminated.all(), "Going straight should hit the wall in every sub-env"
+
+    obs, rewards, terminated, truncated, _ = vec.step(np.zeros(3, dtype=np.int64))
+    np.testing.assert_allclose(obs["head_position"], start)
+    assert not rewards.any()
+    assert not terminated.any() and not truncated.any()
+
+
+def test_make_vec_uses_vector_entry_point():
+    envs = gym.make_vec("Sssnake-v0", num_envs=2, vectorization_mode="vector_entry_point")
+    obs, _ = envs.reset(seed=1)
+
+    assert isinstance(envs.unwrapped, SssnakeVectorEnv)
+    assert envs.observation_space.contains(obs)
+
+
+def test_vector_env_obs_keys(spec_and_opts):
+    spec, opts = spec_and_opts
+    keys = ["head_position", "occupancy_grid", "safe_map_snake"]
+
+    engine = EnvEngine(spec, obs_keys=keys, static_obs_on_reset=True)
+    engine.reset(seed=5, options=opts)
+    vec = SssnakeVectorEnv(num_envs=2, env_spec_in=spec, obs_keys=keys, static_obs_on_reset=True)
+    obs, info = vec.reset(seed=5, options=opts)
+
+    assert set(obs) == {"head_position", "occupancy_grid"}
+    assert vec.observation_space.contains(obs)
+    assert info["static_obs"]["safe_map_snake"] is vec.safe_map_snake
+
+    for _ in range(10):
+        obs, *_ = vec.step(np.array([SnakeAction.LEFT.value] * 2))
+        expected, *_ = engine.step(SnakeAction.LEFT.value)
+
+    np.testing.assert_array_equal(obs["occupancy_grid"][0], expected["occupancy_grid"])
@@ -0,0 +1,106 @@
+import threading
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from sssnake.env.core.env_engine import EnvEngine
+from sssnake.env.core.renderer import state_to_array
+from sssnake.env.core.video import FrameStream, RawFrameWriter, VideoRecorder, load_raw_frames
+
+
+def run_episode(env, opts, steps):
+    env.reset(seed=0, options=opts)
+    for t in range(steps):
+        _, _, terminated, truncated, _ = env.step(t % 3)
+        if terminated or truncated:
+            env.reset()
+
+
+def test_raw_frames_match_render(spec_and_opts, tmp_path):
+    spec, opts = spec_and_opts
+    path = tmp_path / "episode.rgba"
+
+    rendering = EnvEngine(spec, render_mode="rgb_array")
+    expected = []
+    rendering.reset(seed=0, options=opts)
+    expected.append(rendering.render())
+    for t in range(10):
+        rendering.step(t % 3)
+        expected.append(rendering.render())
+
+    env = VideoRecorder(EnvEngine(spec), path, out_size=320)
+    run_episode(env, opts, 10)
+    env.close()
+
+    frames = load_raw_frames(path)
+    assert isinstance(frames, np.memmap)
+    assert frames.shape == (11, *expected[0].shape)
+    np.testing.assert_array_equal(frames, np.stack(expected))
+
+
+def test_gif_is_streamed(spec_and_opts, tmp_path):
+    spec, opts = spec_and_opts
+    path = tmp_path / "episode.gif"
+
+    env = VideoRecorder(EnvEngine(spec), path, fps=20, out_size=64)
+    run_episode(env, opts, 30)
+    env.close()
+    env.close()
+
+    assert env.frames == 31
+    with Image.open(path) as gif:
+        assert gif.n_frames == 31
+        assert gif.size == (64, 64)
+        assert gif.info["duration"] == 50
+
+
+def test_queue_is_bounded(simple_render_state, tmp_path):
+    release = threading.Event()
+
+    class SlowWriter(RawFrameWriter):
+        def write(self, frame):
+            release.wait()
+            super().write(frame)
+
+    stream = FrameStream(SlowWriter(tmp_path / "slow.rgba"), queue_size=2, out_size=32)
+    for _ in range(3):
+        stream.submit(simple_render_state)
+
+    # The writer holds one frame and the queue two more, the next submit has to wait.
+    blocked = threading.Thread(target=stream.submit, args=(simple_render_state,))
+    blocked.start()
+    blocked.join(timeout=0.2)
+    assert blocked.is_alive()
+
+    release.set()
+    blocked.join()
+    stream.close()
+    assert stream.frames == 4
+
+
+def test_encoder_errors_are_raised(simple_render_state, tmp_path):
+    stream = FrameStream(RawFrameWriter(tmp_path / "frames.rgba"), out_size=32)
+    stream.submit(simple_render_state)
+    stream.submit(replace(simple_render_state, map_size=0.0))
+
+    with pytest.raises(RuntimeError, match="Video encoding failed"):
+        stream.close()
+
+
+def test_unknown_format(spec_and_opts, tmp_path):
+    spec, _ = spec_and_opts
+    with pytest.raises(ValueError):
+        VideoRecorder(EnvEngine(spec), tmp_path / "video.mp4", video_format="mp4")
+
+
+def test_stream_renders_state(simple_render_state, tmp_path):
+    path = tmp_path / "frames.rgba"
+    stream = FrameStream(RawFrameWriter(path), out_size=48)
+    stream.submit(simple_render_state)
+    stream.close()
+
+    np.testing.assert_array_equal(
+        load_raw_frames(path)[0], state_to_array(simple_render_state, out_size=48)
+    )